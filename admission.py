@@ -0,0 +1,176 @@
+"""Контроль допуска запросов: отдельные лимиты для тяжелых и легких маршрутов.
+
+Маршруты делятся на два класса. Тяжелые (экспорты, импорты, полный список,
+полная матрица, раскладка) помечаются декоратором ``heavy``, остальные
+маршруты API считаются легкими. У каждого класса свой лимит одновременно
+выполняемых запросов и своя очередь. Если очередь класса заполнена или
+запрос простоял в ней дольше ADMISSION_QUEUE_TIMEOUT, сразу отдается 429 с
+Retry-After: тяжелые запросы не занимают потоки, которые нужны
+интерактивным GET/PUT.
+
+Лимиты действуют в пределах процесса воркера. Глубина очередей и счетчики
+отдаются маршрутом ``/api/admission``.
+"""
+
+from collections import deque
+import math
+import threading
+import time
+
+from flask import current_app, g, jsonify, request
+
+EXTENSION_KEY = 'admission'
+HEAVY = 'heavy'
+LIGHT = 'light'
+
+
+class Overloaded(Exception):
+    def __init__(self, retry_after):
+        super().__init__('Сервер перегружен, повторите запрос позже')
+        self.retry_after = retry_after
+
+
+class AdmissionQueue:
+    """Семафор с ограниченной FIFO-очередью ожидания."""
+
+    def __init__(self, name, concurrency, max_queue, timeout):
+        self.name = name
+        self.concurrency = concurrency
+        self.max_queue = max_queue
+        self.timeout = timeout
+        self.active = 0
+        self.admitted = 0
+        self.rejected = 0
+        self.timed_out = 0
+        self.max_wait = 0.0
+        self.total_wait = 0.0
+        # Скользящее среднее времени обработки — для оценки Retry-After
+        self.avg_service = 1.0
+        self._waiters = deque()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Момент допуска (для release) или Overloaded, если очередь полна или ожидание истекло."""
+        started = time.monotonic()
+        with self._lock:
+            if self.active < self.concurrency and not self._waiters:
+                self.active += 1
+                self.admitted += 1
+                return started
+            if len(self._waiters) >= self.max_queue:
+                self.rejected += 1
+                raise Overloaded(self._retry_after())
+            waiter = threading.Event()
+            self._waiters.append(waiter)
+
+        admitted = waiter.wait(self.timeout)
+        with self._lock:
+            if not admitted and not waiter.is_set():
+                self._waiters.remove(waiter)
+                self.timed_out += 1
+                raise Overloaded(self._retry_after())
+            # Слот уже передан этому запросу в release
+            waited = time.monotonic() - started
+            self.admitted += 1
+            self.total_wait += waited
+            self.max_wait = max(self.max_wait, waited)
+        return time.monotonic()
+
+    def release(self, admitted_at):
+        with self._lock:
+            self.avg_service = 0.8 * self.avg_service + 0.2 * (time.monotonic() - admitted_at)
+            if self._waiters:
+                # Слот переходит первому в очереди, active не меняется
+                self._waiters.popleft().set()
+            else:
+                self.active -= 1
+
+    def _retry_after(self):
+        estimate = self.avg_service * (len(self._waiters) + 1) / max(self.concurrency, 1)
+        return min(60, max(1, math.ceil(estimate)))
+
+    def stats(self):
+        with self._lock:
+            return {
+                'concurrency': self.concurrency,
+                'max_queue': self.max_queue,
+                'active': self.active,
+                'queued': len(self._waiters),
+                'admitted': self.admitted,
+                'rejected': self.rejected,
+                'timed_out': self.timed_out,
+                'avg_wait_ms': round(self.total_wait / self.admitted * 1000, 2) if self.admitted else 0.0,
+                'max_wait_ms': round(self.max_wait * 1000, 2),
+                'avg_service_ms': round(self.avg_service * 1000, 2),
+            }
+
+
+def heavy(view=None, *, when=None):
+    """Помечает маршрут тяжелым; when() — условие на запрос (например, нет пагинации)."""
+    def mark(func):
+        func.admission_class = HEAVY
+        func.admission_when = when
+        return func
+    return mark(view) if view is not None else mark
+
+
+def exempt(view):
+    """Маршрут вне контроля допуска (метрики должны отвечать и под перегрузкой)."""
+    view.admission_class = None
+    return view
+
+
+def _admission_class(view):
+    if not hasattr(view, 'admission_class'):
+        return LIGHT
+    if view.admission_class == HEAVY and view.admission_when is not None and not view.admission_when():
+        return LIGHT
+    return view.admission_class
+
+
+def admit():
+    """before_request блюпринта: занимает слот класса маршрута или отвечает 429."""
+    queues = current_app.extensions.get(EXTENSION_KEY)
+    view = current_app.view_functions.get(request.endpoint)
+    if queues is None or view is None:
+        return None
+    name = _admission_class(view)
+    if name is None or name not in queues:
+        return None
+    try:
+        g.admission = (queues[name], queues[name].acquire())
+    except Overloaded as e:
+        response = jsonify({'error': str(e), 'admission_class': name})
+        response.status_code = 429
+        response.headers['Retry-After'] = str(e.retry_after)
+        return response
+    return None
+
+
+def release(_exc=None):
+    """teardown_request: освобождает слот (после отдачи потокового ответа)."""
+    admission = g.pop('admission', None)
+    if admission is not None:
+        queue, admitted_at = admission
+        queue.release(admitted_at)
+
+
+def stats():
+    queues = current_app.extensions.get(EXTENSION_KEY) or {}
+    return {name: queue.stats() for name, queue in queues.items()}
+
+
+def init_app(app):
+    queues = {}
+    timeout = app.config['ADMISSION_QUEUE_TIMEOUT']
+    for name in (HEAVY, LIGHT):
+        concurrency = app.config[f'ADMISSION_{name.upper()}_CONCURRENCY']
+        # Нулевой лимит выключает контроль для класса
+        if concurrency:
+            queues[name] = AdmissionQueue(name, concurrency, app.config[f'ADMISSION_{name.upper()}_QUEUE'], timeout)
+    app.extensions[EXTENSION_KEY] = queues
+
+
+def unpaged():
+    """Условие для списков: без offset/limit маршрут отдает все строки проекта."""
+    return 'offset' not in request.args and 'limit' not in request.args
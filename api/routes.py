@@ -1,21 +1,62 @@
 """API маршруты"""
 
-import tempfile
+from flask import Blueprint, Response, request, jsonify, send_file, current_app, stream_with_context, g
+from werkzeug.exceptions import RequestEntityTooLarge
 
-from flask import Blueprint, request, jsonify, send_file, current_app
-
-from database import db
+from admission import admit, exempt, heavy, release, stats as admission_stats, unpaged
+from database import db, reads_from_replica
 from models.project import Project
-from models.requirement import Requirement, RequirementType, RequirementStatus, Priority
+from models.requirement import Requirement, RequirementClosure, RequirementType, RequirementStatus, Priority
 from models.link import Link, LinkType
-from services.docx_import_service import DocxImportService
+from services.docx_import_service import DocxImportService, parse_docx_batch
 from services.export_service import ExportService
+from services.export_cache import get_export_cache
+from services.graph_snapshot import get_snapshot_store
+from services.history_archive import get_history_archive, retention_days
+from services.layout_service import get_layout_cache, project_layout
+from services.project_archive_service import ProjectArchiveService
+from services.baseline_service import BaselineService, LIVE
+from services.suggestion_service import get_suggestion_cache, suggest_links
+from services.trace_query import run_query
+from services.uploads import stream_size, validate_docx_upload
+from services.xlsx_import_service import XlsxImportService
 
 import logic
+import sharding
 
 
 api = Blueprint('api', __name__)
 
+# Верхняя граница limit для постраничных ответов
+MAX_PAGE_SIZE = 500
+
+
+# Тяжелые маршруты (@heavy) и остальные выполняются с отдельными лимитами, см. admission.py
+api.before_request(admit)
+api.teardown_request(release)
+
+
+@api.route('/admission', methods=['GET'])
+@exempt
+def get_admission_stats():
+    """Глубина очередей и счетчики контроля допуска этого воркера."""
+    return jsonify(admission_stats())
+
+
+@api.url_value_preprocessor
+def bind_project_shard(_endpoint, values):
+    """Запросы к данным проекта уходят в его шард (если шардирование включено)."""
+    if values and 'project_id' in values:
+        g.shard_project_id = values['project_id']
+    elif request.args.get('project_id'):
+        g.shard_project_id = request.args.get('project_id', type=int)
+
+
+@api.errorhandler(RequestEntityTooLarge)
+def request_too_large(_error):
+    limit = request.max_content_length
+    return jsonify({'error': f'Размер запроса превышает допустимый ({limit} байт)'}), 413
+
 
 @api.route('/projects', methods=['POST'])
 def create_project():
@@ -33,9 +74,21 @@ def create_project():
 
 
 @api.route('/projects', methods=['GET'])
+@reads_from_replica
 def get_projects():
-    projects =  Project.query.order_by(Project.id.asc()).all()
-    return jsonify([project.to_dict() for project in projects])
+    try:
+        offset, limit = _page_args()
+        sort = request.args.get('sort', 'id')
+        order = request.args.get('order', 'asc')
+        if order not in ('asc', 'desc'):
+            raise ValueError('order должен быть asc или desc')
+        total, items = logic.get_projects_page(offset, limit, sort, descending=order == 'desc')
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    response = jsonify(items)
+    response.headers['X-Total-Count'] = str(total)
+    return response
 
 
 @api.route('/projects/<int:project_id>', methods=['PUT'])
@@ -51,6 +104,11 @@ def update_project(project_id):
     if name:
         project.name = name
     project.description = description
+    if 'history_retention_days' in data:
+        days = data['history_retention_days']
+        if days is not None and (isinstance(days, bool) or not isinstance(days, int) or days < 0):
+            return jsonify({'error': 'history_retention_days должен быть неотрицательным целым числом или null'}), 400
+        project.history_retention_days = days
     db.session.commit()
     return jsonify(project.to_dict())
 
@@ -66,28 +124,279 @@ def delete_project(project_id):
         (Link.source_requirement_id.in_(req_ids))
         | (Link.target_requirement_id.in_(req_ids))
     ).delete(synchronize_session=False)
+    db.session.query(RequirementClosure).filter(
+        RequirementClosure.descendant_id.in_(req_ids)
+    ).delete(synchronize_session=False)
     db.session.query(Requirement).filter(Requirement.project_id == project_id).delete(synchronize_session=False)
+    BaselineService(db.session).delete_project_baselines(project_id)
+    get_history_archive().delete_project(db.session, project_id)
     db.session.delete(project)
     db.session.commit()
+
+    get_export_cache().invalidate(project_id)
+    get_layout_cache().invalidate(project_id)
+    get_suggestion_cache().invalidate(project_id)
+    snapshots = get_snapshot_store()
+    if snapshots is not None:
+        snapshots.invalidate(project_id)
+    resolver = sharding.get_resolver()
+    if resolver:
+        resolver.drop(project_id)
     return jsonify({'message': 'Project deleted successfully'})
 
 
+@api.route('/projects/<int:project_id>/dump', methods=['GET'])
+@heavy
+@reads_from_replica
+def dump_project(project_id):
+    """Полная выгрузка проекта в сжатый NDJSON."""
+    project = Project.query.get(project_id)
+    if not project:
+        return jsonify({'error': 'Project not found'}), 404
+
+    archive = ProjectArchiveService(db.session, chunk_size=current_app.config['PROJECT_DUMP_CHUNK_SIZE'],
+                                    history_archive=get_history_archive())
+    return Response(
+        stream_with_context(archive.iter_dump(project_id)),
+        mimetype='application/gzip',
+        headers={'Content-Disposition': f'attachment; filename=project_{project_id}.ndjson.gz'},
+    )
+
+
+@api.route('/projects/restore', methods=['POST'])
+@heavy
+def restore_project():
+    """Восстановление проекта из дампа."""
+    uploaded_file = request.files.get('file')
+    if not uploaded_file:
+        return jsonify({'error': 'Требуется файл'}), 400
+
+    archive = ProjectArchiveService(db.session, chunk_size=current_app.config['PROJECT_DUMP_CHUNK_SIZE'])
+    try:
+        project, counts = archive.restore(
+            uploaded_file.stream,
+            name=request.form.get('name'),
+            id_mode=request.form.get('id_mode', 'remap'),
+        )
+    except Exception as e:
+        return jsonify({'error': str(e)}), 400
+
+    return jsonify({'project': project.to_dict(), 'restored': counts}), 201
+
+
+@api.route('/projects/<int:project_id>/baselines', methods=['POST'])
+@heavy
+def create_baseline(project_id):
+    """Фиксация базовой версии проекта."""
+    data = request.get_json() or {}
+    name = (data.get('name') or "").strip()
+    if not name:
+        return jsonify({'error': 'name required'}), 400
+
+    project = Project.query.get(project_id)
+    if not project:
+        return jsonify({'error': 'Project not found'}), 404
+
+    baseline = BaselineService(db.session).create(project_id, name, created_by=data.get('author'))
+    return jsonify(baseline.to_dict()), 201
+
+
+@api.route('/projects/<int:project_id>/baselines', methods=['GET'])
+@reads_from_replica
+def get_baselines(project_id):
+    return jsonify([baseline.to_dict() for baseline in BaselineService(db.session).list(project_id)])
+
+
+@api.route('/projects/<int:project_id>/baselines/<int:baseline_id>', methods=['GET'])
+@reads_from_replica
+def get_baseline(project_id, baseline_id):
+    """Снимок целиком: требования и связи на момент фиксации."""
+    service = BaselineService(db.session)
+    baseline = service.get(project_id, baseline_id)
+    if not baseline:
+        return jsonify({'error': 'Baseline not found'}), 404
+
+    requirements, links = service.contents(baseline)
+    return jsonify(dict(baseline.to_dict(), requirements=requirements, links=links))
+
+
+@api.route('/projects/<int:project_id>/baselines/<int:baseline_id>', methods=['DELETE'])
+def delete_baseline(project_id, baseline_id):
+    service = BaselineService(db.session)
+    baseline = service.get(project_id, baseline_id)
+    if not baseline:
+        return jsonify({'error': 'Baseline not found'}), 404
+
+    service.delete(baseline)
+    return jsonify({'message': 'Baseline deleted successfully'})
+
+
+@api.route('/projects/<int:project_id>/baselines/<int:baseline_id>/diff', methods=['GET'])
+@heavy
+@reads_from_replica
+def diff_baseline(project_id, baseline_id):
+    """Сравнение снимка с другим снимком (?to=<id>) или с текущим состоянием (?to=live)."""
+    service = BaselineService(db.session)
+    baseline = service.get(project_id, baseline_id)
+    if not baseline:
+        return jsonify({'error': 'Baseline not found'}), 404
+
+    target = request.args.get('to', LIVE)
+    if target != LIVE:
+        if not target.isdigit():
+            return jsonify({'error': 'to must be a baseline id or live'}), 400
+        target = service.get(project_id, int(target))
+        if not target:
+            return jsonify({'error': 'Baseline not found'}), 404
+
+    details = request.args.get('details') in ('1', 'true')
+    return jsonify(service.diff(project_id, baseline, target, details=details))
+
+
 @api.route('/projects/<int:project_id>/requirements', methods=['GET'])
+@heavy(when=unpaged)
+@reads_from_replica
 def get_requirements(project_id):
-    """Все требования со связями."""
-    return jsonify(logic.get_all_requirements_with_links(project_id))
+    """Требования со связями.
+
+    С ?offset/?limit отдается страница, общее число — в заголовке X-Total-Count.
+    Фильтры ?type, ?status, ?priority принимают значения енумов, ?subtree=<id>
+    оставляет требование и его потомков (?depth — не глубже стольких уровней).
+    """
+    try:
+        offset, limit = _page_args()
+        filters = {}
+        for arg, column, enum_class in (('type', 'requirement_type', RequirementType),
+                                        ('status', 'status', RequirementStatus),
+                                        ('priority', 'priority', Priority)):
+            if request.args.get(arg):
+                filters[column] = enum_class(request.args[arg])
+        subtree = request.args.get('subtree', type=int)
+        depth = request.args.get('depth', type=int)
+        if depth is not None and depth < 0:
+            raise ValueError('depth должен быть неотрицательным')
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    if subtree is not None:
+        root = db.session.get(Requirement, subtree)
+        if not root or root.project_id != project_id:
+            return jsonify({'error': 'Requirement not found'}), 404
+
+    total, items = logic.get_requirements_page(project_id, offset, limit, filters, subtree=subtree, depth=depth)
+    response = jsonify(items)
+    response.headers['X-Total-Count'] = str(total)
+    return response
+
+
+def _page_args():
+    """offset/limit из query string; limit ограничен MAX_PAGE_SIZE."""
+    offset = request.args.get('offset', 0, type=int)
+    limit = request.args.get('limit', type=int)
+    if offset < 0 or (limit is not None and limit < 0):
+        raise ValueError('offset и limit должны быть неотрицательными')
+    if limit is not None:
+        limit = min(limit, MAX_PAGE_SIZE)
+    elif 'offset' in request.args:
+        limit = MAX_PAGE_SIZE
+    return offset, limit
+
+
+@api.route('/projects/<int:project_id>/requirements/query', methods=['POST'])
+@reads_from_replica
+def query_requirements(project_id):
+    """Декларативный запрос трассировки (формат — в services/trace_query.py)."""
+    if not db.session.get(Project, project_id):
+        return jsonify({'error': 'Project not found'}), 404
+
+    data = request.get_json(silent=True) or {}
+    try:
+        offset, limit = _page_args()
+        limit = MAX_PAGE_SIZE if limit is None else limit
+        total, reqs = run_query(db.session, project_id, data, offset, limit)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    return jsonify({
+        'total': total,
+        'offset': offset,
+        'limit': limit,
+        'requirements': [r.to_dict() for r in reqs],
+    })
 
 
 @api.route('/projects/<int:project_id>/requirements/<int:requirement_id>', methods=['GET'])
+@reads_from_replica
 def get_requirement(project_id, requirement_id):
     req = logic.get_requirement_with_links(project_id, requirement_id)
     if req:
-        return jsonify(req)
+        response = jsonify(req)
+        response.set_etag(str(req['version']))
+        return response
     return jsonify({'error': 'Requirement not found'}), 404
 
+
+@api.route('/projects/<int:project_id>/requirements/<int:requirement_id>/ancestors', methods=['GET'])
+@reads_from_replica
+def get_requirement_ancestors(project_id, requirement_id):
+    """Цепочка предков требования от корня иерархии."""
+    ancestors = logic.get_ancestors(project_id, requirement_id)
+    if ancestors is None:
+        return jsonify({'error': 'Requirement not found'}), 404
+    return jsonify([req.to_dict() for req in ancestors])
+
+
+@api.route('/projects/<int:project_id>/requirements/<int:requirement_id>/parent', methods=['PUT'])
+def move_requirement(project_id, requirement_id):
+    """Перенос требования вместе с поддеревом: {"parent_id": id или null}."""
+    data = request.get_json(silent=True) or {}
+    if 'parent_id' not in data:
+        return jsonify({'error': 'parent_id required'}), 400
+
+    try:
+        req = logic.move_requirement(project_id, requirement_id, _parent_id_arg(data),
+                                     changed_by=data.get('changed_by'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    if not req:
+        return jsonify({'error': 'Requirement not found'}), 404
+    response = jsonify(req.to_dict())
+    response.set_etag(str(req.version))
+    return response
+
+
+def _parent_id_arg(data):
+    parent_id = data.get('parent_id')
+    if parent_id is not None and (not isinstance(parent_id, int) or isinstance(parent_id, bool)):
+        raise ValueError('parent_id должен быть id требования или null')
+    return parent_id
+
+
+def _if_match_version():
+    """Версия требования из If-Match (ETag вида "3"); None — заголовка нет или он равен *."""
+    if_match = request.if_match
+    if not if_match or if_match.star_tag:
+        return None
+    tags = if_match.as_set(include_weak=True)
+    if len(tags) != 1 or not next(iter(tags)).isdigit():
+        raise ValueError('If-Match должен содержать одну версию требования, например "3"')
+    return int(next(iter(tags)))
+
+
 @api.route('/projects/<int:project_id>/requirements/import/docx', methods=['POST'])
+@heavy
 def import_requirements_from_docx(project_id):
-    """Импорт требований из .docx файла."""
+    """Импорт требований из .docx файла.
+
+    Файл не читается в память целиком: разбор идет из буфера загрузки
+    (большие файлы Werkzeug держит на диске), структура zip проверяется до разбора.
+    """
+    project = Project.query.get(project_id)
+    if not project:
+        return jsonify({'error': 'Project not found'}), 404
+
+    # Лимит выставляется до разбора формы: слишком большой запрос отклоняется сразу
+    request.max_content_length = current_app.config.get('DOCX_MAX_UPLOAD_BYTES')
     uploaded_file = request.files.get('file')
 
     if not uploaded_file:
@@ -100,40 +409,134 @@ def import_requirements_from_docx(project_id):
     if not filename.lower().endswith('.docx'):
         return jsonify({'error': 'Поддерживается только формат .docx'}), 400
 
-    file_bytes = uploaded_file.read()
-    if not file_bytes:
+    if not stream_size(uploaded_file.stream):
         return jsonify({'error': 'Файл пустой'}), 400
 
+    aliases = current_app.config.get("REQUIREMENT_TYPE_ALIASES")
+    parser = DocxImportService(aliases=aliases)
+    incremental = request.args.get('mode') == 'incremental'
+    dry_run = request.args.get('dry_run') in ('1', 'true')
+
+    try:
+        validate_docx_upload(uploaded_file.stream)
+        parsed_requirements = parser.parse(uploaded_file.stream)
+        items = [_draft_to_requirement_data(d, with_position=True) for d in parsed_requirements]
+        if incremental:
+            plan = logic.reimport_requirements(project_id, items, dry_run=dry_run)
+            return jsonify(dict(plan, dry_run=dry_run)), 200
+        reqs = logic.create_requirements(project_id, items)
+        created = [req.to_dict() for req in reqs]
+        return jsonify({'created_count': len(created), 'requirements': created}), 201
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 400
+
+
+@api.route('/projects/<int:project_id>/requirements/import/docx/batch', methods=['POST'])
+@heavy
+def import_requirements_from_docx_batch(project_id):
+    """Пакетный импорт нескольких .docx: разбор параллельно, запись одной транзакцией."""
     project = Project.query.get(project_id)
     if not project:
         return jsonify({'error': 'Project not found'}), 404
 
-    aliases = current_app.config.get("REQUIREMENT_TYPE_ALIASES")
-    parser = DocxImportService(aliases=aliases)
+    uploaded_files = request.files.getlist('files')
+    if not uploaded_files:
+        return jsonify({'error': 'Требуются файлы'}), 400
+
+    report = []
+    jobs = []
+    for uploaded_file in uploaded_files:
+        filename = (uploaded_file.filename or '').strip()
+        if not filename.lower().endswith('.docx'):
+            report.append({'filename': filename, 'error': 'Поддерживается только формат .docx'})
+            continue
+        size = stream_size(uploaded_file.stream)
+        if not size:
+            report.append({'filename': filename, 'error': 'Файл пустой'})
+            continue
+        if size > current_app.config['DOCX_MAX_UPLOAD_BYTES']:
+            limit = current_app.config['DOCX_MAX_UPLOAD_BYTES']
+            report.append({'filename': filename, 'error': f'Файл больше {limit} байт'})
+            continue
+        try:
+            validate_docx_upload(uploaded_file.stream)
+        except ValueError as e:
+            report.append({'filename': filename, 'error': str(e)})
+            continue
+        report.append({'filename': filename})
+        # В пул процессов уходят байты: буфер загрузки нельзя передать в другой процесс
+        jobs.append((filename, uploaded_file.read()))
+
+    results = iter(parse_docx_batch(
+        jobs,
+        aliases=current_app.config.get("REQUIREMENT_TYPE_ALIASES"),
+        max_workers=current_app.config.get("DOCX_IMPORT_WORKERS"),
+    ))
+
+    requirement_data = []
+    for entry in report:
+        if 'error' in entry:
+            continue
+        result = next(results)
+        if result.error:
+            entry['error'] = result.error
+            continue
+        entry['created_count'] = len(result.drafts)
+        offset = len(requirement_data)
+        requirement_data.extend(_draft_to_requirement_data(d, offset=offset) for d in result.drafts)
+
+    if not requirement_data:
+        return jsonify({'error': 'Не удалось импортировать ни одного файла', 'files': report}), 400
 
     try:
-        parsed_requirements = parser.parse(file_bytes)
-
-        created = []
-        for parsed_requirement in parsed_requirements:
-            payload = parsed_requirement.to_dict()
-            requirement_data = {
-                'title': payload['title'],
-                'description': payload['description'],
-                'requirement_type': RequirementType(payload['requirement_type']),
-            }
-            req = logic.create_requirement(
-                project_id,
-                requirement_data,
-            )
-            created.append(req.to_dict())
+        reqs = logic.create_requirements(project_id, requirement_data)
+    except Exception as e:
+        return jsonify({'error': str(e), 'files': report}), 400
 
-        return jsonify({'created_count': len(created), 'requirements': created}), 201
+    created = [req.to_dict() for req in reqs]
+    return jsonify({'created_count': len(created), 'files': report, 'requirements': created}), 201
+
+
+@api.route('/projects/<int:project_id>/requirements/import/xlsx', methods=['POST'])
+@heavy
+def import_requirements_from_xlsx(project_id):
+    """Загрузка отредактированного XLSX-экспорта: upsert требований и связей."""
+    uploaded_file = request.files.get('file')
+    if not uploaded_file:
+        return jsonify({'error': 'Требуется файл'}), 400
+
+    filename = (uploaded_file.filename or '').strip()
+    if not filename.lower().endswith('.xlsx'):
+        return jsonify({'error': 'Поддерживается только формат .xlsx'}), 400
+
+    project = Project.query.get(project_id)
+    if not project:
+        return jsonify({'error': 'Project not found'}), 404
+
+    importer = XlsxImportService(db.session, chunk_size=current_app.config['XLSX_IMPORT_CHUNK_SIZE'])
+    try:
+        counts = importer.import_workbook(project_id, uploaded_file.stream)
     except Exception as e:
-        db.session.rollback()
         return jsonify({'error': str(e)}), 400
 
+    return jsonify(counts), 200
+
 
+def _draft_to_requirement_data(draft, with_position=False, offset=0):
+    """offset — номер первого пункта файла в общем пакете (родитель указан номером пункта)."""
+    payload = draft.to_dict()
+    data = {
+        'title': payload['title'],
+        'description': payload['description'],
+        'requirement_type': RequirementType(payload['requirement_type']),
+    }
+    if payload['parent_index'] is not None:
+        data['parent_index'] = payload['parent_index'] + offset
+    # Позиция нужна для повторного импорта того же документа; в пакетном импорте она неоднозначна
+    if with_position:
+        data['import_position'] = payload['position']
+    return data
 
 
 @api.route('/projects/<int:project_id>/requirements', methods=['POST'])
@@ -149,7 +552,8 @@ def create_requirement(project_id):
             'status': RequirementStatus(data.get('status', 'Черновик')),
             'priority': Priority(data.get('priority', 'Средний')),
             'source': data.get('source', ''),
-            'author': data.get('author', '')
+            'author': data.get('author', ''),
+            'parent_id': _parent_id_arg(data),
         }
 
         req = logic.create_requirement(project_id, requirement_data, author=data.get('author') )
@@ -160,7 +564,7 @@ def create_requirement(project_id):
 
 @api.route('/projects/<int:project_id>/requirements/<int:requirement_id>', methods=['PUT'])
 def update_requirement(project_id, requirement_id):
-    """Обновление требования."""
+    """Обновление требования; с If-Match — только если версия не изменилась (иначе 409)."""
     data = request.json or {}
 
     try:
@@ -181,35 +585,66 @@ def update_requirement(project_id, requirement_id):
         if 'author' in data:
             fields['author'] = data['author']
 
-        req = logic.update_requirement(project_id, requirement_id, fields, changed_by=data.get('changed_by'))
+        req = logic.update_requirement(project_id, requirement_id, fields, changed_by=data.get('changed_by'),
+                                       expected_version=_if_match_version())
         if req:
-            return jsonify(req.to_dict())
+            response = jsonify(req.to_dict())
+            response.set_etag(str(req.version))
+            return response
         return jsonify({'error': 'Requirement not found'}), 404
+    except logic.VersionConflictError as e:
+        response = jsonify({'error': str(e), 'current_version': e.current_version})
+        response.set_etag(str(e.current_version))
+        return response, 409
     except Exception as e:
         return jsonify({'error': str(e)}), 400
 
 
 @api.route('/projects/<int:project_id>/requirements/<int:requirement_id>', methods=['DELETE'])
 def delete_requirement(project_id, requirement_id):
-    """Удаление требования."""
+    """Удаление требования; с ?subtree=1 — вместе со всеми потомками."""
     data = request.get_json(silent=True) or {}
+    subtree = request.args.get('subtree') in ('1', 'true')
 
-    if logic.delete_requirement(project_id, requirement_id, deleted_by=data.get('deleted_by')):
+    deleted = logic.delete_requirement(project_id, requirement_id, deleted_by=data.get('deleted_by'), subtree=subtree)
+    if deleted:
+        if subtree:
+            return jsonify({'message': 'Requirement subtree deleted successfully', 'deleted_count': deleted})
         return jsonify({'message': 'Requirement deleted successfully'})
 
     return jsonify({'error': 'Requirement not found'}), 404
 
 
 @api.route('/projects/<int:project_id>/requirements/<int:requirement_id>/history', methods=['GET'])
+@reads_from_replica
 def get_requirement_history(project_id, requirement_id):
-    """История изменения требования."""
+    """История изменения требования; ?archived=1 — вместе с записями из архива."""
     req = db.session.get(Requirement, requirement_id)
     if not req or req.project_id != project_id:
         return jsonify({'error': 'Requirement not found'}), 404
-    history = logic.get_history(requirement_id)
+    include_archived = request.args.get('archived', '').lower() in ('1', 'true', 'yes')
+    history = logic.get_history(requirement_id, include_archived=include_archived)
     return jsonify([h.to_dict() for h in history])
 
 
+@api.route('/projects/<int:project_id>/history/compact', methods=['POST'])
+@heavy
+def compact_project_history(project_id):
+    """Перенос истории старше срока хранения проекта в архив (пачками, не больше max_batches)."""
+    project = db.session.get(Project, project_id)
+    if not project:
+        return jsonify({'error': 'Project not found'}), 404
+
+    data = request.get_json(silent=True) or {}
+    max_batches = data.get('max_batches', current_app.config['HISTORY_COMPACTION_MAX_BATCHES'])
+    if isinstance(max_batches, bool) or not isinstance(max_batches, int) or max_batches < 1:
+        return jsonify({'error': 'max_batches должен быть положительным целым числом'}), 400
+
+    days = retention_days(project, current_app.config)
+    archived = get_history_archive().compact_project(db.session, project_id, days, max_batches=max_batches)
+    return jsonify({'project_id': project_id, 'history_retention_days': days, 'archived': archived})
+
+
 @api.route('/projects/<int:project_id>/links', methods=['POST'])
 def create_link(project_id):
     """Создание связи между требованиями."""
@@ -230,56 +665,168 @@ def create_link(project_id):
         return jsonify({'error': str(e)}), 400
 
 
-@api.route('/links/<int:link_id>', methods=['DELETE'])
-def delete_link(link_id):
+@api.route('/projects/<int:project_id>/links/<int:link_id>', methods=['DELETE'])
+def delete_link(project_id, link_id):
     """Удаление связи."""
-    if logic.delete_link(link_id):
+    if logic.delete_link(link_id, project_id=project_id):
+        return jsonify({'message': 'Link deleted successfully'})
+    return jsonify({'error': 'Link not found'}), 404
+
+
+@api.route('/links/<int:link_id>', methods=['DELETE'])
+def delete_link_legacy(link_id):
+    """Старый адрес удаления связи; при шардировании без ?project_id связь не найти."""
+    if sharding.get_resolver() is not None and g.get('shard_project_id') is None:
+        return jsonify({'error': 'Используйте DELETE /api/projects/<project_id>/links/<link_id>'}), 400
+    if logic.delete_link(link_id, project_id=g.get('shard_project_id')):
         return jsonify({'message': 'Link deleted successfully'})
     return jsonify({'error': 'Link not found'}), 404
 
 
 @api.route('/projects/<int:project_id>/matrix', methods=['GET'])
+@heavy(when=unpaged)
+@reads_from_replica
 def get_requirements_matrix(project_id):
-    """Матрица пересечений требований."""
-    reqs, matrix, _links = logic.build_matrix(project_id)
-    return jsonify({'requirements': [r.to_dict() for r in reqs], 'matrix': matrix})
+    """Матрица пересечений требований.
 
+    С ?offset/?limit отдается окно строк: ids — все столбцы, requirements и
+    matrix — только строки окна (так матрицу можно подгружать при прокрутке).
+    """
+    if 'offset' not in request.args and 'limit' not in request.args:
+        reqs, matrix, _links = logic.build_matrix(project_id)
+        return jsonify({'requirements': [r.to_dict() for r in reqs], 'matrix': matrix})
 
-@api.route('/projects/<int:project_id>/export', methods=['GET'])
-def export_to_excel(project_id):
-    """Экспорт требований и связей в Excel."""
-    reqs, _matrix, links = logic.build_matrix(project_id)
+    try:
+        offset, limit = _page_args()
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
 
-    exporter = ExportService()
+    ids, reqs, matrix = logic.build_matrix_rows(project_id, offset, limit)
+    return jsonify({
+        'total': len(ids),
+        'offset': offset,
+        'ids': ids,
+        'requirements': [r.to_dict() for r in reqs],
+        'matrix': matrix,
+    })
+
+
+@api.route('/projects/<int:project_id>/layout', methods=['GET'])
+@heavy
+@reads_from_replica
+def get_mind_map_layout(project_id):
+    """Координаты узлов Mind Map, посчитанные на сервере (кешируются по ревизии проекта)."""
+    layout = project_layout(db.session, project_id)
+    if layout is None:
+        return jsonify({'error': 'Project not found'}), 404
+    return jsonify(layout)
 
-    temp_file = tempfile.NamedTemporaryFile(delete=False, suffix='.xlsx')
-    temp_file.close()
 
-    exporter.export_to_excel(reqs, links, temp_file.name)
+MAX_SUGGESTIONS = 50
+# Пачка подсказок больше этого числа требований считается тяжелым запросом
+LIGHT_SUGGESTION_BATCH = 64
 
-    return send_file(
-        temp_file.name,
-        mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
-        as_attachment=True,
-        download_name='requirements_trace.xlsx'
-    )
+
+def _suggestion_args(args):
+    k = args.get('k', 10)
+    if isinstance(k, bool) or not str(k).isdigit() or not 1 <= int(k) <= MAX_SUGGESTIONS:
+        raise ValueError(f'k должен быть целым числом от 1 до {MAX_SUGGESTIONS}')
+    link_type = args.get('link_type')
+    if link_type is not None:
+        try:
+            link_type = LinkType(link_type)
+        except ValueError:
+            raise ValueError('Invalid link_type') from None
+    return int(k), link_type
+
+
+def _large_suggestion_batch():
+    data = request.get_json(silent=True) or {}
+    ids = data.get('requirement_ids') if isinstance(data, dict) else None
+    return isinstance(ids, list) and len(ids) > LIGHT_SUGGESTION_BATCH
+
+
+@api.route('/projects/<int:project_id>/requirements/<int:requirement_id>/suggestions', methods=['GET'])
+@reads_from_replica
+def get_link_suggestions(project_id, requirement_id):
+    """Похожие требования проекта — кандидаты в цели связи (?k=10&link_type=...)."""
+    try:
+        k, link_type = _suggestion_args(request.args)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    suggestions = suggest_links(db.session, project_id, [requirement_id], k, link_type)
+    if suggestions is None:
+        return jsonify({'error': 'Project not found'}), 404
+    if requirement_id not in suggestions:
+        return jsonify({'error': 'Requirement not found'}), 404
+    return jsonify({'requirement_id': requirement_id, 'suggestions': suggestions[requirement_id]})
+
+
+@api.route('/projects/<int:project_id>/links/suggestions', methods=['POST'])
+@heavy(when=_large_suggestion_batch)
+@reads_from_replica
+def get_batch_link_suggestions(project_id):
+    """Подсказки связей для пачки требований (например, только что импортированных).
+
+    Тело: {"requirement_ids": [...], "k": 10, "link_type": "Реализует"}; требования
+    не из проекта получают пустой список.
+    """
+    data = request.get_json(silent=True) or {}
+    ids = data.get('requirement_ids')
+    if not isinstance(ids, list) or not all(isinstance(i, int) and not isinstance(i, bool) for i in ids):
+        return jsonify({'error': 'requirement_ids должен быть списком целых чисел'}), 400
+    try:
+        k, link_type = _suggestion_args(data)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    ids = list(dict.fromkeys(ids))
+    suggestions = suggest_links(db.session, project_id, ids, k, link_type)
+    if suggestions is None:
+        return jsonify({'error': 'Project not found'}), 404
+    return jsonify({'suggestions': {str(req_id): suggestions.get(req_id, []) for req_id in ids}})
+
+
+@api.route('/projects/<int:project_id>/export', methods=['GET'])
+@heavy
+@reads_from_replica
+def export_to_excel(project_id):
+    """Экспорт требований и связей в Excel."""
+    return _send_cached_export(
+        project_id, f'requirements-v{ExportService.FORMAT_VERSION}', ExportService().export_to_excel,
+        'requirements_trace.xlsx')
 
 
 @api.route('/projects/<int:project_id>/export/matrix', methods=['GET'])
+@heavy
+@reads_from_replica
 def export_matrix_to_excel(project_id):
     """Экспорт матрицы пересечений в Excel."""
-    reqs, _matrix, links = logic.build_matrix(project_id)
+    return _send_cached_export(
+        project_id, 'matrix', ExportService().export_matrix_to_excel, 'requirements_matrix.xlsx')
 
-    exporter = ExportService()
 
-    temp_file = tempfile.NamedTemporaryFile(delete=False, suffix='.xlsx')
-    temp_file.close()
+def _send_cached_export(project_id, kind, export, download_name):
+    """Отдает экспорт из дискового кеша, собирая его только при смене ревизии проекта."""
+    project = Project.query.get(project_id)
+    if not project:
+        return jsonify({'error': 'Project not found'}), 404
 
-    exporter.export_matrix_to_excel(reqs, links, temp_file.name)
+    def build(path):
+        reqs, _matrix, links = logic.build_matrix(project_id)
+        export(reqs, links, path)
+
+    def send(path):
+        # По пути send_file знает размер файла, поэтому отвечает на Range кодом 206
+        return send_file(
+            path,
+            mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+            as_attachment=True,
+            download_name=download_name,
+            conditional=True,
+            etag=f'{project_id}-{kind}-{project.cache_token}-{project.revision}',
+        )
 
-    return send_file(
-        temp_file.name,
-        mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
-        as_attachment=True,
-        download_name='requirements_matrix.xlsx'
-    )
+    return get_export_cache().send_or_build(
+        project_id, kind, project.cache_token, project.revision, build, send)
@@ -1,48 +1,35 @@
 from flask import Flask, render_template, abort
-from sqlalchemy import inspect, text
 
 from config import Config
+import admission
 from database import db
 from api.routes import api
 from models.project import Project
+import migrations
+import sharding
+from services import export_cache, graph_snapshot, history_archive, layout_service, suggestion_service
+from services.uploads import UploadRequest
 
 app = Flask(__name__)
+app.request_class = UploadRequest
 app.config.from_object(Config)
 
 # База
 db.init_app(app)
+sharding.init_app(app)
+admission.init_app(app)
+export_cache.init_app(app)
+graph_snapshot.init_app(app)
+history_archive.init_app(app)
+layout_service.init_app(app)
+suggestion_service.init_app(app)
 
 # API ручки
 app.register_blueprint(api, url_prefix='/api')
 
-def ensure_project_id_column():
-    inspector = inspect(db.engine)
-    if 'requirements' not in inspector.get_table_names():
-        return
-
-    columns = [col['name'] for col in inspector.get_columns('requirements')]
-    if 'project_id' in columns:
-        return
-
-    with db.engine.begin() as conn:
-        conn.execute(text("ALTER TABLE requirements ADD COLUMN project_id INTEGER"))
-
-    project = Project.query.order_by(Project.id.asc()).first()
-    if not project:
-        project = Project(name="Default project", description="Auto-created project")
-        db.session.add(project)
-        db.session.commit()
-
-    db.session.execute(
-        text("UPDATE requirements SET project_id = :project_id WHERE project_id IS NULL"),
-        {"project_id": project.id},
-    )
-    db.session.commit()
-
-
 @app.route('/')
 def index():
-    projects = Project.query.order_by(Project.created_at.desc()).all()
+    # Список проектов страница загружает сама через /api/projects постранично
     return render_template('login.html')
 
 
@@ -55,7 +42,6 @@ def project_home(project_id: int):
 
 if __name__ == '__main__':
     with app.app_context():
-        db.create_all()
-        ensure_project_id_column()
+        migrations.upgrade()
 
     app.run(debug=False)
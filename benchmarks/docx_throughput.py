@@ -0,0 +1,56 @@
+"""Пропускная способность разбора DOCX (абзацев в секунду).
+
+    python -m benchmarks.docx_throughput --requirements 50000 --repeat 3
+
+Замеряет отдельно чтение документа (DocxReader) и полный parse.
+"""
+
+import argparse
+import json
+import statistics
+import time
+
+from benchmarks.synthetic import generate_docx
+from config import Config
+from services.docx_import_service import DocxImportService, DocxReader
+
+
+def measure(requirements=10000, repeat=3, seed=0):
+    docx_bytes = generate_docx(requirements, seed=seed)
+    reader = DocxReader()
+    service = DocxImportService(aliases=Config.REQUIREMENT_TYPE_ALIASES)
+    paragraphs = len(reader.read_paragraphs(docx_bytes))
+
+    read_runs, parse_runs = [], []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        reader.read_paragraphs(docx_bytes)
+        read_runs.append(time.perf_counter() - started)
+
+        started = time.perf_counter()
+        drafts = service.parse(docx_bytes)
+        parse_runs.append(time.perf_counter() - started)
+
+    read_median = statistics.median(read_runs)
+    parse_median = statistics.median(parse_runs)
+    return {
+        "paragraphs": paragraphs,
+        "drafts": len(drafts),
+        "docx_bytes": len(docx_bytes),
+        "read_seconds": round(read_median, 4),
+        "parse_seconds": round(parse_median, 4),
+        "paragraphs_per_second": round(paragraphs / parse_median, 1),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Пропускная способность импорта DOCX")
+    parser.add_argument("--requirements", type=int, default=10000)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+    print(json.dumps(measure(args.requirements, args.repeat, args.seed), ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,429 @@
+"""Нагрузочный тест API: много одновременных клиентов со смешанной нагрузкой.
+
+Поднимает приложение в многопоточном werkzeug-сервере поверх временной
+SQLite (или БД из --database-url), заполняет проект синтетическими
+данными и гоняет запросы из --clients потоков в течение --duration секунд.
+
+    python -m benchmarks.load_test --clients 20 --duration 30 \\
+        --mix create=15,update=30,link=10,list=25,matrix=5,import=2,export=3 \\
+        --journal-mode wal --busy-timeout 5000 --output load.json
+
+Отчет: пропускная способность, p50/p95/p99 по каждой операции, ошибки
+(отдельно — «database is locked») и счетчики конкуренции на уровне БД:
+число блокировок, время SQL-записей и транзакций.
+"""
+
+import argparse
+from collections import defaultdict
+import http.client
+import json
+import logging
+import os
+import random
+import tempfile
+import threading
+import time
+import uuid
+
+DEFAULT_MIX = "create=15,update=30,link=10,list=25,matrix=5,import=2,export=3"
+LOCK_MARKERS = ("database is locked", "database table is locked", "could not obtain lock", "deadlock")
+
+
+def parse_mix(text):
+    """'create=15,update=30' -> {'create': 15.0, 'update': 30.0}"""
+    mix = {}
+    for part in text.split(","):
+        name, _, weight = part.partition("=")
+        name = name.strip()
+        if name not in OPERATIONS:
+            raise ValueError(f"неизвестная операция {name!r}, допустимо: {', '.join(OPERATIONS)}")
+        mix[name] = float(weight or 1)
+    if not any(mix.values()):
+        raise ValueError("все веса нулевые")
+    return mix
+
+
+def _percentile(sorted_values, share):
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, max(0, round(share * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+class Workload:
+    """Общее состояние клиентов: пул id требований и связей проекта."""
+
+    def __init__(self, project_id, requirement_ids, docx_bytes):
+        self.project_id = project_id
+        self.base = f"/api/projects/{project_id}"
+        self.requirement_ids = list(requirement_ids)
+        self.link_ids = []
+        self.docx_bytes = docx_bytes
+        self._lock = threading.Lock()
+
+    def random_requirement(self, rng):
+        with self._lock:
+            return rng.choice(self.requirement_ids)
+
+    def add_requirement(self, requirement_id):
+        with self._lock:
+            self.requirement_ids.append(requirement_id)
+
+    def add_link(self, link_id):
+        with self._lock:
+            self.link_ids.append(link_id)
+
+    def pop_link(self, rng):
+        with self._lock:
+            if not self.link_ids:
+                return None
+            return self.link_ids.pop(rng.randrange(len(self.link_ids)))
+
+    @property
+    def size(self):
+        return len(self.requirement_ids)
+
+
+class Client:
+    """HTTP-клиент с keep-alive; одно соединение на поток."""
+
+    def __init__(self, host, port):
+        self.host = host
+        self.port = port
+        self.conn = None
+
+    def request(self, method, path, body=None, headers=None):
+        for attempt in range(2):
+            if self.conn is None:
+                self.conn = http.client.HTTPConnection(self.host, self.port, timeout=120)
+            try:
+                self.conn.request(method, path, body=body, headers=headers or {})
+                response = self.conn.getresponse()
+                return response.status, response.read()
+            except (ConnectionError, http.client.HTTPException):
+                self.conn.close()
+                self.conn = None
+                if attempt:
+                    raise
+
+    def json(self, method, path, payload=None):
+        body = json.dumps(payload).encode("utf-8") if payload is not None else None
+        return self.request(method, path, body, {"Content-Type": "application/json"} if body else None)
+
+
+def _multipart(field, filename, content):
+    boundary = uuid.uuid4().hex
+    body = (
+        f"--{boundary}\r\n"
+        f'Content-Disposition: form-data; name="{field}"; filename="{filename}"\r\n'
+        "Content-Type: application/octet-stream\r\n\r\n"
+    ).encode("utf-8") + content + f"\r\n--{boundary}--\r\n".encode("utf-8")
+    return body, {"Content-Type": f"multipart/form-data; boundary={boundary}"}
+
+
+# Операции: (client, workload, rng) -> (status, body)
+
+def op_create(client, workload, rng):
+    status, body = client.json("POST", f"{workload.base}/requirements", {
+        "title": f"load {rng.randrange(10 ** 6)}",
+        "description": "нагрузочный тест",
+        "requirement_type": "Функциональное требование",
+    })
+    if status == 201:
+        workload.add_requirement(json.loads(body)["id"])
+    return status, body
+
+
+def op_update(client, workload, rng):
+    requirement_id = workload.random_requirement(rng)
+    return client.json("PUT", f"{workload.base}/requirements/{requirement_id}", {
+        "description": f"правка {rng.randrange(10 ** 6)}",
+        "changed_by": "load-test",
+    })
+
+
+def op_link(client, workload, rng):
+    # Половина правок связей — удаление ранее созданной связи
+    link_id = workload.pop_link(rng) if rng.random() < 0.5 else None
+    if link_id is not None:
+        return client.request("DELETE", f"/api/projects/{workload.project_id}/links/{link_id}")
+
+    source_id = workload.random_requirement(rng)
+    target_id = workload.random_requirement(rng)
+    status, body = client.json("POST", f"{workload.base}/links", {
+        "source_id": source_id,
+        "target_id": target_id,
+        "link_type": rng.choice(["Реализует", "Зависит от", "Противоречит"]),
+    })
+    if status == 201:
+        workload.add_link(json.loads(body)["id"])
+    elif status == 400 and source_id == target_id:
+        status = 200  # петля отклоняется по правилам, это не ошибка нагрузки
+    return status, body
+
+
+def op_list(client, workload, rng):
+    offset = rng.randrange(max(workload.size - 50, 1))
+    return client.request("GET", f"{workload.base}/requirements?offset={offset}&limit=50")
+
+
+def op_matrix(client, workload, rng):
+    offset = rng.randrange(max(workload.size - 100, 1))
+    return client.request("GET", f"{workload.base}/matrix?offset={offset}&limit=100")
+
+
+def op_import(client, workload, rng):
+    body, headers = _multipart("file", "load.docx", workload.docx_bytes)
+    return client.request("POST", f"{workload.base}/requirements/import/docx", body, headers)
+
+
+def op_export(client, workload, rng):
+    return client.request("GET", f"{workload.base}/export")
+
+
+OPERATIONS = {
+    "create": op_create,
+    "update": op_update,
+    "link": op_link,
+    "list": op_list,
+    "matrix": op_matrix,
+    "import": op_import,
+    "export": op_export,
+}
+
+
+class Stats:
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+        self.lock_errors = defaultdict(int)
+        self.shed = defaultdict(int)
+        self._lock = threading.Lock()
+
+    def record(self, name, seconds, status, body):
+        # 429 — отказ контроля допуска (admission.py), считается отдельно от ошибок
+        is_shed = status == 429
+        is_error = status >= 400 and not is_shed
+        is_lock = is_error and any(marker in body.decode("utf-8", "replace").lower() for marker in LOCK_MARKERS)
+        with self._lock:
+            self.latencies[name].append(seconds)
+            if is_error:
+                self.errors[name] += 1
+            if is_lock:
+                self.lock_errors[name] += 1
+            if is_shed:
+                self.shed[name] += 1
+
+    def report(self, elapsed):
+        operations = {}
+        for name, values in sorted(self.latencies.items()):
+            values = sorted(values)
+            operations[name] = {
+                "requests": len(values),
+                "throughput_rps": round(len(values) / elapsed, 2),
+                "errors": self.errors[name],
+                "lock_errors": self.lock_errors[name],
+                "shed": self.shed[name],
+                "p50_ms": round(_percentile(values, 0.50) * 1000, 2),
+                "p95_ms": round(_percentile(values, 0.95) * 1000, 2),
+                "p99_ms": round(_percentile(values, 0.99) * 1000, 2),
+                "max_ms": round(values[-1] * 1000, 2),
+            }
+        total = sum(len(v) for v in self.latencies.values())
+        return {
+            "elapsed_seconds": round(elapsed, 3),
+            "requests": total,
+            "throughput_rps": round(total / elapsed, 2),
+            "errors": sum(self.errors.values()),
+            "lock_errors": sum(self.lock_errors.values()),
+            "shed": sum(self.shed.values()),
+            "operations": operations,
+        }
+
+
+class DbContention:
+    """Счетчики на уровне движка SQLAlchemy: блокировки, время записей и транзакций."""
+
+    WRITE_PREFIXES = ("INSERT", "UPDATE", "DELETE")
+
+    def __init__(self, engine):
+        from sqlalchemy import event
+
+        self.locked = 0
+        self.statements = 0
+        self.write_statements = 0
+        self.write_seconds = []
+        self.transaction_seconds = []
+        self._lock = threading.Lock()
+
+        event.listen(engine, "before_cursor_execute", self._before_execute)
+        event.listen(engine, "after_cursor_execute", self._after_execute)
+        event.listen(engine, "handle_error", self._on_error)
+        event.listen(engine, "begin", self._on_begin)
+        event.listen(engine, "commit", self._on_end)
+        event.listen(engine, "rollback", self._on_end)
+
+    def _before_execute(self, conn, _cursor, _statement, _params, context, _executemany):
+        context._load_test_started = time.perf_counter()
+
+    def _after_execute(self, conn, _cursor, statement, _params, context, _executemany):
+        seconds = time.perf_counter() - context._load_test_started
+        is_write = statement.lstrip().upper().startswith(self.WRITE_PREFIXES)
+        with self._lock:
+            self.statements += 1
+            if is_write:
+                self.write_statements += 1
+                self.write_seconds.append(seconds)
+
+    def _on_error(self, context):
+        if any(marker in str(context.original_exception).lower() for marker in LOCK_MARKERS):
+            with self._lock:
+                self.locked += 1
+
+    def _on_begin(self, conn):
+        conn.info["load_test_begin"] = time.perf_counter()
+
+    def _on_end(self, conn):
+        started = conn.info.pop("load_test_begin", None)
+        if started is not None:
+            with self._lock:
+                self.transaction_seconds.append(time.perf_counter() - started)
+
+    def report(self):
+        writes = sorted(self.write_seconds)
+        transactions = sorted(self.transaction_seconds)
+        return {
+            "lock_errors": self.locked,
+            "statements": self.statements,
+            "write_statements": self.write_statements,
+            "write_p95_ms": round((_percentile(writes, 0.95) or 0) * 1000, 2),
+            "write_max_ms": round((writes[-1] if writes else 0) * 1000, 2),
+            "transactions": len(transactions),
+            "transaction_p95_ms": round((_percentile(transactions, 0.95) or 0) * 1000, 2),
+            "transaction_max_ms": round((transactions[-1] if transactions else 0) * 1000, 2),
+        }
+
+
+def _tune_sqlite(engine, journal_mode, busy_timeout):
+    from sqlalchemy import event
+
+    if engine.dialect.name != "sqlite":
+        return
+
+    @event.listens_for(engine, "connect")
+    def _set_pragmas(dbapi_connection, _record):
+        if journal_mode:
+            dbapi_connection.execute(f"PRAGMA journal_mode={journal_mode}")
+        if busy_timeout is not None:
+            dbapi_connection.execute(f"PRAGMA busy_timeout={int(busy_timeout)}")
+
+
+def run(args):
+    # Config читает DATABASE_URL при импорте, поэтому приложение импортируется здесь
+    from werkzeug.serving import make_server
+
+    from app import app
+    from database import db
+    import migrations
+    from benchmarks.synthetic import generate_project, generate_docx
+    from models.requirement import Requirement
+
+    mix = parse_mix(args.mix)
+    with app.app_context():
+        _tune_sqlite(db.engine, args.journal_mode, args.busy_timeout)
+        db.engine.dispose()  # новые соединения открываются уже с PRAGMA
+        migrations.upgrade()
+        project_id = generate_project(
+            f"load-{uuid.uuid4().hex[:8]}",
+            requirements=args.requirements,
+            links_per_requirement=args.link_density,
+            history_per_requirement=1,
+            seed=args.seed,
+        )
+        requirement_ids = [row[0] for row in db.session.query(Requirement.id)
+                           .filter(Requirement.project_id == project_id)]
+        contention = DbContention(db.engine)
+
+    logging.getLogger("werkzeug").setLevel(logging.WARNING)  # без строки лога на каждый запрос
+    workload = Workload(project_id, requirement_ids, generate_docx(args.docx_requirements, seed=args.seed))
+    server = make_server("127.0.0.1", 0, app, threaded=True)
+    server_thread = threading.Thread(target=server.serve_forever, daemon=True)
+    server_thread.start()
+
+    stats = Stats()
+    names = list(mix)
+    weights = [mix[name] for name in names]
+    deadline = time.perf_counter() + args.duration
+
+    def worker(index):
+        rng = random.Random(args.seed * 1000 + index)
+        client = Client("127.0.0.1", server.server_port)
+        while time.perf_counter() < deadline:
+            name = rng.choices(names, weights=weights)[0]
+            started = time.perf_counter()
+            try:
+                status, body = OPERATIONS[name](client, workload, rng)
+            except OSError as e:
+                status, body = 599, str(e).encode("utf-8")
+            stats.record(name, time.perf_counter() - started, status, body)
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(args.clients)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    server.shutdown()
+
+    report = stats.report(elapsed)
+    report["db"] = contention.report()
+    report["params"] = vars(args)
+    return report
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Нагрузочный тест API TraceReq")
+    parser.add_argument("--clients", type=int, default=20, help="число одновременных клиентов")
+    parser.add_argument("--duration", type=float, default=30, help="длительность, секунд")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help="веса операций: " + ", ".join(OPERATIONS))
+    parser.add_argument("--requirements", type=int, default=2000, help="требований в проекте перед стартом")
+    parser.add_argument("--link-density", type=float, default=1.5)
+    parser.add_argument("--docx-requirements", type=int, default=50, help="пунктов в импортируемом DOCX")
+    parser.add_argument("--database-url", help="БД вместо временной SQLite")
+    parser.add_argument("--journal-mode", choices=["delete", "wal"], help="PRAGMA journal_mode для SQLite")
+    parser.add_argument("--busy-timeout", type=int, help="PRAGMA busy_timeout для SQLite, мс")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="куда записать JSON-отчет")
+    return parser.parse_args(argv)
+
+
+def _print_report(report):
+    print(f"{'операция':10s} {'запросов':>9s} {'rps':>8s} {'ошибок':>7s} {'lock':>5s} {'429':>5s} "
+          f"{'p50, мс':>9s} {'p95, мс':>9s} {'p99, мс':>9s}")
+    for name, row in report["operations"].items():
+        print(f"{name:10s} {row['requests']:9d} {row['throughput_rps']:8.1f} {row['errors']:7d} "
+              f"{row['lock_errors']:5d} {row['shed']:5d} {row['p50_ms']:9.1f} {row['p95_ms']:9.1f} {row['p99_ms']:9.1f}")
+    print(f"всего: {report['requests']} запросов, {report['throughput_rps']} rps, "
+          f"ошибок {report['errors']}, из них блокировок {report['lock_errors']}, отклонено (429) {report['shed']}")
+    print("БД: " + ", ".join(f"{k}={v}" for k, v in report["db"].items()))
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.database_url:
+        os.environ["DATABASE_URL"] = args.database_url
+    else:
+        workdir = tempfile.mkdtemp(prefix="tracereq-load-")
+        os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(workdir, 'load.db')}"
+        os.environ.setdefault("EXPORT_CACHE_DIR", os.path.join(workdir, "export_cache"))
+
+    report = run(args)
+    _print_report(report)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as fh:
+            json.dump(report, fh, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,155 @@
+"""Проверка маршрутизации чтения на реплики на двух локальных файлах SQLite.
+
+    python -m benchmarks.replica_routing --requests 20 [--check]
+
+Основная БД и две реплики — копии одного файла SQLite; реплики подключаются
+read-only (mode=ro). Чтобы по ответу было видно, откуда он прочитан, проект в
+каждой реплике переименовывается в ее имя. Для каждого GET-запроса
+считаются SQL-операторы по движкам и проверяется, что:
+
+* весь запрос читает из одной реплики (ревизия проекта и строки не могут
+  прийти из разных копий);
+* между запросами используются обе реплики;
+* запись идет в основную БД, и тот же клиент сразу после нее читает свою
+  запись из основной БД, а другой клиент — из реплики;
+* по истечении READ_YOUR_WRITES_SECONDS клиент снова читает из реплик.
+
+С --check нарушение любой проверки завершает процесс с кодом 1.
+"""
+
+import argparse
+import json
+import os
+import shutil
+import sqlite3
+import sys
+import tempfile
+import time
+
+READ_YOUR_WRITES_SECONDS = 0.5
+REPLICAS = ("replica_0", "replica_1")
+
+
+def _counting(engines):
+    """Счетчики SQL-операторов по именам движков."""
+    from sqlalchemy import event
+
+    counts = dict.fromkeys(engines, 0)
+
+    def listener(name):
+        def count(*_args):
+            counts[name] += 1
+        return count
+
+    for name, engine in engines.items():
+        event.listen(engine, "before_cursor_execute", listener(name))
+    return counts
+
+
+def _request(client, counts, method, url, **kwargs):
+    """Ответ и движки, которые выполняли SQL этого запроса."""
+    for name in counts:
+        counts[name] = 0
+    response = getattr(client, method)(url, **kwargs)
+    return response, sorted(name for name, count in counts.items() if count)
+
+
+def run(args, workdir):
+    from app import app
+    from database import db
+    import migrations
+
+    primary_path = os.path.join(workdir, "primary.db")
+    with app.app_context():
+        migrations.upgrade()
+    client = app.test_client()
+    project_id = client.post("/api/projects", json={"name": "primary"}).get_json()["id"]
+    for i in range(args.requirements):
+        client.post(f"/api/projects/{project_id}/requirements",
+                    json={"title": f"Требование {i}", "requirement_type": "Функциональное требование"})
+
+    with app.app_context():
+        db.engine.dispose()
+        for name in REPLICAS:
+            path = os.path.join(workdir, f"{name}.db")
+            shutil.copyfile(primary_path, path)
+            with sqlite3.connect(path) as connection:
+                connection.execute("UPDATE projects SET name = ? WHERE id = ?", (name, project_id))
+        engines = {"primary" if key is None else key: engine for key, engine in db.engines.items()}
+    counts = _counting(engines)
+
+    failures = []
+    report = {"params": vars(args)}
+
+    # Чтение: каждый запрос целиком из одной реплики, обе реплики в ходу
+    reader = app.test_client()
+    used = {}
+    mixed = []
+    for i in range(args.requests):
+        url = (f"/api/projects/{project_id}/export", f"/api/projects/{project_id}/matrix",
+               "/api/projects")[i % 3]
+        response, engines_used = _request(reader, counts, "get", url)
+        if response.status_code != 200:
+            failures.append(f"GET {url}: {response.status_code}")
+        if len(engines_used) != 1 or engines_used[0] not in REPLICAS:
+            mixed.append({"url": url, "engines": engines_used})
+        for name in engines_used:
+            used[name] = used.get(name, 0) + 1
+    report["reads"] = {"requests_per_engine": used, "mixed_requests": mixed}
+    if mixed:
+        failures.append("запрос читал не из одной реплики")
+    if set(used) != set(REPLICAS):
+        failures.append("использованы не все реплики")
+
+    # Запись и чтение своей записи
+    writer = app.test_client()
+    response, write_engines = _request(writer, counts, "post", f"/api/projects/{project_id}/requirements",
+                                       json={"title": "Новое", "requirement_type": "Функциональное требование"})
+    new_id = response.get_json()["id"]
+    own, own_engines = _request(writer, counts, "get", f"/api/projects/{project_id}/requirements")
+    other, other_engines = _request(reader, counts, "get", f"/api/projects/{project_id}/requirements")
+    time.sleep(READ_YOUR_WRITES_SECONDS)
+    later, later_engines = _request(writer, counts, "get", f"/api/projects/{project_id}/requirements")
+    ids = lambda response: {item["id"] for item in response.get_json()}
+    report["read_your_writes"] = {
+        "write": write_engines,
+        "own_read": own_engines,
+        "other_client_read": other_engines,
+        "own_read_after_window": later_engines,
+    }
+    if write_engines != ["primary"]:
+        failures.append(f"запись шла в {write_engines}")
+    if own_engines != ["primary"] or new_id not in ids(own):
+        failures.append("клиент не увидел свою запись")
+    if len(other_engines) != 1 or other_engines[0] not in REPLICAS or new_id in ids(other):
+        failures.append("другой клиент читал не из реплики")
+    if len(later_engines) != 1 or later_engines[0] not in REPLICAS or new_id in ids(later):
+        failures.append("после READ_YOUR_WRITES_SECONDS клиент не вернулся к репликам")
+
+    report["failures"] = failures
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Маршрутизация чтения на реплики SQLite")
+    parser.add_argument("--requests", type=int, default=20, help="GET-запросов на проверку выбора реплики")
+    parser.add_argument("--requirements", type=int, default=20, help="требований в проекте")
+    parser.add_argument("--check", action="store_true", help="код выхода 1, если проверка не прошла")
+    args = parser.parse_args(argv)
+
+    workdir = tempfile.mkdtemp(prefix="tracereq-replicas-")
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(workdir, 'primary.db')}"
+    os.environ["DATABASE_READ_URLS"] = ",".join(
+        f"sqlite:///file:{os.path.join(workdir, name)}.db?mode=ro&uri=true" for name in REPLICAS)
+    os.environ["READ_YOUR_WRITES_SECONDS"] = str(READ_YOUR_WRITES_SECONDS)
+    os.environ["EXPORT_CACHE_DIR"] = os.path.join(workdir, "export_cache")
+
+    report = run(args, workdir)
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+    if args.check and report["failures"]:
+        print("Маршрутизация на реплики не прошла проверку", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,170 @@
+"""Замер горячих путей API на синтетическом проекте.
+
+Запуск (офлайн, во временной SQLite):
+
+    python -m benchmarks.run_benchmarks --requirements 2000 --output bench.json
+
+Результаты пишутся в JSON, чтобы сравнивать прогоны между коммитами.
+"""
+
+import argparse
+from io import BytesIO
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+
+def _git_revision():
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"],
+            stderr=subprocess.DEVNULL,
+            text=True,
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _summary(runs):
+    return {
+        "runs": [round(r, 6) for r in runs],
+        "min": round(min(runs), 6),
+        "median": round(statistics.median(runs), 6),
+        "mean": round(statistics.fmean(runs), 6),
+    }
+
+
+def _timed(fn, repeat):
+    runs = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        response = fn()
+        runs.append(time.perf_counter() - started)
+        if response is not None and response.status_code >= 400:
+            raise RuntimeError(f"HTTP {response.status_code}: {response.get_data(as_text=True)[:200]}")
+    return _summary(runs)
+
+
+def run(args):
+    """Генерирует данные, прогоняет сценарии и возвращает словарь результатов."""
+    # Config читает DATABASE_URL при импорте, поэтому приложение импортируется здесь
+    from app import app
+    from database import db
+    import migrations
+    from benchmarks.synthetic import generate_project, generate_docx
+    from models.requirement import Requirement
+
+    with app.app_context():
+        migrations.upgrade()
+
+        started = time.perf_counter()
+        project_id = generate_project(
+            "bench-main",
+            requirements=args.requirements,
+            links_per_requirement=args.link_density,
+            history_per_requirement=args.history,
+            seed=args.seed,
+        )
+        generation_time = time.perf_counter() - started
+
+        sample_id = (db.session.query(Requirement.id)
+                     .filter(Requirement.project_id == project_id)
+                     .order_by(Requirement.id.asc())
+                     .offset(args.requirements // 2)
+                     .limit(1)
+                     .scalar())
+
+        docx_bytes = generate_docx(args.docx_requirements, seed=args.seed)
+        import_project_id = generate_project("bench-import", requirements=0, seed=args.seed)
+
+    client = app.test_client()
+    base = f"/api/projects/{project_id}"
+    results = {}
+
+    results["requirements_list"] = _timed(lambda: client.get(f"{base}/requirements"), args.repeat)
+    results["requirement_single"] = _timed(lambda: client.get(f"{base}/requirements/{sample_id}"), args.repeat)
+    results["requirement_history"] = _timed(
+        lambda: client.get(f"{base}/requirements/{sample_id}/history"), args.repeat)
+    results["matrix"] = _timed(lambda: client.get(f"{base}/matrix"), args.repeat)
+    results["export_requirements"] = _timed(lambda: client.get(f"{base}/export"), args.repeat)
+    results["export_matrix"] = _timed(lambda: client.get(f"{base}/export/matrix"), args.repeat)
+    results["requirement_create"] = _timed(lambda: client.post(
+        f"{base}/requirements",
+        json={"title": "bench", "description": "bench", "requirement_type": "Функциональное требование"},
+    ), args.repeat)
+    results["requirement_update"] = _timed(lambda: client.put(
+        f"{base}/requirements/{sample_id}",
+        json={"description": "bench update", "changed_by": "bench"},
+    ), args.repeat)
+    results["docx_import"] = _timed(lambda: client.post(
+        f"/api/projects/{import_project_id}/requirements/import/docx",
+        data={"file": (BytesIO(docx_bytes), "bench.docx")},
+        content_type="multipart/form-data",
+    ), args.repeat)
+
+    # Удаление разрушительно: на каждый прогон генерируется отдельный проект
+    delete_runs = []
+    for attempt in range(args.repeat):
+        with app.app_context():
+            victim_id = generate_project(
+                f"bench-delete-{attempt}",
+                requirements=args.requirements,
+                links_per_requirement=args.link_density,
+                history_per_requirement=args.history,
+                seed=args.seed + attempt,
+            )
+        started = time.perf_counter()
+        response = client.delete(f"/api/projects/{victim_id}")
+        delete_runs.append(time.perf_counter() - started)
+        if response.status_code >= 400:
+            raise RuntimeError(f"HTTP {response.status_code} при удалении проекта")
+    results["project_delete"] = _summary(delete_runs)
+
+    return {
+        "meta": {
+            "git_revision": _git_revision(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "generation_seconds": round(generation_time, 3),
+            "params": vars(args),
+        },
+        "results": results,
+    }
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Бенчмарк горячих путей TraceReq")
+    parser.add_argument("--requirements", type=int, default=1000, help="число требований в проекте")
+    parser.add_argument("--link-density", type=float, default=1.5, help="среднее число связей на требование")
+    parser.add_argument("--history", type=int, default=3, help="записей истории на требование")
+    parser.add_argument("--docx-requirements", type=int, default=500, help="пунктов в синтетическом DOCX")
+    parser.add_argument("--repeat", type=int, default=3, help="повторов каждого сценария")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default="bench_output.json", help="куда записать JSON")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+
+    workdir = tempfile.mkdtemp(prefix="tracereq-bench-")
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(workdir, 'bench.db')}"
+
+    report = run(args)
+
+    with open(args.output, "w", encoding="utf-8") as fh:
+        json.dump(report, fh, ensure_ascii=False, indent=2)
+
+    for name, summary in report["results"].items():
+        print(f"{name:24s} median={summary['median'] * 1000:9.2f} ms  min={summary['min'] * 1000:9.2f} ms")
+    print(f"Результаты записаны в {args.output}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
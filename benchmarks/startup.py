@@ -0,0 +1,71 @@
+"""Время холодного старта воркера: импорт приложения и первый запрос.
+
+    python -m benchmarks.startup --repeat 5
+
+Каждый замер идет в отдельном процессе интерпретатора. Первый процесс
+создает схему во временной SQLite, остальные стартуют на актуальной схеме.
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+PROBE = r"""
+import json, sys, time
+started = time.perf_counter()
+from app import app
+imported = time.perf_counter()
+import migrations
+with app.app_context():
+    migrations.upgrade()
+migrated = time.perf_counter()
+response = app.test_client().get('/api/projects')
+first_request = time.perf_counter()
+assert response.status_code == 200, response.status_code
+print(json.dumps({
+    "import_seconds": imported - started,
+    "migrate_seconds": migrated - imported,
+    "first_request_seconds": first_request - started,
+    "heavy_modules_loaded": sorted(m for m in ("openpyxl", "docx", "numpy", "scipy") if m in sys.modules),
+}))
+"""
+
+
+def _probe(env, cwd):
+    output = subprocess.check_output([sys.executable, "-c", PROBE], env=env, cwd=cwd, text=True)
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def measure(repeat=5):
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    workdir = tempfile.mkdtemp(prefix="tracereq-startup-")
+    env = dict(os.environ, DATABASE_URL=f"sqlite:///{os.path.join(workdir, 'startup.db')}")
+
+    cold = _probe(env, root)
+    warm = [_probe(env, root) for _ in range(repeat)]
+
+    def median(key):
+        return round(statistics.median(run[key] for run in warm), 4)
+
+    return {
+        "first_boot": {k: round(v, 4) if isinstance(v, float) else v for k, v in cold.items()},
+        "import_seconds": median("import_seconds"),
+        "migrate_seconds": median("migrate_seconds"),
+        "first_request_seconds": median("first_request_seconds"),
+        "heavy_modules_loaded": warm[-1]["heavy_modules_loaded"],
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Время старта приложения")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args(argv)
+    print(json.dumps(measure(args.repeat), ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,203 @@
+"""Накладные расходы на построение запросов в горячих путях logic.py.
+
+    python -m benchmarks.statement_cache --requirements 200 --calls 2000 --repeat 5 [--check]
+
+Для каждого пути сравнивается прежняя реализация (Query собирается на
+каждый вызов) и текущая (операторы собраны один раз при импорте, значения
+передаются параметрами). Проект маленький, чтобы время выполнения SQL не
+заслоняло время построения запроса.
+
+С --check проверяется, что текущие пути не плодят записи в кеше
+скомпилированных операторов: после прогрева вызовы с другими id должны
+попадать в кеш (CACHE_HIT), а размер кеша движка — не расти. Если в
+оператор попадет литерал вместо параметра, проверка завершится с кодом 1.
+"""
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+
+def _per_call(fn, args_list, calls, repeat):
+    """Лучшее из repeat прогонов время одного вызова."""
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for i in range(calls):
+            fn(*args_list[i % len(args_list)])
+        elapsed = (time.perf_counter() - started) / calls
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def _legacy_paths(db, models):
+    """Прежние реализации горячих путей — для сравнения."""
+    from sqlalchemy import update
+
+    Project, Requirement, Link, RequirementHistory = models
+
+    def requirement_with_links(project_id, requirement_id):
+        req = db.session.get(Requirement, requirement_id)
+        outgoing = (db.session.query(Link)
+                    .join(Requirement, Link.target_requirement_id == Requirement.id)
+                    .filter(Link.source_requirement_id == requirement_id)
+                    .all())
+        incoming = (db.session.query(Link)
+                    .join(Requirement, Link.source_requirement_id == Requirement.id)
+                    .filter(Link.target_requirement_id == requirement_id)
+                    .all())
+        return req, outgoing, incoming
+
+    def history(_project_id, requirement_id):
+        return (db.session.query(RequirementHistory)
+                .filter(RequirementHistory.requirement_id == requirement_id)
+                .order_by(RequirementHistory.changed_at.desc())
+                .all())
+
+    def matrix(project_id, _requirement_id):
+        reqs = (db.session.query(Requirement)
+                .filter(Requirement.project_id == project_id)
+                .order_by(Requirement.id.asc())
+                .all())
+        req_ids = [req.id for req in reqs]
+        return (db.session.query(Link)
+                .filter(Link.source_requirement_id.in_(req_ids))
+                .filter(Link.target_requirement_id.in_(req_ids))
+                .all())
+
+    def touch(project_id, _requirement_id):
+        db.session.execute(
+            update(Project)
+            .where(Project.id == project_id)
+            .values(revision=Project.revision + 1)
+            .execution_options(synchronize_session=False)
+        )
+        db.session.rollback()
+
+    return {
+        "requirement_with_links": requirement_with_links,
+        "history": history,
+        "matrix": matrix,
+        "touch_project": touch,
+    }
+
+
+def _current_paths(db, logic):
+    def touch(project_id, _requirement_id):
+        logic._touch_project(project_id)
+        db.session.rollback()
+
+    return {
+        "requirement_with_links": logic.get_requirement_with_links,
+        "history": lambda _project_id, requirement_id: logic.get_history(requirement_id),
+        "matrix": lambda project_id, _requirement_id: logic.build_matrix(project_id),
+        "touch_project": touch,
+    }
+
+
+def check_cache(db, paths, args_list):
+    """Промахи кеша скомпилированных операторов и рост кеша после прогрева."""
+    from sqlalchemy import event
+
+    engine = db.engine
+    misses = []
+
+    def record(_conn, _cursor, statement, _parameters, context, _executemany):
+        if recording and context.cache_hit != context.dialect.CACHE_HIT:
+            misses.append((current, str(context.cache_hit), statement.split("\n")[0][:80]))
+
+    recording, current = False, None
+    event.listen(engine, "after_cursor_execute", record)
+    try:
+        for name, fn in paths.items():
+            fn(*args_list[0])
+        cache_size = len(engine._compiled_cache)
+        recording = True
+        for name, fn in paths.items():
+            current = name
+            for args in args_list[1:]:
+                fn(*args)
+        growth = len(engine._compiled_cache) - cache_size
+    finally:
+        event.remove(engine, "after_cursor_execute", record)
+    return {"misses": misses, "cache_growth": growth}
+
+
+def run(args):
+    from app import app
+    from database import db
+    import logic
+    import migrations
+    from benchmarks.synthetic import generate_project
+    from models.project import Project
+    from models.requirement import Requirement
+    from models.link import Link
+    from models.history import RequirementHistory
+
+    with app.app_context():
+        migrations.upgrade()
+        project_ids = [
+            generate_project(f"stmt-cache-{i}", requirements=args.requirements, seed=args.seed + i)
+            for i in range(2)
+        ]
+        args_list = []
+        for project_id in project_ids:
+            ids = [row[0] for row in (db.session.query(Requirement.id)
+                                      .filter(Requirement.project_id == project_id)
+                                      .order_by(Requirement.id.asc())
+                                      .limit(4))]
+            args_list.extend((project_id, requirement_id) for requirement_id in ids)
+        db.session.rollback()
+
+        legacy = _legacy_paths(db, (Project, Requirement, Link, RequirementHistory))
+        current = _current_paths(db, logic)
+
+        report = {"params": vars(args)}
+        # Проверка идет до замеров: иначе все id из args_list уже были бы в кеше
+        if args.check:
+            report["cache_check"] = check_cache(db, current, args_list)
+
+        results = {}
+        for name in current:
+            calls = args.calls if name != "matrix" else max(args.calls // 20, 10)
+            for fn in (legacy[name], current[name]):
+                fn(*args_list[0])
+            before = _per_call(legacy[name], args_list, calls, args.repeat)
+            after = _per_call(current[name], args_list, calls, args.repeat)
+            results[name] = {
+                "calls": calls,
+                "before_us": round(before * 1e6, 1),
+                "after_us": round(after * 1e6, 1),
+                "speedup": round(before / after, 2) if after else None,
+            }
+
+        report["results"] = results
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Стоимость построения запросов в горячих путях")
+    parser.add_argument("--requirements", type=int, default=200, help="требований в каждом из двух проектов")
+    parser.add_argument("--calls", type=int, default=2000, help="вызовов каждого пути")
+    parser.add_argument("--repeat", type=int, default=5, help="прогонов, берется лучший")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--check", action="store_true", help="проверить попадания в кеш операторов")
+    args = parser.parse_args(argv)
+
+    workdir = tempfile.mkdtemp(prefix="tracereq-stmt-cache-")
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(workdir, 'bench.db')}"
+
+    report = run(args)
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+
+    check = report.get("cache_check")
+    if check and (check["misses"] or check["cache_growth"]):
+        print("Операторы горячих путей не попадают в кеш компиляции", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
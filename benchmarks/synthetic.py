@@ -0,0 +1,193 @@
+"""Генерация синтетических проектов и DOCX-спецификаций для бенчмарков"""
+
+from datetime import datetime, timedelta
+from io import BytesIO
+import random
+
+from docx import Document
+from sqlalchemy import func, insert
+
+from database import db
+from models.project import Project
+from models.requirement import Requirement, RequirementType, RequirementStatus, Priority
+from models.link import Link, LinkType
+from models.history import RequirementHistory
+from sharding import project_scope
+
+# Примерное распределение типов в реальных спецификациях
+TYPE_WEIGHTS = {
+    RequirementType.BUSINESS: 0.10,
+    RequirementType.USER: 0.15,
+    RequirementType.FUNCTIONAL: 0.50,
+    RequirementType.NON_FUNCTIONAL: 0.15,
+    RequirementType.INTERFACE: 0.10,
+}
+STATUS_WEIGHTS = {
+    RequirementStatus.DRAFT: 0.35,
+    RequirementStatus.IN_PROGRESS: 0.25,
+    RequirementStatus.REVIEW: 0.15,
+    RequirementStatus.APPROVED: 0.20,
+    RequirementStatus.REJECTED: 0.05,
+}
+PRIORITY_WEIGHTS = {
+    Priority.LOW: 0.20,
+    Priority.MEDIUM: 0.45,
+    Priority.HIGH: 0.25,
+    Priority.CRITICAL: 0.10,
+}
+LINK_TYPE_WEIGHTS = {
+    LinkType.IMPLEMENTS: 0.60,
+    LinkType.DEPENDS_ON: 0.35,
+    LinkType.CONTRADICTS: 0.05,
+}
+
+# Заголовки секций DOCX в формате, который понимает DocxImportService
+SECTION_HEADINGS = {
+    RequirementType.BUSINESS: "Бизнес-требования",
+    RequirementType.FUNCTIONAL: "Функциональные требования",
+    RequirementType.NON_FUNCTIONAL: "Нефункциональные требования",
+    RequirementType.USER: "Пользовательские требования",
+    RequirementType.INTERFACE: "Требования к интерфейсу",
+}
+
+SUBJECTS = ["Система", "Сервис", "Пользователь", "Администратор", "Модуль отчетов", "API"]
+VERBS = ["должна обеспечивать", "должен поддерживать", "должен иметь возможность", "должна выполнять"]
+OBJECTS = [
+    "экспорт данных в Excel", "поиск требований по типу", "хранение истории изменений",
+    "аутентификацию пользователей", "построение матрицы трассировки", "импорт документов",
+    "уведомления о смене статуса", "резервное копирование проекта", "ограничение доступа по ролям",
+]
+
+CHUNK_SIZE = 2000
+
+
+def _pick(rng, weights):
+    return rng.choices(list(weights), weights=list(weights.values()))[0]
+
+
+def _sentence(rng):
+    return f"{rng.choice(SUBJECTS)} {rng.choice(VERBS)} {rng.choice(OBJECTS)}"
+
+
+def _insert_chunked(model, rows):
+    for start in range(0, len(rows), CHUNK_SIZE):
+        db.session.execute(insert(model), rows[start:start + CHUNK_SIZE])
+
+
+def generate_project(name, requirements=1000, links_per_requirement=1.5,
+                     history_per_requirement=3, seed=0):
+    """Создает проект с N требованиями, связями и K записями истории на требование.
+
+    Вставка идет пачками через Core, id назначаются явно, чтобы связи
+    можно было построить без повторного чтения из БД. Возвращает project_id.
+    """
+    rng = random.Random(seed)
+
+    project = Project(name=name, description="Синтетический проект для бенчмарков")
+    db.session.add(project)
+    db.session.flush()
+
+    with project_scope(project.id):
+        _fill_project(rng, project.id, requirements, links_per_requirement, history_per_requirement)
+
+    db.session.commit()
+    return project.id
+
+
+def _fill_project(rng, project_id, requirements, links_per_requirement, history_per_requirement):
+    first_id = (db.session.query(func.max(Requirement.id)).scalar() or 0) + 1
+    req_ids = list(range(first_id, first_id + requirements))
+    now = datetime.utcnow()
+
+    req_rows = []
+    for offset, req_id in enumerate(req_ids):
+        req_type = _pick(rng, TYPE_WEIGHTS)
+        created_at = now - timedelta(minutes=requirements - offset)
+        req_rows.append({
+            "id": req_id,
+            "project_id": project_id,
+            "title": f"{req_type.value} {offset + 1}",
+            "description": _sentence(rng),
+            "requirement_type": req_type,
+            "status": _pick(rng, STATUS_WEIGHTS),
+            "priority": _pick(rng, PRIORITY_WEIGHTS),
+            "source": "benchmark",
+            "author": rng.choice(["analyst", "architect", "owner"]),
+            "created_at": created_at,
+            "updated_at": created_at,
+        })
+    _insert_chunked(Requirement, req_rows)
+
+    link_rows = []
+    seen = set()
+    if requirements > 1:
+        for _ in range(int(requirements * links_per_requirement)):
+            source_id, target_id = rng.sample(req_ids, 2)
+            if (source_id, target_id) in seen:
+                continue
+            seen.add((source_id, target_id))
+            link_rows.append({
+                "source_requirement_id": source_id,
+                "target_requirement_id": target_id,
+                "link_type": _pick(rng, LINK_TYPE_WEIGHTS),
+            })
+    _insert_chunked(Link, link_rows)
+
+    history_rows = []
+    for row in req_rows:
+        snapshot = {
+            "id": row["id"],
+            "project_id": row["project_id"],
+            "title": row["title"],
+            "description": row["description"],
+            "requirement_type": row["requirement_type"].value,
+            "status": row["status"].value,
+            "priority": row["priority"].value,
+        }
+        for step in range(history_per_requirement):
+            change_type = "CREATE" if step == 0 else "UPDATE"
+            new_values = dict(snapshot, description=f"{snapshot['description']} (ред. {step})")
+            history_rows.append({
+                "requirement_id": row["id"],
+                "change_type": change_type,
+                "old_values": None if step == 0 else snapshot,
+                "new_values": new_values,
+                "changed_by": row["author"],
+                "changed_at": row["created_at"] + timedelta(seconds=step),
+            })
+            snapshot = new_values
+    _insert_chunked(RequirementHistory, history_rows)
+
+
+def generate_docx(requirements=500, seed=0, numbered_ratio=0.3):
+    """Собирает .docx со спецификацией в формате секций <...> и возвращает байты.
+
+    Часть пунктов оформляется стилем списка, часть — текстовыми маркерами
+    или нумерацией, чтобы задействовать все ветки классификации абзацев.
+    """
+    rng = random.Random(seed)
+    document = Document()
+    document.add_paragraph("Спецификация требований (синтетическая)")
+    # Поиск стиля по имени в python-docx линейный, поэтому id стиля берется один раз
+    bullet_style_id = document.styles["List Bullet"].style_id
+
+    by_type = {}
+    for _ in range(requirements):
+        by_type.setdefault(_pick(rng, TYPE_WEIGHTS), []).append(_sentence(rng))
+
+    for req_type, sentences in by_type.items():
+        document.add_paragraph(f"<{SECTION_HEADINGS[req_type]}>")
+        document.add_paragraph("Пояснение к разделу, не являющееся требованием.")
+        for number, sentence in enumerate(sentences, start=1):
+            roll = rng.random()
+            if roll < numbered_ratio:
+                document.add_paragraph(f"{number}. {sentence}")
+            elif roll < numbered_ratio * 2:
+                document.add_paragraph(f"- {sentence}")
+            else:
+                document.add_paragraph(sentence)._p.style = bullet_style_id
+    document.add_paragraph("<конец>")
+
+    buffer = BytesIO()
+    document.save(buffer)
+    return buffer.getvalue()
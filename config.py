@@ -1,7 +1,5 @@
 """Конфигурация приложения"""
 import os
-from models.requirement import RequirementType
-import json
 
 class Config:
     """Базовый класс конфигурации"""
@@ -9,11 +7,75 @@ class Config:
     SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL') or 'sqlite:///requirements_trace.db'
     SQLALCHEMY_TRACK_MODIFICATIONS = False
 
+    # Каталог для шардов проектов (по файлу SQLite на проект); пусто — шардирование выключено
+    SHARD_DIRECTORY = os.environ.get('SHARD_DIRECTORY') or None
+
+    # Реплики для чтения: строки подключения через запятую. Для SQLite можно указать
+    # read-only соединение, например sqlite:///file:requirements_trace.db?mode=ro&cache=shared&uri=true
+    SQLALCHEMY_READ_REPLICAS = [
+        url.strip() for url in (os.environ.get('DATABASE_READ_URLS') or '').split(',') if url.strip()
+    ]
+    SQLALCHEMY_BINDS = {f'replica_{i}': url for i, url in enumerate(SQLALCHEMY_READ_REPLICAS)}
+    # Сколько секунд после записи пользователь читает из основной БД
+    READ_YOUR_WRITES_SECONDS = float(os.environ.get('READ_YOUR_WRITES_SECONDS') or 5)
+
+    # Кеш XLSX-экспортов: каталог (по умолчанию instance/export_cache) и бюджет размера
+    EXPORT_CACHE_DIR = os.environ.get('EXPORT_CACHE_DIR') or None
+    EXPORT_CACHE_MAX_BYTES = int(os.environ.get('EXPORT_CACHE_MAX_BYTES') or 512 * 1024 * 1024)
+
+    # Каталог кеша раскладок Mind Map (по умолчанию instance/layout_cache)
+    LAYOUT_CACHE_DIR = os.environ.get('LAYOUT_CACHE_DIR') or None
+
+    # Каталог снимков графа проектов (.npy, отображаются в память всеми воркерами), например
+    # /dev/shm/tracereq; пусто — снимки выключены
+    GRAPH_SNAPSHOT_DIR = os.environ.get('GRAPH_SNAPSHOT_DIR') or None
+
+    # Архив истории изменений: каталог сегментов (по умолчанию instance/history_archive) и срок
+    # хранения истории в БД по умолчанию, в днях (0 — хранить всё; у проекта можно задать свой)
+    HISTORY_ARCHIVE_DIR = os.environ.get('HISTORY_ARCHIVE_DIR') or None
+    HISTORY_RETENTION_DAYS = int(os.environ.get('HISTORY_RETENTION_DAYS') or 0)
+    # Уплотнение: записей в пачке, пачек на проект за проход и период фонового прохода
+    # в секундах (0 — фоновый поток не запускается)
+    HISTORY_COMPACTION_BATCH = int(os.environ.get('HISTORY_COMPACTION_BATCH') or 1000)
+    HISTORY_COMPACTION_MAX_BATCHES = int(os.environ.get('HISTORY_COMPACTION_MAX_BATCHES') or 10)
+    HISTORY_COMPACTION_INTERVAL = float(os.environ.get('HISTORY_COMPACTION_INTERVAL') or 0)
+
+    # Сколько TF-IDF индексов проектов для подсказок связей держать в памяти воркера
+    SUGGESTION_CACHE_PROJECTS = int(os.environ.get('SUGGESTION_CACHE_PROJECTS') or 8)
+
+    # Размер пачки строк при выгрузке/восстановлении проекта
+    PROJECT_DUMP_CHUNK_SIZE = int(os.environ.get('PROJECT_DUMP_CHUNK_SIZE') or 5000)
+
+    # Размер пачки строк при загрузке XLSX-экспорта обратно в проект
+    XLSX_IMPORT_CHUNK_SIZE = int(os.environ.get('XLSX_IMPORT_CHUNK_SIZE') or 1000)
+
+    # Предельный размер тела запроса (Werkzeug отвечает 413, не дочитывая тело) и отдельно
+    # для загрузки .docx; файлы больше UPLOAD_SPOOL_THRESHOLD буферизуются на диске
+    MAX_CONTENT_LENGTH = int(os.environ.get('MAX_UPLOAD_BYTES') or 256 * 1024 * 1024)
+    DOCX_MAX_UPLOAD_BYTES = int(os.environ.get('DOCX_MAX_UPLOAD_BYTES') or 32 * 1024 * 1024)
+    UPLOAD_SPOOL_THRESHOLD = int(os.environ.get('UPLOAD_SPOOL_THRESHOLD') or 1024 * 1024)
+    # Лимиты структуры .docx, проверяемые по каталогу zip до разбора
+    DOCX_MAX_UNCOMPRESSED_BYTES = int(os.environ.get('DOCX_MAX_UNCOMPRESSED_BYTES') or 256 * 1024 * 1024)
+    DOCX_MAX_ENTRIES = int(os.environ.get('DOCX_MAX_ENTRIES') or 2000)
+
+    # Число процессов для параллельного разбора .docx при пакетном импорте (по умолчанию — число CPU)
+    DOCX_IMPORT_WORKERS = int(os.environ.get('DOCX_IMPORT_WORKERS') or 0) or None
+
+    # Контроль допуска (на процесс воркера): сколько тяжелых (экспорты, импорты, полные списки)
+    # и легких запросов выполняется одновременно и сколько ждет в очереди; 0 — без ограничения.
+    # Запрос сверх очереди или ждавший дольше ADMISSION_QUEUE_TIMEOUT секунд получает 429
+    ADMISSION_HEAVY_CONCURRENCY = int(os.environ.get('ADMISSION_HEAVY_CONCURRENCY') or 2)
+    ADMISSION_HEAVY_QUEUE = int(os.environ.get('ADMISSION_HEAVY_QUEUE') or 8)
+    ADMISSION_LIGHT_CONCURRENCY = int(os.environ.get('ADMISSION_LIGHT_CONCURRENCY') or 32)
+    ADMISSION_LIGHT_QUEUE = int(os.environ.get('ADMISSION_LIGHT_QUEUE') or 128)
+    ADMISSION_QUEUE_TIMEOUT = float(os.environ.get('ADMISSION_QUEUE_TIMEOUT') or 10)
+
+    # Значения — RequirementType.*.value; строками, чтобы конфиг не импортировал модели
     REQUIREMENT_TYPE_ALIASES = {
-        'бизнес-требования': RequirementType.BUSINESS.value,
-        'функциональные требования': RequirementType.FUNCTIONAL.value,
-        'нефункциональные требования': RequirementType.NON_FUNCTIONAL.value,
-        'пользовательские требования': RequirementType.USER.value,
-        'требования к интерфейсу': RequirementType.INTERFACE.value,
+        'бизнес-требования': 'Бизнес-требование',
+        'функциональные требования': 'Функциональное требование',
+        'нефункциональные требования': 'Нефункциональное требование',
+        'пользовательские требования': 'Пользовательское требование',
+        'требования к интерфейсу': 'Требование к интерфейсу',
     }
 
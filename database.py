@@ -1,4 +1,82 @@
 """Инициализация базы данных"""
+from functools import wraps
+import random
+import time
+
+from flask import current_app, g, has_request_context, session as http_session
 from flask_sqlalchemy import SQLAlchemy
+from flask_sqlalchemy.session import Session
+from sqlalchemy import event, inspect
+from sqlalchemy.sql.dml import UpdateBase
+
+import sharding
+
+REPLICA_BIND_PREFIX = 'replica_'
+LAST_WRITE_SESSION_KEY = '_db_last_write'
+
+
+class RoutingSession(Session):
+    """Сессия, которая отправляет чтение в помеченных маршрутах на реплики.
+
+    Запись всегда идет в основную БД. После записи сессия до конца запроса
+    читает из основной БД, а HTTP-сессия пользователя — в течение
+    READ_YOUR_WRITES_SECONDS, чтобы реплики не отдавали устаревшие данные.
+    Реплика выбирается один раз на сессию: все чтения запроса видят одно
+    состояние (ревизию проекта и строки из одной и той же реплики).
+    В режиме шардирования данные проекта читаются и пишутся в его шард.
+    """
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None:
+            shard = sharding.shard_engine_for(inspect(mapper) if mapper is not None else None, clause)
+            if shard is not None:
+                return shard
+        if bind is None and self._reads_from_replica(clause):
+            replica = self.info.get('replica')
+            if replica is None:
+                replicas = [engine for key, engine in self._db.engines.items()
+                            if key and key.startswith(REPLICA_BIND_PREFIX)]
+                if replicas:
+                    replica = self.info['replica'] = random.choice(replicas)
+            if replica is not None:
+                return replica
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+    def _reads_from_replica(self, clause):
+        if not has_request_context() or not g.get('use_read_replica'):
+            return False
+        if self._flushing or self.info.get('wrote') or isinstance(clause, UpdateBase):
+            return False
+        last_write = http_session.get(LAST_WRITE_SESSION_KEY)
+        if last_write and time.time() - last_write < current_app.config['READ_YOUR_WRITES_SECONDS']:
+            return False
+        return True
+
+
+@event.listens_for(RoutingSession, 'after_flush')
+def _mark_flush_write(session, _flush_context):
+    session.info['wrote'] = True
+
+
+@event.listens_for(RoutingSession, 'do_orm_execute')
+def _mark_bulk_write(orm_execute_state):
+    if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+        orm_execute_state.session.info['wrote'] = True
+
+
+@event.listens_for(RoutingSession, 'after_commit')
+def _remember_write(session):
+    if session.info.get('wrote') and has_request_context() and current_app.config.get('SQLALCHEMY_READ_REPLICAS'):
+        http_session[LAST_WRITE_SESSION_KEY] = time.time()
+
+
+def reads_from_replica(view):
+    """Помечает маршрут как читающий: его SELECT-запросы можно отправить на реплику."""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        g.use_read_replica = True
+        return view(*args, **kwargs)
+    return wrapper
+
 
-db = SQLAlchemy()
+db = SQLAlchemy(session_options={'class_': RoutingSession})
@@ -3,15 +3,23 @@
 
 from datetime import datetime
 
-from database import db
-from models.requirement import Requirement
+from sqlalchemy import bindparam, case, event, func, select, update
+from sqlalchemy.orm.attributes import set_committed_value
+
+from database import RoutingSession, db
+import sharding
+from models.project import Project
+from models.requirement import Requirement, RequirementStatus
 from models.link import Link
-from models.history import RequirementHistory
+from models.history import RequirementHistory, HistoryArchiveChunk
+from services import hierarchy
+from services.graph_snapshot import project_snapshot
+from services.history_archive import get_history_archive
+from services.text_normalizer import content_hash
 
 
-def _save_history(requirement_id, change_type, old_values, new_values, who):
-    """Сохраняем событие в историю изменений."""
-    h = RequirementHistory(
+def _history_entry(requirement_id, change_type, old_values, new_values, who):
+    return RequirementHistory(
         requirement_id=requirement_id,
         change_type=change_type,
         old_values=old_values,
@@ -19,8 +27,214 @@ def _save_history(requirement_id, change_type, old_values, new_values, who):
         changed_by=who,
         changed_at=datetime.utcnow(),
     )
-    db.session.add(h)
-    db.session.commit()
+
+
+def _save_history(requirement_id, change_type, old_values, new_values, who):
+    """Добавляем событие в историю изменений.
+
+    Коммит делает вызывающий код: запись истории попадает в ту же транзакцию,
+    что и само изменение, — один fsync и одна блокировка на операцию.
+    """
+    db.session.add(_history_entry(requirement_id, change_type, old_values, new_values, who))
+
+
+# Операторы горячих путей строятся один раз при импорте, значения передаются
+# параметрами: на вызов не тратится сборка запроса и вычисление ключа кеша,
+# а скомпилированный SQL берется из кеша движка (проверка — benchmarks/statement_cache.py)
+_TOUCH_PROJECT = (
+    update(Project)
+    .where(Project.id == bindparam('project_id'))
+    .values(revision=Project.revision + 1)
+    .execution_options(synchronize_session=False)
+)
+# Родитель только что вставленного требования — часть создания: версия и updated_at не меняются
+_SET_NEW_PARENT = (
+    update(Requirement.__table__)
+    .where(Requirement.__table__.c.id == bindparam('req_id'))
+    .values(parent_id=bindparam('new_parent_id'), updated_at=Requirement.__table__.c.updated_at)
+)
+_OUTGOING_LINKS = (
+    select(Link)
+    .join(Requirement, Link.target_requirement_id == Requirement.id)
+    .where(Link.source_requirement_id == bindparam('requirement_id'))
+)
+_INCOMING_LINKS = (
+    select(Link)
+    .join(Requirement, Link.source_requirement_id == Requirement.id)
+    .where(Link.target_requirement_id == bindparam('requirement_id'))
+)
+_REQUIREMENT_HISTORY = (
+    select(RequirementHistory)
+    .where(RequirementHistory.requirement_id == bindparam('requirement_id'))
+    .order_by(RequirementHistory.changed_at.desc())
+)
+_PROJECT_REQUIREMENTS = (
+    select(Requirement)
+    .where(Requirement.project_id == bindparam('project_id'))
+    .order_by(Requirement.id.asc())
+)
+_PROJECT_REQUIREMENT_IDS = select(Requirement.id).where(Requirement.project_id == bindparam('project_id'))
+_PROJECT_LINKS = (
+    select(Link)
+    .where(Link.source_requirement_id.in_(_PROJECT_REQUIREMENT_IDS))
+    .where(Link.target_requirement_id.in_(_PROJECT_REQUIREMENT_IDS))
+)
+
+
+# Проекты, чья ревизия поднимается после коммита шарда (режим шардирования)
+PENDING_REVISIONS_KEY = 'pending_revisions'
+
+
+def touch_project(db_session, project_id):
+    """Поднимаем ревизию проекта: по ней инвалидируются кеши.
+
+    Этим помощником ревизию поднимают все пути записи, в том числе сервисы
+    импорта со своей сессией. Без шардирования ревизия меняется в текущей
+    транзакции. При шардировании данные проекта и ревизия лежат в разных
+    БД, а порядок коммита соединений сессии не задан, поэтому ревизия
+    поднимается отдельной транзакцией каталога после коммита шарда. Иначе
+    другой воркер мог бы увидеть новую ревизию со старыми данными и
+    закешировать их под ней.
+    """
+    if sharding.get_resolver() is None:
+        db_session.execute(_TOUCH_PROJECT, {'project_id': project_id})
+    else:
+        db_session.info.setdefault(PENDING_REVISIONS_KEY, set()).add(project_id)
+
+
+def _touch_project(project_id):
+    touch_project(db.session, project_id)
+
+
+@event.listens_for(RoutingSession, 'after_commit')
+def _bump_pending_revisions(session):
+    project_ids = session.info.pop(PENDING_REVISIONS_KEY, None)
+    if project_ids:
+        with db.engine.begin() as conn:
+            conn.execute(_TOUCH_PROJECT, [{'project_id': project_id} for project_id in sorted(project_ids)])
+
+
+@event.listens_for(RoutingSession, 'after_soft_rollback')
+def _drop_pending_revisions(session, _previous_transaction):
+    session.info.pop(PENDING_REVISIONS_KEY, None)
+
+
+PROJECT_SORTS = {
+    'id': Project.id,
+    'name': Project.name,
+    'created_at': Project.created_at,
+    'revision': Project.revision,
+}
+# Сортировки по агрегатам: требуют статистики всех проектов, недоступны при шардировании
+PROJECT_STAT_SORTS = ('requirement_count', 'link_count', 'last_activity')
+
+
+def _project_stats_queries(project_ids=None):
+    """Сгруппированные по project_id подзапросы: счетчики требований, статусов и связей."""
+    status_columns = [
+        func.sum(case((Requirement.status == status, 1), else_=0)).label(f'status_{i}')
+        for i, status in enumerate(RequirementStatus)
+    ]
+    req_stats = (select(Requirement.project_id,
+                        func.count(Requirement.id).label('requirement_count'),
+                        func.max(Requirement.updated_at).label('last_activity'),
+                        *status_columns)
+                 .group_by(Requirement.project_id))
+    link_stats = (select(Requirement.project_id, func.count(Link.id).label('link_count'))
+                  .join(Link, Link.source_requirement_id == Requirement.id)
+                  .group_by(Requirement.project_id))
+    if project_ids is not None:
+        req_stats = req_stats.where(Requirement.project_id.in_(project_ids))
+        link_stats = link_stats.where(Requirement.project_id.in_(project_ids))
+    return req_stats.subquery(), link_stats.subquery()
+
+
+def _project_with_stats(project, requirement_count=0, link_count=0, last_activity=None, status_counts=()):
+    last_activity = last_activity or project.created_at
+    status_counts = dict(zip(RequirementStatus, status_counts))
+    d = project.to_dict()
+    d['stats'] = {
+        'requirement_count': requirement_count or 0,
+        'link_count': link_count or 0,
+        'statuses': {status.value: int(status_counts.get(status) or 0) for status in RequirementStatus},
+        'last_activity': last_activity.isoformat() if last_activity else None,
+    }
+    return d
+
+
+def get_projects_page(offset=0, limit=None, sort='id', descending=False):
+    """Страница проектов со статистикой и общее число проектов.
+
+    Счетчики требований, статусов, связей и время последнего изменения
+    считаются одним запросом: проекты страницы соединяются с
+    агрегирующими подзапросами. При сортировке по обычной колонке агрегаты
+    считаются только для проектов страницы. В режиме шардирования данные
+    проектов лежат в разных файлах, поэтому статистика собирается по
+    шарду каждого проекта страницы.
+    """
+    if sort not in PROJECT_SORTS and sort not in PROJECT_STAT_SORTS:
+        raise ValueError(f'Недопустимая сортировка: {sort}')
+    sharded = sharding.get_resolver() is not None
+    if sort in PROJECT_STAT_SORTS and sharded:
+        raise ValueError(f'Сортировка {sort} недоступна в режиме шардирования')
+
+    total = db.session.scalar(select(func.count(Project.id)))
+    direction = (lambda column: column.desc()) if descending else (lambda column: column.asc())
+
+    if sort in PROJECT_SORTS:
+        page_ids = (select(Project.id)
+                    .order_by(direction(PROJECT_SORTS[sort]), Project.id.asc())
+                    .offset(offset or None).limit(limit))
+        if sharded:
+            return total, _sharded_projects_page(page_ids, sort, direction)
+        req_stats, link_stats = _project_stats_queries(page_ids.scalar_subquery())
+        order = [direction(PROJECT_SORTS[sort]), Project.id.asc()]
+        page_filter = Project.id.in_(page_ids.scalar_subquery())
+    else:
+        req_stats, link_stats = _project_stats_queries()
+        order = None
+        page_filter = None
+
+    stat_order = {
+        'requirement_count': func.coalesce(req_stats.c.requirement_count, 0),
+        'link_count': func.coalesce(link_stats.c.link_count, 0),
+        'last_activity': func.coalesce(req_stats.c.last_activity, Project.created_at),
+    }
+    status_columns = [req_stats.c[f'status_{i}'] for i in range(len(RequirementStatus))]
+    query = (select(Project, req_stats.c.requirement_count, link_stats.c.link_count,
+                    req_stats.c.last_activity, *status_columns)
+             .outerjoin(req_stats, req_stats.c.project_id == Project.id)
+             .outerjoin(link_stats, link_stats.c.project_id == Project.id))
+    if page_filter is not None:
+        query = query.where(page_filter).order_by(*order)
+    else:
+        query = (query.order_by(direction(stat_order[sort]), Project.id.asc())
+                 .offset(offset or None).limit(limit))
+
+    items = [
+        _project_with_stats(project, requirement_count, link_count, activity, statuses)
+        for project, requirement_count, link_count, activity, *statuses in db.session.execute(query)
+    ]
+    return total, items
+
+
+def _sharded_projects_page(page_ids, sort, direction):
+    projects = db.session.scalars(
+        select(Project).where(Project.id.in_(page_ids.scalar_subquery()))
+        .order_by(direction(PROJECT_SORTS[sort]), Project.id.asc())
+    ).all()
+    items = []
+    for project in projects:
+        with sharding.project_scope(project.id):
+            req_stats, link_stats = _project_stats_queries()
+            row = db.session.execute(
+                select(req_stats.c.requirement_count, link_stats.c.link_count, req_stats.c.last_activity,
+                       *[req_stats.c[f'status_{i}'] for i in range(len(RequirementStatus))])
+                .select_from(req_stats)
+                .outerjoin(link_stats, link_stats.c.project_id == req_stats.c.project_id)
+            ).first()
+        items.append(_project_with_stats(project, *row[:3], row[3:]) if row else _project_with_stats(project))
+    return items
 
 
 def get_requirement_with_links(project_id,requirement_id):
@@ -29,14 +243,9 @@ def get_requirement_with_links(project_id,requirement_id):
     if not req or req.project_id != project_id:
         return None
 
-    outgoing = (((db.session.query(Link)
-                .join(Requirement, Link.target_requirement_id == Requirement.id))
-                .filter(Link.source_requirement_id == requirement_id))
-                .all())
-    incoming = ((db.session.query(Link)
-                .join(Requirement, Link.source_requirement_id == Requirement.id)
-                .filter(Link.target_requirement_id == requirement_id))
-                .all())
+    params = {'requirement_id': requirement_id}
+    outgoing = db.session.scalars(_OUTGOING_LINKS, params).all()
+    incoming = db.session.scalars(_INCOMING_LINKS, params).all()
 
     d = req.to_dict()
     d['outgoing_links'] = [link.to_dict() for link in outgoing]
@@ -46,63 +255,433 @@ def get_requirement_with_links(project_id,requirement_id):
 
 def get_all_requirements_with_links(project_id):
     """Все требования со связями"""
-    reqs = (db.session.query(Requirement)
-            .filter(Requirement.project_id == project_id)
-            .order_by(Requirement.id.asc())
-            .all())
-    return [get_requirement_with_links(project_id, req.id) for req in reqs if req]
+    return get_requirements_page(project_id)[1]
+
+
+def get_requirements_page(project_id, offset=0, limit=None, filters=None, subtree=None, depth=None):
+    """Страница требований со связями и общее число требований под фильтром.
+
+    filters — {имя колонки: значение}; subtree — id корня поддерева (вместе
+    с корнем, depth — не глубже стольких уровней). Связи всей страницы
+    читаются двумя запросами, а не парой запросов на каждое требование.
+    """
+    query = db.session.query(Requirement).filter(Requirement.project_id == project_id)
+    for column, value in (filters or {}).items():
+        query = query.filter(getattr(Requirement, column) == value)
+    if subtree is not None:
+        query = query.filter(hierarchy.in_subtree(Requirement.id, subtree, depth))
+
+    total = query.count() if (offset or limit is not None) else None
+    page = query.order_by(Requirement.id.asc()).offset(offset or None).limit(limit).all()
+    if total is None:
+        total = len(page)
+
+    req_ids = [req.id for req in page]
+    outgoing = {}
+    incoming = {}
+    if req_ids:
+        project_req_ids = db.session.query(Requirement.id).filter(Requirement.project_id == project_id)
+        links = (db.session.query(Link)
+                 .filter(Link.source_requirement_id.in_(req_ids) | Link.target_requirement_id.in_(req_ids))
+                 .filter(Link.source_requirement_id.in_(project_req_ids))
+                 .filter(Link.target_requirement_id.in_(project_req_ids))
+                 .order_by(Link.id.asc())
+                 .all())
+        for link in links:
+            outgoing.setdefault(link.source_requirement_id, []).append(link.to_dict())
+            incoming.setdefault(link.target_requirement_id, []).append(link.to_dict())
+
+    items = []
+    for req in page:
+        d = req.to_dict()
+        d['outgoing_links'] = outgoing.get(req.id, [])
+        d['incoming_links'] = incoming.get(req.id, [])
+        items.append(d)
+    return total, items
+
+
+def get_ancestors(project_id, requirement_id):
+    """Цепочка предков требования от корня; None — требования нет в проекте."""
+    req = db.session.get(Requirement, requirement_id)
+    if not req or req.project_id != project_id:
+        return None
+    return db.session.scalars(hierarchy.ANCESTORS, {'requirement_id': requirement_id}).all()
+
+
+def _check_parent(project_id, parent_id):
+    parent = db.session.get(Requirement, parent_id)
+    if not parent or parent.project_id != project_id:
+        raise ValueError(f'Родительское требование {parent_id} не найдено в проекте')
 
 
 def create_requirement(project_id: int, requirement_data: dict, author=None):
-    """Создание требования."""
+    """Создание требования (с parent_id — сразу в иерархии)."""
     requirement_data['project_id'] = project_id
     if author:
         requirement_data['author'] = author
+    if requirement_data.get('parent_id') is not None:
+        _check_parent(project_id, requirement_data['parent_id'])
 
     req = Requirement(**requirement_data)
     db.session.add(req)
-    db.session.commit()
+    db.session.flush()
+    if req.parent_id is not None:
+        hierarchy.graft(db.session, [(req.id, req.parent_id)])
 
     _save_history(req.id, 'CREATE', None, req.to_dict(), author)
+    _touch_project(project_id)
+    db.session.commit()
     return req
 
 
-def update_requirement(project_id:int,requirement_id:int, fields, changed_by=None):
-    """Обновление требования."""
+def _parent_indexes(items):
+    """parent_index элементов (номер родителя в том же пакете); родитель должен идти раньше."""
+    parents = []
+    for index, item in enumerate(items):
+        parent_index = item.get('parent_index')
+        if parent_index is not None and not 0 <= parent_index < index:
+            raise ValueError(f'parent_index {parent_index} должен ссылаться на предыдущий элемент пакета')
+        parents.append(parent_index)
+    return parents
+
+
+def _place_new(reqs, pairs):
+    """Проставляет parent_id только что вставленным требованиям по парам (id, id родителя)."""
+    if not pairs:
+        return
+    db.session.execute(_SET_NEW_PARENT, [{'req_id': req_id, 'new_parent_id': parent_id} for req_id, parent_id in pairs])
+    parent_of = dict(pairs)
+    for req in reqs:
+        if req.id in parent_of:
+            set_committed_value(req, 'parent_id', parent_of[req.id])
+
+
+def create_requirements(project_id: int, items, author=None):
+    """Пакетное создание требований и их истории одной транзакцией.
+
+    parent_index в элементе — номер родителя в том же пакете (иерархия
+    пунктов DOCX).
+    """
+    parents = _parent_indexes(items)
+    reqs = []
+    for requirement_data in items:
+        requirement_data = dict(requirement_data, project_id=project_id)
+        requirement_data.pop('parent_index', None)
+        if author:
+            requirement_data['author'] = author
+        reqs.append(Requirement(**requirement_data))
+
+    try:
+        db.session.add_all(reqs)
+        db.session.flush()
+        grafted = [(req.id, reqs[parent_index].id) for req, parent_index in zip(reqs, parents)
+                   if parent_index is not None]
+        _place_new(reqs, grafted)
+        hierarchy.graft(db.session, grafted)
+        db.session.add_all([_history_entry(req.id, 'CREATE', None, req.to_dict(), author) for req in reqs])
+        _touch_project(project_id)
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    return reqs
+
+
+def reimport_requirements(project_id: int, items, dry_run=False, changed_by=None):
+    """Повторный импорт спецификации: к проекту применяется только разница.
+
+    items — данные требований с import_position (номер пункта в секции).
+    Пункт сопоставляется сначала по отпечатку (тип + хеш текста), затем
+    по позиции в секции среди требований, созданных импортом. Совпавшие
+    по тексту не переписываются, у совпавших по позиции меняется текст,
+    остальные пункты создаются. Требования импорта, которых больше нет
+    в документе, отклоняются (а не удаляются), поэтому связи и история
+    сохраняются. Требования, созданные вручную, не отклоняются никогда.
+
+    parent_index задает иерархию пунктов: требования, у которых родитель
+    в документе стал другим, переносятся вместе с поддеревом.
+    """
+    parents = _parent_indexes(items)
+    item_reqs = [None] * len(items)
+    reqs = (db.session.query(Requirement)
+            .filter(Requirement.project_id == project_id)
+            .order_by(Requirement.id.asc())
+            .all())
+
+    by_content = {}
+    for req in reqs:
+        if req.status == RequirementStatus.REJECTED and req.import_position is None:
+            continue
+        by_content.setdefault((req.requirement_type, content_hash(req.description)), []).append(req)
+    for candidates in by_content.values():
+        # Требования импорта сопоставляются раньше ручных дублей
+        candidates.sort(key=lambda r: r.import_position is None)
+
+    matched = set()
+    moved = []
+    leftover = []
+    for index, item in enumerate(items):
+        candidates = by_content.get((item['requirement_type'], content_hash(item.get('description'))))
+        if candidates:
+            req = candidates.pop(0)
+            matched.add(req.id)
+            item_reqs[index] = req
+            if req.import_position != item['import_position']:
+                moved.append((req, item['import_position']))
+        else:
+            leftover.append((index, item))
+
+    by_position = {
+        (req.requirement_type, req.import_position): req
+        for req in reqs
+        if req.import_position is not None and req.id not in matched
+    }
+    updates = []
+    inserts = []
+    for index, item in leftover:
+        req = by_position.pop((item['requirement_type'], item['import_position']), None)
+        if req is None:
+            inserts.append((index, item))
+        else:
+            matched.add(req.id)
+            item_reqs[index] = req
+            updates.append((req, item))
+
+    retired = [req for req in by_position.values() if req.status != RequirementStatus.REJECTED]
+
+    # Родитель пункта — новое требование (еще без id) или уже существующее
+    reparented = []
+    for req, parent_index in zip(item_reqs, parents):
+        if req is None:
+            continue
+        if parent_index is None:
+            if req.parent_id is not None:
+                reparented.append(req)
+        elif item_reqs[parent_index] is None or item_reqs[parent_index].id != req.parent_id:
+            reparented.append(req)
+
+    plan = {
+        'unchanged': len(items) - len(leftover),
+        'moved': len(moved),
+        'insert': [
+            dict(item, requirement_type=item['requirement_type'].value) for _index, item in inserts
+        ],
+        'update': [
+            {'id': req.id, 'title': item['title'], 'old_description': req.description or '',
+             'description': item['description']}
+            for req, item in updates
+        ],
+        'retire': [{'id': req.id, 'title': req.title} for req in retired],
+        'reparent': [{'id': req.id, 'title': req.title} for req in reparented],
+    }
+    if dry_run:
+        return plan
+
+    try:
+        # Сдвиг пункта в документе — служебное поле: без истории и без смены updated_at
+        if moved:
+            table = Requirement.__table__
+            db.session.execute(
+                update(table)
+                .where(table.c.id == bindparam('req_id'))
+                .values(import_position=bindparam('position'), updated_at=table.c.updated_at),
+                [{'req_id': req.id, 'position': position} for req, position in moved],
+            )
+
+        changed = []
+        for req, item in updates:
+            changed.append((req, req.to_dict()))
+            req.title = item['title']
+            req.description = item['description']
+        for req in retired:
+            changed.append((req, req.to_dict()))
+            req.status = RequirementStatus.REJECTED
+            req.import_position = None
+
+        changed_ids = {req.id for req, _old_values in changed}
+        changed.extend((req, req.to_dict()) for req in reparented if req.id not in changed_ids)
+
+        created = []
+        for index, item in inserts:
+            item = dict(item, project_id=project_id)
+            item.pop('parent_index', None)
+            item_reqs[index] = Requirement(**item)
+            created.append(item_reqs[index])
+        db.session.add_all(created)
+        db.session.flush()
+
+        # Новые пункты встают в иерархию по порядку документа (родитель раньше потомка),
+        # перенесенные сначала отцепляются, чтобы промежуточное дерево не получило цикла
+        created_ids = {req.id for req in created}
+        placed_ids = created_ids | {req.id for req in reparented}
+        for req in reparented:
+            hierarchy.move(db.session, req.id, None)
+        grafted = []
+        for req, parent_index in zip(item_reqs, parents):
+            parent = item_reqs[parent_index] if parent_index is not None else None
+            if req.id in placed_ids:
+                if req.id not in created_ids:
+                    # Перенос существующего требования меняет его версию
+                    req.parent_id = parent.id if parent else None
+                if parent is not None:
+                    grafted.append((req.id, parent.id))
+        _place_new(created, [(req_id, parent_id) for req_id, parent_id in grafted if req_id in created_ids])
+        hierarchy.graft(db.session, grafted)
+        # Новые версии и updated_at попадают в историю
+        db.session.flush()
+
+        db.session.add_all(
+            [_history_entry(req.id, 'UPDATE', old_values, req.to_dict(), changed_by) for req, old_values in changed]
+            + [_history_entry(req.id, 'CREATE', None, req.to_dict(), changed_by) for req in created]
+        )
+
+        if updates or retired or created or reparented:
+            _touch_project(project_id)
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+
+    plan['insert'] = [req.to_dict() for req in created]
+    return plan
+
+
+class VersionConflictError(Exception):
+    """Требование изменено с тех пор, как клиент его прочитал."""
+
+    def __init__(self, current_version):
+        super().__init__(f'Требование изменено другим пользователем (текущая версия {current_version})')
+        self.current_version = current_version
+
+
+# Сколько раз повторить обновление без If-Match, если строку успели изменить между чтением и записью
+UPDATE_RETRIES = 3
+
+
+def update_requirement(project_id:int,requirement_id:int, fields, changed_by=None, expected_version=None):
+    """Условное обновление требования: UPDATE ... WHERE version = ?.
+
+    Старые значения для истории читаются одним SELECT строки (без загрузки
+    сущности в сессию), новое состояние возвращает сам UPDATE через
+    RETURNING, если диалект его поддерживает. expected_version — версия из
+    If-Match; если строка уже другой версии, VersionConflictError. Без
+    expected_version сравнивается прочитанная версия, то есть параллельная
+    запись между чтением и обновлением не затирается, а обновление
+    повторяется поверх нее.
+
+    Если fields пуст или совпадает с текущими значениями, ничего не пишется:
+    версия, история и ревизия проекта остаются прежними. Ревизия проекта
+    поднимается только после успешного UPDATE строки требования.
+    """
+    table = Requirement.__table__
+    for _attempt in range(UPDATE_RETRIES):
+        old = db.session.execute(
+            select(table).where(table.c.id == requirement_id, table.c.project_id == project_id)
+        ).first()
+        if old is None:
+            db.session.rollback()
+            return None
+        if expected_version is not None and old.version != expected_version:
+            db.session.rollback()
+            raise VersionConflictError(old.version)
+        if all(getattr(old, key) == value for key, value in fields.items()):
+            db.session.rollback()
+            return Requirement(**old._mapping)
+
+        statement = (update(table)
+                     .where(table.c.id == requirement_id, table.c.version == old.version)
+                     .values(**fields, version=table.c.version + 1, updated_at=datetime.utcnow()))
+        if db.session.get_bind(clause=statement).dialect.update_returning:
+            new = db.session.execute(statement.returning(*table.c)).first()
+        else:
+            new = db.session.execute(statement).rowcount and db.session.execute(
+                select(table).where(table.c.id == requirement_id)).first()
+        if new:
+            break
+        # Строку изменили между SELECT и UPDATE: следующее чтение увидит новую версию
+        db.session.rollback()
+    else:
+        raise VersionConflictError(old.version)
+
+    # Транзиентные объекты только для to_dict: в сессию они не попадают
+    old_values = Requirement(**old._mapping).to_dict()
+    req = Requirement(**new._mapping)
+    _save_history(requirement_id, 'UPDATE', old_values, req.to_dict(), changed_by)
+    _touch_project(project_id)
+    db.session.commit()
+    return req
+
+
+def move_requirement(project_id: int, requirement_id: int, parent_id=None, changed_by=None):
+    """Перенос требования вместе с поддеревом под parent_id (None — в корень иерархии)."""
     req = db.session.get(Requirement, requirement_id)
     if not req or req.project_id != project_id:
         return None
+    if parent_id is not None:
+        _check_parent(project_id, parent_id)
+        if hierarchy.is_in_subtree(db.session, requirement_id, parent_id):
+            raise ValueError('Требование нельзя перенести в его собственное поддерево')
+    if req.parent_id == parent_id:
+        return req
 
     old_values = req.to_dict()
-
-    for k, v in fields.items():
-        setattr(req, k, v)
-
-    db.session.commit()
+    hierarchy.move(db.session, requirement_id, parent_id)
+    req.parent_id = parent_id
+    db.session.flush()
     _save_history(requirement_id, 'UPDATE', old_values, req.to_dict(), changed_by)
+    _touch_project(project_id)
+    db.session.commit()
     return req
 
 
-def delete_requirement(project_id:int,requirement_id:int, deleted_by=None):
-    """Удаление требования."""
+def delete_requirement(project_id:int,requirement_id:int, deleted_by=None, subtree=False):
+    """Удаление требования; дети переходят к его родителю.
+
+    С subtree удаляется все поддерево, возвращается число удаленных требований.
+    """
     req = db.session.get(Requirement, requirement_id)
     if not req or req.project_id != project_id:
         return False
 
+    if subtree:
+        return _delete_subtree(project_id, requirement_id, deleted_by)
+
     old_values = req.to_dict()
+    now = datetime.utcnow()
+    children = hierarchy.remove_node(db.session, requirement_id, req.parent_id, now)
+    for child in children:
+        child_values = Requirement(**child._mapping).to_dict()
+        new_values = dict(child_values, parent_id=req.parent_id, version=child.version + 1, updated_at=now.isoformat())
+        _save_history(child.id, 'UPDATE', child_values, new_values, deleted_by)
 
     db.session.query(Link).filter(
         (Link.source_requirement_id == requirement_id)
         | (Link.target_requirement_id == requirement_id)
     ).delete(synchronize_session=False)
+    # id требований переиспользуются: архив истории удаленного не должен достаться новому
+    db.session.query(HistoryArchiveChunk).filter(
+        HistoryArchiveChunk.requirement_id == requirement_id
+    ).delete(synchronize_session=False)
 
     db.session.delete(req)
-    db.session.commit()
-
     _save_history(requirement_id, 'DELETE', old_values, None, deleted_by)
+    _touch_project(project_id)
+    db.session.commit()
     return True
 
 
+def _delete_subtree(project_id, root_id, deleted_by):
+    table = Requirement.__table__
+    rows = db.session.execute(select(table).where(hierarchy.in_subtree(table.c.id, root_id))).all()
+    hierarchy.delete_subtree(db.session, root_id)
+    db.session.add_all([
+        _history_entry(row.id, 'DELETE', Requirement(**row._mapping).to_dict(), None, deleted_by) for row in rows
+    ])
+    _touch_project(project_id)
+    db.session.commit()
+    return len(rows)
+
+
 def create_link(project_id:int, source_id:int, target_id:int, link_type):
     """Создание связи между требованиями."""
     if source_id == target_id:
@@ -121,44 +700,76 @@ def create_link(project_id:int, source_id:int, target_id:int, link_type):
         link_type=link_type,
     )
     db.session.add(link)
+    _touch_project(project_id)
     db.session.commit()
     return link
 
 
-def delete_link(link_id):
-    """Удаление связи."""
+def delete_link(link_id, project_id=None):
+    """Удаление связи; с project_id — только связи между требованиями этого проекта."""
     link = db.session.get(Link, link_id)
     if not link:
         return False
 
+    source = db.session.get(Requirement, link.source_requirement_id)
+    if project_id is not None and (not source or source.project_id != project_id):
+        return False
     db.session.delete(link)
+    if source:
+        _touch_project(source.project_id)
     db.session.commit()
     return True
 
 
-def get_history(requirement_id):
-    """История изменений требования."""
-    return (
-        db.session.query(RequirementHistory)
-        .filter(RequirementHistory.requirement_id == requirement_id)
-        .order_by(RequirementHistory.changed_at.desc())
-        .all()
-    )
+def get_history(requirement_id, include_archived=False):
+    """История изменений требования; с include_archived — вместе с перенесенными в архив записями."""
+    history = db.session.scalars(_REQUIREMENT_HISTORY, {'requirement_id': requirement_id}).all()
+    if include_archived:
+        history.extend(get_history_archive().archived_entries(db.session, requirement_id))
+        history.sort(key=lambda entry: entry.changed_at or datetime.min, reverse=True)
+    return history
 
 
-def build_matrix(project_id: int):
-    """Матрица пересечений: source -> target -> тип связи."""
+def build_matrix_rows(project_id: int, offset=0, limit=None):
+    """Окно строк матрицы: id всех требований (столбцы), требования окна и их связи.
+
+    Если включены снимки графа, id столбцов и связи окна берутся из снимка.
+    """
+    snapshot = project_snapshot(db.session, project_id)
+    if snapshot is not None:
+        ids = snapshot.ids.tolist()
+    else:
+        ids = [row[0] for row in (db.session.query(Requirement.id)
+                                  .filter(Requirement.project_id == project_id)
+                                  .order_by(Requirement.id.asc()))]
     reqs = (db.session.query(Requirement)
             .filter(Requirement.project_id == project_id)
             .order_by(Requirement.id.asc())
+            .offset(offset or None)
+            .limit(limit)
             .all())
 
-    req_ids = [req.id for req in reqs]
+    matrix = {}
+    if reqs and snapshot is not None:
+        rows = snapshot.rows_of([req.id for req in reqs])
+        matrix = snapshot.link_map(rows[rows >= 0])
+    elif reqs:
+        project_req_ids = db.session.query(Requirement.id).filter(Requirement.project_id == project_id)
+        links = (db.session.query(Link.source_requirement_id, Link.target_requirement_id, Link.link_type)
+                 .filter(Link.source_requirement_id.in_([req.id for req in reqs]))
+                 .filter(Link.target_requirement_id.in_(project_req_ids)))
+        for source_id, target_id, link_type in links:
+            matrix.setdefault(source_id, {})[target_id] = link_type.value
+
+    return ids, reqs, matrix
 
-    links = (db.session.query(Link)
-             .filter(Link.source_requirement_id.in_(req_ids))
-             .filter(Link.target_requirement_id.in_(req_ids))
-             .all())
+
+def build_matrix(project_id: int):
+    """Матрица пересечений: source -> target -> тип связи."""
+    params = {'project_id': project_id}
+    reqs = db.session.scalars(_PROJECT_REQUIREMENTS, params).all()
+    # Связи выбираются подзапросом по проекту, а не списком id: форма оператора не зависит от размера проекта
+    links = db.session.scalars(_PROJECT_LINKS, params).all()
 
     matrix = {}
     for l in links:
@@ -0,0 +1,173 @@
+"""Версионированные миграции схемы БД.
+
+Текущая версия хранится в таблице ``schema_version``. При старте читается
+одно число; если схема актуальна, инспекция БД и create_all не выполняются.
+Новые изменения схемы добавляются в конец MIGRATIONS со следующим номером.
+
+В шардах проектов (sharding.py) есть только шардированные таблицы, поэтому
+миграция таблицы каталога должна пропускать БД без этой таблицы
+(_add_column так и делает).
+"""
+
+import logging
+import uuid
+
+from sqlalchemy import Column, Integer, MetaData, String, Table, inspect, text
+
+from database import db
+
+logger = logging.getLogger(__name__)
+
+# Отдельные метаданные, чтобы служебная таблица не попадала в db.create_all()
+_metadata = MetaData()
+schema_version = Table(
+    'schema_version', _metadata,
+    Column('version', Integer, primary_key=True),
+    Column('description', String(200)),
+)
+
+
+def _create_tables(conn):
+    # Модели импортируются здесь, чтобы все таблицы были зарегистрированы в db.metadata
+    import models  # noqa: F401
+
+    db.metadata.create_all(conn)
+
+
+def _add_project_id_column(conn):
+    """Старые БД: requirements без project_id переносятся в проект по умолчанию."""
+    columns = [col['name'] for col in inspect(conn).get_columns('requirements')]
+    if 'project_id' in columns:
+        return
+
+    conn.execute(text("ALTER TABLE requirements ADD COLUMN project_id INTEGER"))
+
+    project_id = conn.execute(text("SELECT id FROM projects ORDER BY id ASC LIMIT 1")).scalar()
+    if project_id is None:
+        conn.execute(text(
+            "INSERT INTO projects (name, description, created_at) "
+            "VALUES ('Default project', 'Auto-created project', CURRENT_TIMESTAMP)"
+        ))
+        project_id = conn.execute(text("SELECT id FROM projects ORDER BY id ASC LIMIT 1")).scalar()
+
+    conn.execute(
+        text("UPDATE requirements SET project_id = :project_id WHERE project_id IS NULL"),
+        {"project_id": project_id},
+    )
+
+
+def _add_column(conn, table, column, ddl):
+    """ALTER TABLE ADD COLUMN, если колонки еще нет (на новой БД ее уже создал create_all)."""
+    if not inspect(conn).has_table(table):
+        return
+    columns = [col['name'] for col in inspect(conn).get_columns(table)]
+    if column not in columns:
+        conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {column} {ddl}"))
+
+
+def _add_project_revision(conn):
+    _add_column(conn, 'projects', 'revision', "INTEGER NOT NULL DEFAULT 0")
+
+
+def _add_requirement_import_position(conn):
+    _add_column(conn, 'requirements', 'import_position', "INTEGER")
+
+
+def _create_baseline_tables(conn):
+    import models  # noqa: F401
+
+    tables = [db.metadata.tables[name] for name in ('baseline_blobs', 'baselines', 'baseline_items')]
+    db.metadata.create_all(conn, tables=tables)
+
+
+def _create_link_indexes(conn):
+    import models  # noqa: F401
+
+    for index in db.metadata.tables['links'].indexes:
+        index.create(conn, checkfirst=True)
+
+
+def _add_requirement_version(conn):
+    _add_column(conn, 'requirements', 'version', "INTEGER NOT NULL DEFAULT 1")
+
+
+def _create_history_archive(conn):
+    import models  # noqa: F401
+
+    _add_column(conn, 'projects', 'history_retention_days', "INTEGER")
+    db.metadata.create_all(conn, tables=[db.metadata.tables['history_archive_chunks']])
+
+
+def _create_requirement_hierarchy(conn):
+    import models  # noqa: F401
+
+    _add_column(conn, 'requirements', 'parent_id', "INTEGER REFERENCES requirements(id)")
+    for index in db.metadata.tables['requirements'].indexes:
+        if index.name == 'ix_requirements_parent_id':
+            index.create(conn, checkfirst=True)
+    db.metadata.create_all(conn, tables=[db.metadata.tables['requirement_closure']])
+
+
+def _add_project_cache_token(conn):
+    if not inspect(conn).has_table('projects'):
+        return
+    _add_column(conn, 'projects', 'cache_token', "VARCHAR(32)")
+    project_ids = [row[0] for row in conn.execute(text("SELECT id FROM projects WHERE cache_token IS NULL"))]
+    if project_ids:
+        conn.execute(
+            text("UPDATE projects SET cache_token = :token WHERE id = :project_id"),
+            [{"token": uuid.uuid4().hex, "project_id": project_id} for project_id in project_ids],
+        )
+
+
+MIGRATIONS = [
+    (1, "base tables", _create_tables),
+    (2, "requirements.project_id", _add_project_id_column),
+    (3, "projects.revision", _add_project_revision),
+    (4, "requirements.import_position", _add_requirement_import_position),
+    (5, "baselines", _create_baseline_tables),
+    (6, "links indexes", _create_link_indexes),
+    (7, "requirements.version", _add_requirement_version),
+    (8, "history archive", _create_history_archive),
+    (9, "requirement hierarchy", _create_requirement_hierarchy),
+    (10, "projects.cache_token", _add_project_cache_token),
+]
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+
+def current_version(engine=None):
+    engine = engine or db.engine
+    with engine.begin() as conn:
+        schema_version.create(conn, checkfirst=True)
+        return conn.execute(text("SELECT MAX(version) FROM schema_version")).scalar() or 0
+
+
+def create_schema(engine, tables):
+    """Создает в новой БД только tables сразу в последней версии схемы (шард проекта).
+
+    БД, где схема уже есть, не трогает: ее догоняет upgrade().
+    """
+    with engine.begin() as conn:
+        schema_version.create(conn, checkfirst=True)
+        if conn.execute(text("SELECT MAX(version) FROM schema_version")).scalar():
+            return
+        db.metadata.create_all(conn, tables=tables)
+        conn.execute(schema_version.insert().values(version=LATEST_VERSION, description="shard tables"))
+
+
+def upgrade(engine=None):
+    """Применяет недостающие миграции по порядку, каждую в своей транзакции."""
+    engine = engine or db.engine
+    version = current_version(engine)
+    if version >= LATEST_VERSION:
+        return version
+
+    for number, description, migrate in MIGRATIONS:
+        if number <= version:
+            continue
+        logger.info("Миграция схемы %s: %s", number, description)
+        with engine.begin() as conn:
+            migrate(conn)
+            conn.execute(schema_version.insert().values(version=number, description=description))
+        version = number
+    return version
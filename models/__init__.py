@@ -1,7 +1,9 @@
 """Модели данных"""
 from .project import Project
-from .requirement import Requirement, RequirementType
+from .requirement import Requirement, RequirementClosure, RequirementType
 from .link import Link, LinkType
-from .history import RequirementHistory
+from .history import RequirementHistory, HistoryArchiveChunk
+from .baseline import Baseline, BaselineBlob, BaselineItem
 
-__all__ = ['Project', 'Requirement', 'RequirementType', 'Link', 'LinkType', 'RequirementHistory']
+__all__ = ['Project', 'Requirement', 'RequirementClosure', 'RequirementType', 'Link', 'LinkType', 'RequirementHistory',
+           'HistoryArchiveChunk', 'Baseline', 'BaselineBlob', 'BaselineItem']
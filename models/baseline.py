@@ -0,0 +1,58 @@
+"""Модели базовых версий (baseline) проекта"""
+from datetime import datetime
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, JSON
+from sqlalchemy.orm import relationship
+from database import db
+
+
+class Baseline(db.Model):
+    """Неизменяемый снимок требований и связей проекта"""
+    __tablename__ = 'baselines'
+
+    id = Column(Integer, primary_key=True)
+    project_id = Column(Integer, ForeignKey('projects.id'), nullable=False, index=True)
+    name = Column(String(200), nullable=False)
+    created_by = Column(String(200))
+    created_at = Column(DateTime, default=datetime.utcnow)
+    project_revision = Column(Integer, nullable=False, default=0)
+    requirement_count = Column(Integer, nullable=False, default=0)
+    link_count = Column(Integer, nullable=False, default=0)
+    # Набор связей целиком хранится одним блобом: неизменный набор не дублируется
+    links_hash = Column(String(64), ForeignKey('baseline_blobs.hash'), nullable=False)
+
+    items = relationship('BaselineItem', back_populates='baseline', cascade='all, delete-orphan')
+
+    def to_dict(self):
+        """Преобразование в словарь для API"""
+        return {
+            'id': self.id,
+            'project_id': self.project_id,
+            'name': self.name,
+            'created_by': self.created_by or '',
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'project_revision': self.project_revision,
+            'requirement_count': self.requirement_count,
+            'link_count': self.link_count,
+        }
+
+    def __repr__(self):
+        return f'<Baseline {self.id}: {self.name}>'
+
+
+class BaselineBlob(db.Model):
+    """Содержимое требования (или набора связей), адресуемое хешем; общее для всех снимков"""
+    __tablename__ = 'baseline_blobs'
+
+    hash = Column(String(64), primary_key=True)
+    content = Column(JSON, nullable=False)
+
+
+class BaselineItem(db.Model):
+    """Требование в снимке: ссылка на блоб его содержимого"""
+    __tablename__ = 'baseline_items'
+
+    baseline_id = Column(Integer, ForeignKey('baselines.id'), primary_key=True)
+    requirement_id = Column(Integer, primary_key=True)
+    blob_hash = Column(String(64), ForeignKey('baseline_blobs.hash'), nullable=False, index=True)
+
+    baseline = relationship('Baseline', back_populates='items')
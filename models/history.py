@@ -1,5 +1,5 @@
 from datetime import datetime
-from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, JSON
+from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, JSON, Index
 from sqlalchemy.orm import relationship
 from database import db
 
@@ -32,3 +32,23 @@ class RequirementHistory(db.Model):
     
     def __repr__(self):
         return f'<RequirementHistory {self.id}: {self.change_type} at {self.changed_at}>'
+
+
+class HistoryArchiveChunk(db.Model):
+    """Записи истории одного требования в сжатом сегменте архива (см. services/history_archive.py)"""
+    __tablename__ = 'history_archive_chunks'
+
+    id = Column(Integer, primary_key=True)
+    project_id = Column(Integer, nullable=False, index=True)
+    requirement_id = Column(Integer, nullable=False)
+    # Путь сегмента относительно каталога архива и положение gzip-блока в нем
+    segment = Column(String(300), nullable=False)
+    offset = Column(Integer, nullable=False)
+    length = Column(Integer, nullable=False)
+    entry_count = Column(Integer, nullable=False)
+    first_changed_at = Column(DateTime)
+    last_changed_at = Column(DateTime)
+
+    __table_args__ = (
+        Index('ix_history_archive_requirement', 'requirement_id', 'last_changed_at'),
+    )
@@ -1,6 +1,6 @@
 """Модель связи между требованиями"""
 from enum import Enum
-from sqlalchemy import Column, Integer, ForeignKey, Enum as SQLEnum
+from sqlalchemy import Column, Integer, ForeignKey, Index, Enum as SQLEnum
 from sqlalchemy.orm import relationship
 from database import db
 
@@ -20,6 +20,12 @@ class Link(db.Model):
     source_requirement_id = Column(Integer, ForeignKey('requirements.id'), nullable=False)
     target_requirement_id = Column(Integer, ForeignKey('requirements.id'), nullable=False)
     link_type = Column(SQLEnum(LinkType), nullable=False)
+
+    # Запросы трассировки (EXISTS по связям требования) идут по этим индексам
+    __table_args__ = (
+        Index('ix_links_source_type', 'source_requirement_id', 'link_type'),
+        Index('ix_links_target_type', 'target_requirement_id', 'link_type'),
+    )
     
     source_requirement = relationship(
         'Requirement',
@@ -1,6 +1,7 @@
 import datetime
+import uuid
 
-from sqlalchemy import Column, String, DateTime
+from sqlalchemy import Column, String, DateTime, Integer
 from sqlalchemy.orm import relationship
 
 from database import db
@@ -11,6 +12,13 @@ class Project(db.Model):
     name = Column(String(200),nullable=False,unique=True)
     description = Column(String(1000),nullable=False, default='')
     created_at = Column(DateTime, default=datetime.datetime.utcnow)
+    # Растет при каждом изменении требований/связей проекта (см. logic._touch_project)
+    revision = Column(Integer, nullable=False, default=0, server_default='0')
+    # Сколько дней история изменений хранится в БД до переноса в архив; None — по конфигурации
+    history_retention_days = Column(Integer)
+    # Случайная метка экземпляра проекта: ревизии начинаются с 0 заново после сброса или
+    # восстановления БД, поэтому ключи дисковых кешей и ETag содержат и ее
+    cache_token = Column(String(32), default=lambda: uuid.uuid4().hex)
 
     requirements = relationship(
         'Requirement',
@@ -24,4 +32,6 @@ class Project(db.Model):
             'name': self.name,
             'description': self.description,
             'created_at': self.created_at,
+            'revision': self.revision,
+            'history_retention_days': self.history_retention_days,
         }
@@ -1,7 +1,7 @@
 """Модель требования"""
 from datetime import datetime
 from enum import Enum
-from sqlalchemy import Column, Integer, String, Text, DateTime, Enum as SQLEnum, ForeignKey
+from sqlalchemy import Column, Integer, String, Text, DateTime, Enum as SQLEnum, ForeignKey, Index, event, inspect
 from sqlalchemy.orm import relationship
 from database import db
 
@@ -48,6 +48,12 @@ class Requirement(db.Model):
     author = Column(String(200))
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    # Позиция пункта в секции DOCX; заполнена у требований, которыми управляет импорт
+    import_position = Column(Integer)
+    # Версия строки для условных обновлений (If-Match); растет при каждом изменении содержимого
+    version = Column(Integer, nullable=False, default=1, server_default='1')
+    # Непосредственный родитель в иерархии; пути до всех предков — в requirement_closure
+    parent_id = Column(Integer, ForeignKey('requirements.id'), index=True)
     
     # Связи
     outgoing_links = relationship(
@@ -62,10 +68,11 @@ class Requirement(db.Model):
         back_populates='target_requirement',
         cascade='all, delete-orphan'
     )
+    # История — журнал аудита: удаление требования ее не трогает
     history = relationship(
         'RequirementHistory',
         back_populates='requirement',
-        cascade='all, delete-orphan',
+        passive_deletes='all',
         order_by='RequirementHistory.changed_at.desc()'
     )
     
@@ -83,7 +90,40 @@ class Requirement(db.Model):
             'author': self.author or '',
             'created_at': self.created_at.isoformat() if self.created_at else None,
             'updated_at': self.updated_at.isoformat() if self.updated_at else None,
+            'version': self.version,
+            'parent_id': self.parent_id,
         }
     
     def __repr__(self):
         return f'<Requirement {self.id}: {self.title}>'
+
+
+class RequirementClosure(db.Model):
+    """Таблица замыкания иерархии: строка на каждую пару (предок, потомок).
+
+    Строк (X, X, 0) нет: требования вне иерархии в таблице не появляются.
+    """
+    __tablename__ = 'requirement_closure'
+
+    ancestor_id = Column(Integer, ForeignKey('requirements.id'), primary_key=True)
+    descendant_id = Column(Integer, ForeignKey('requirements.id'), primary_key=True)
+    depth = Column(Integer, nullable=False)
+
+    # Поддерево читается по первичному ключу, цепочка предков — по этому индексу
+    __table_args__ = (
+        Index('ix_requirement_closure_descendant', 'descendant_id', 'depth'),
+    )
+
+
+# Поля, изменение которых меняет версию (import_position — служебное и версию не трогает).
+# parent_id тоже: перенос в иерархии — правка, которую должен заметить If-Match
+VERSIONED_FIELDS = ('title', 'description', 'requirement_type', 'status', 'priority', 'source', 'author', 'parent_id')
+
+
+@event.listens_for(Requirement, 'before_update')
+def _bump_version(_mapper, _connection, target):
+    # Изменения через ORM (импорт XLSX, повторный импорт DOCX) тоже меняют версию,
+    # иначе If-Match не заметил бы их. Условное обновление из logic идет через Core.
+    state = inspect(target)
+    if any(state.attrs[name].history.has_changes() for name in VERSIONED_FIELDS):
+        target.version = (target.version or 0) + 1
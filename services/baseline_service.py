@@ -0,0 +1,262 @@
+"""Базовые версии (baseline) проекта: неизменяемые снимки и их сравнение.
+
+Содержимое каждого требования сериализуется в канонический JSON и
+хранится в ``baseline_blobs`` под своим sha256. Снимок — это только
+пары (requirement_id, хеш), поэтому неизмененное требование хранится
+один раз на все снимки. Набор связей целиком тоже лежит одним блобом.
+
+Сравнение идет по хешам: сначала сопоставляются пары (id, хеш) двух
+снимков (или снимка и живого проекта), содержимое читается только для
+измененных требований и только если нужны подробности по полям.
+"""
+
+import hashlib
+import json
+
+from sqlalchemy import delete, insert, select
+
+from models.project import Project
+from models.requirement import Requirement
+from models.link import Link
+from models.baseline import Baseline, BaselineBlob, BaselineItem
+
+LIVE = "live"
+
+# Поля требования, входящие в снимок (служебные даты в сравнение не попадают)
+SNAPSHOT_FIELDS = ("title", "description", "requirement_type", "status", "priority", "source", "author")
+_SNAPSHOT_COLUMNS = [Requirement.id] + [getattr(Requirement, field) for field in SNAPSHOT_FIELDS]
+
+
+def _canonical(value):
+    return json.dumps(value, ensure_ascii=False, sort_keys=True, separators=(",", ":"))
+
+
+def _digest(payload: str) -> str:
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def _requirement_content(row):
+    content = {}
+    for field in SNAPSHOT_FIELDS:
+        value = getattr(row, field)
+        content[field] = getattr(value, "value", value) or ""
+    return content
+
+
+class BaselineService:
+    """Создание, чтение и сравнение снимков проекта."""
+
+    def __init__(self, db_session, chunk_size=2000):
+        self.db = db_session
+        self.chunk_size = chunk_size
+
+    def create(self, project_id: int, name: str, created_by=None) -> Baseline:
+        project = self.db.get(Project, project_id)
+        if not project:
+            raise ValueError("Project not found")
+
+        try:
+            links = self._live_links(project_id)
+            baseline = Baseline(
+                project_id=project_id,
+                name=name,
+                created_by=created_by,
+                project_revision=project.revision,
+                link_count=len(links),
+                links_hash=self._store_blobs({"links": links})["links"],
+            )
+            self.db.add(baseline)
+            self.db.flush()
+
+            requirement_count = 0
+            for chunk in self._iter_live_requirements(project_id):
+                hashes = self._store_blobs({row_id: content for row_id, content, _hash in chunk}, hashed=chunk)
+                self.db.execute(insert(BaselineItem), [
+                    {"baseline_id": baseline.id, "requirement_id": row_id, "blob_hash": hashes[row_id]}
+                    for row_id, _content, _hash in chunk
+                ])
+                requirement_count += len(chunk)
+
+            baseline.requirement_count = requirement_count
+            self.db.commit()
+        except Exception:
+            self.db.rollback()
+            raise
+        return baseline
+
+    def get(self, project_id: int, baseline_id: int):
+        baseline = self.db.get(Baseline, baseline_id)
+        if baseline is None or baseline.project_id != project_id:
+            return None
+        return baseline
+
+    def list(self, project_id: int):
+        return self.db.scalars(
+            select(Baseline).where(Baseline.project_id == project_id).order_by(Baseline.id.asc())
+        ).all()
+
+    def contents(self, baseline: Baseline):
+        """Требования и связи снимка в том виде, в каком они были зафиксированы."""
+        rows = self.db.execute(
+            select(BaselineItem.requirement_id, BaselineBlob.content)
+            .join(BaselineBlob, BaselineBlob.hash == BaselineItem.blob_hash)
+            .where(BaselineItem.baseline_id == baseline.id)
+            .order_by(BaselineItem.requirement_id.asc())
+        )
+        requirements = [dict(content, id=requirement_id) for requirement_id, content in rows]
+        return requirements, self._links_of(baseline)
+
+    def delete(self, baseline: Baseline):
+        self.db.delete(baseline)
+        self.db.flush()
+        self._drop_orphan_blobs()
+        self.db.commit()
+
+    def delete_project_baselines(self, project_id: int):
+        """Удаляет снимки проекта в текущей транзакции (коммит делает вызывающий код)."""
+        baseline_ids = select(Baseline.id).where(Baseline.project_id == project_id)
+        self.db.execute(delete(BaselineItem).where(BaselineItem.baseline_id.in_(baseline_ids)))
+        self.db.execute(delete(Baseline).where(Baseline.project_id == project_id))
+        self._drop_orphan_blobs()
+
+    def diff(self, project_id: int, baseline: Baseline, other=LIVE, details=False):
+        """Разница между снимком и другим снимком (Baseline) либо живым проектом (LIVE)."""
+        old = self._item_hashes(baseline)
+        if other == LIVE:
+            new = {}
+            live_content = {}
+            for chunk in self._iter_live_requirements(project_id):
+                for row_id, content, content_hash in chunk:
+                    new[row_id] = content_hash
+                    if details and old.get(row_id) != content_hash:
+                        live_content[row_id] = content
+            new_links = self._live_links(project_id)
+        else:
+            new = self._item_hashes(other)
+            live_content = None
+            new_links = self._links_of(other)
+
+        added = sorted(new.keys() - old.keys())
+        removed = sorted(old.keys() - new.keys())
+        changed = sorted(req_id for req_id in old.keys() & new.keys() if old[req_id] != new[req_id])
+
+        result = {
+            "from": baseline.id,
+            "to": LIVE if other == LIVE else other.id,
+            "added": added,
+            "removed": removed,
+            "changed": changed,
+            "unchanged": len(old) - len(removed) - len(changed),
+            "links": self._diff_links(self._links_of(baseline), new_links),
+        }
+        if details:
+            wanted = {old[req_id] for req_id in removed + changed}
+            if live_content is None:
+                wanted |= {new[req_id] for req_id in added + changed}
+            blobs = self._load_blobs(wanted)
+
+            def content_of(req_id, hashes):
+                if hashes is new and live_content is not None:
+                    return live_content[req_id]
+                return blobs[hashes[req_id]]
+
+            result["added"] = [dict(content_of(req_id, new), id=req_id) for req_id in added]
+            result["removed"] = [dict(content_of(req_id, old), id=req_id) for req_id in removed]
+            result["changed"] = []
+            for req_id in changed:
+                before, after = content_of(req_id, old), content_of(req_id, new)
+                result["changed"].append({
+                    "id": req_id,
+                    "fields": {
+                        field: [before.get(field), after.get(field)]
+                        for field in SNAPSHOT_FIELDS
+                        if before.get(field) != after.get(field)
+                    },
+                })
+        return result
+
+    def _iter_live_requirements(self, project_id):
+        """Пачки (id, содержимое, хеш) текущих требований проекта без загрузки ORM-объектов."""
+        result = self.db.execute(
+            select(*_SNAPSHOT_COLUMNS)
+            .where(Requirement.project_id == project_id)
+            .order_by(Requirement.id.asc())
+            .execution_options(yield_per=self.chunk_size)
+        )
+        for rows in result.partitions():
+            chunk = []
+            for row in rows:
+                content = _requirement_content(row)
+                chunk.append((row.id, content, _digest(_canonical(content))))
+            yield chunk
+
+    def _live_links(self, project_id):
+        req_ids = select(Requirement.id).where(Requirement.project_id == project_id)
+        rows = self.db.execute(
+            select(Link.source_requirement_id, Link.target_requirement_id, Link.link_type)
+            .where(Link.source_requirement_id.in_(req_ids))
+            .order_by(Link.source_requirement_id, Link.target_requirement_id, Link.id)
+        )
+        return [[source_id, target_id, link_type.value] for source_id, target_id, link_type in rows]
+
+    def _links_of(self, baseline):
+        return self.db.get(BaselineBlob, baseline.links_hash).content
+
+    @staticmethod
+    def _diff_links(old_links, new_links):
+        if old_links == new_links:
+            return {"added": [], "removed": [], "changed": []}
+        old = {(s, t): link_type for s, t, link_type in old_links}
+        new = {(s, t): link_type for s, t, link_type in new_links}
+        return {
+            "added": [[s, t, new[(s, t)]] for s, t in sorted(new.keys() - old.keys())],
+            "removed": [[s, t, old[(s, t)]] for s, t in sorted(old.keys() - new.keys())],
+            "changed": [
+                [s, t, old[(s, t)], new[(s, t)]]
+                for s, t in sorted(old.keys() & new.keys())
+                if old[(s, t)] != new[(s, t)]
+            ],
+        }
+
+    def _item_hashes(self, baseline):
+        return dict(self.db.execute(
+            select(BaselineItem.requirement_id, BaselineItem.blob_hash)
+            .where(BaselineItem.baseline_id == baseline.id)
+        ).all())
+
+    def _load_blobs(self, hashes):
+        blobs = {}
+        hashes = list(hashes)
+        for start in range(0, len(hashes), self.chunk_size):
+            part = hashes[start:start + self.chunk_size]
+            blobs.update(self.db.execute(
+                select(BaselineBlob.hash, BaselineBlob.content).where(BaselineBlob.hash.in_(part))
+            ).all())
+        return blobs
+
+    def _store_blobs(self, contents, hashed=None):
+        """Сохраняет недостающие блобы и возвращает {ключ: хеш}."""
+        if hashed is not None:
+            hashes = {key: content_hash for key, _content, content_hash in hashed}
+        else:
+            hashes = {key: _digest(_canonical(content)) for key, content in contents.items()}
+
+        known = set(self.db.scalars(
+            select(BaselineBlob.hash).where(BaselineBlob.hash.in_(set(hashes.values())))
+        ))
+        missing = {}
+        for key, content_hash in hashes.items():
+            if content_hash not in known:
+                missing[content_hash] = contents[key]
+        if missing:
+            self.db.execute(insert(BaselineBlob), [
+                {"hash": content_hash, "content": content} for content_hash, content in missing.items()
+            ])
+        return hashes
+
+    def _drop_orphan_blobs(self):
+        self.db.execute(
+            delete(BaselineBlob)
+            .where(~BaselineBlob.hash.in_(select(BaselineItem.blob_hash)))
+            .where(~BaselineBlob.hash.in_(select(Baseline.links_hash)))
+        )
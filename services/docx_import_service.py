@@ -1,9 +1,13 @@
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 from dataclasses import dataclass
+from functools import lru_cache
 from io import BytesIO
 import logging
+import multiprocessing
 import re
-
-from docx import Document
+import threading
+from typing import Optional
 
 from services.text_normalizer import normalize_text
 
@@ -15,12 +19,31 @@ NUMBERED_POINT_RE = re.compile(r"^\d+(?:\.\d+)*[\.)]?\s+.+$")
 GROUP_HEADING_RE = re.compile(r"^<\s*(?P<body>[^<>]+?)\s*>$")
 END_MARKER = "end"
 
+LIST_STYLE_MARKERS = (*BULLET_STYLE_MARKERS, *NUMBERED_STYLE_MARKERS)
+
+# Один проход вместо трех: заголовок секции <...>, маркированный или нумерованный пункт
+PARAGRAPH_RE = re.compile(
+    r"^(?:<\s*(?P<heading>[^<>]+?)\s*>"
+    r"|(?P<bullet>[\-•*–—]\s*.+)"
+    r"|(?P<numbered>(?P<number>\d+(?:\.\d+)*)[\.)]?\s+.+))$"
+)
+# Уровень списка из имени стиля: "List Number 2", "Маркированный список 3"
+LIST_STYLE_LEVEL_RE = re.compile(r"\s(?P<level>[2-9])$")
+
+
+@lru_cache(maxsize=256)
+def _is_list_style(style_name: str) -> bool:
+    style = normalize_text(style_name)
+    return any(marker in style for marker in LIST_STYLE_MARKERS)
+
 
 @dataclass(frozen=True)
 class DocxParagraph:
     text: str
     style_name: str
     is_list_item: bool
+    heading: Optional[str] = None  # тело заголовка <...> в нижнем регистре
+    level: int = 0  # уровень вложенности: по номеру "1.2.3" или уровню списка Word
 
 
 @dataclass(frozen=True)
@@ -28,12 +51,16 @@ class RequirementDraft:
     title: str
     requirement_type: str
     description: str = ""
+    position: int = 0  # порядковый номер пункта внутри секции своего типа
+    parent_index: Optional[int] = None  # номер родительского пункта в результате parse
 
     def to_dict(self):
         return {
             "title": self.title,
             "description": self.description,
             "requirement_type": self.requirement_type,
+            "position": self.position,
+            "parent_index": self.parent_index,
         }
 
 
@@ -43,41 +70,64 @@ class DocxReader:
     def __init__(self, logger=None):
         self._logger = logger or logging.getLogger(__name__)
 
-    def read_paragraphs(self, file_bytes: bytes):
+    def read_paragraphs(self, source):
+        """source — байты или открытый бинарный файл (например, буфер загрузки)."""
+        # python-docx тянет lxml и грузится только при первом импорте документа
+        from docx import Document
+
         try:
-            document = Document(BytesIO(file_bytes))
+            document = Document(BytesIO(source) if isinstance(source, (bytes, bytearray)) else source)
         except Exception as exc:
             self._logger.exception("Ошибка чтения .docx")
             raise ValueError("Некорректный .docx файл") from exc
 
+        # paragraph.style в python-docx ищет стиль перебором, поэтому имя кешируется по id стиля
+        style_names = {}
         paragraphs = []
         for paragraph in document.paragraphs:
             text = normalize_text(paragraph.text, lower=False)
             if not text:
                 continue
-            style_name = paragraph.style.name if paragraph.style else ""
-            paragraphs.append(
-                DocxParagraph(
-                    text=text,
-                    style_name=style_name,
-                    is_list_item=self._is_list_item(paragraph, text, style_name),
-                )
-            )
+
+            style_id = paragraph._p.style
+            if style_id not in style_names:
+                style = paragraph.style
+                style_names[style_id] = style.name if style else ""
+            style_name = style_names[style_id]
+
+            paragraphs.append(self._classify(paragraph, text, style_name))
         return paragraphs
 
     @staticmethod
-    def _is_list_item(paragraph, text: str, style_name: str) -> bool:
-        style = normalize_text(style_name)
-        if any(marker in style for marker in (*BULLET_STYLE_MARKERS, *NUMBERED_STYLE_MARKERS)):
-            return True
+    def _classify(paragraph, text: str, style_name: str) -> DocxParagraph:
+        """Классификация уже нормализованного абзаца за один проход регулярки."""
+        match = PARAGRAPH_RE.match(text)
+        heading = match.group("heading") if match else None
+        if heading is not None:
+            # text уже нормализован, а регулярка отрезает пробелы вокруг тела
+            heading = heading.lower()
 
         p_pr = paragraph._p.pPr
-        if p_pr is not None and p_pr.numPr is not None:
-            return True
+        num_pr = p_pr.numPr if p_pr is not None else None
+        is_list_item = (
+            _is_list_style(style_name)
+            or num_pr is not None
+            or (match is not None and heading is None)
+        )
 
-        if BULLET_PREFIX_RE.match(text):
-            return True
-        return bool(NUMBERED_POINT_RE.match(text))
+        return DocxParagraph(text=text, style_name=style_name, is_list_item=is_list_item, heading=heading,
+                             level=DocxReader._level(match, num_pr, style_name) if is_list_item else 0)
+
+    @staticmethod
+    def _level(match, num_pr, style_name: str) -> int:
+        """Номер пункта в тексте важнее уровня списка: "1.2.3" — третий уровень (2)."""
+        number = match.group("number") if match else None
+        if number:
+            return number.count(".")
+        if num_pr is not None and num_pr.ilvl is not None and num_pr.ilvl.val is not None:
+            return int(num_pr.ilvl.val)
+        style_level = LIST_STYLE_LEVEL_RE.search(style_name)
+        return int(style_level.group("level")) - 1 if style_level else 0
 
 
 class DocxImportService:
@@ -88,32 +138,37 @@ class DocxImportService:
         self._aliases = self._normalize_aliases(aliases or {})
         self._reader = reader or DocxReader(logger=self._logger)
 
-    def parse(self, file_bytes: bytes):
-        paragraphs = self._reader.read_paragraphs(file_bytes)
+    def parse(self, source):
+        paragraphs = self._reader.read_paragraphs(source)
         drafts = []
 
         current_type = None
         index_by_type: dict[str, int] = {}
+        # Открытые пункты секции (уровень, номер в drafts): родитель — ближайший с меньшим уровнем
+        open_items = []
 
         for p in paragraphs:
             marker = self._resolve_group_marker(p)
             if marker == END_MARKER:
                 current_type = None
+                open_items = []
                 continue
             if marker:
                 current_type = marker
                 index_by_type.setdefault(current_type, 0)
+                open_items = []
                 continue
 
             if not current_type or not p.is_list_item:
                 continue
 
-            text = normalize_text(p.text, lower=False)
-            if not text:
-                continue
+            while open_items and open_items[-1][0] >= p.level:
+                open_items.pop()
+            parent_index = open_items[-1][1] if open_items else None
+            open_items.append((p.level, len(drafts)))
 
             index_by_type[current_type] += 1
-            drafts.append(self._make_draft(index_by_type[current_type], text, current_type))
+            drafts.append(self._make_draft(index_by_type[current_type], p.text, current_type, parent_index))
 
         if not drafts:
             self._logger.warning("Не найдено требований для импорта")
@@ -129,20 +184,105 @@ class DocxImportService:
         return normalized
 
     def _resolve_group_marker(self, paragraph: DocxParagraph):
-        raw = normalize_text(paragraph.text, lower=False)
-        if not raw:
+        if paragraph.heading is None:
             return None
-
-        group_match = GROUP_HEADING_RE.match(raw)
-        if not group_match:
-            return None
-
-        marker_value = normalize_text(group_match.group("body"))
-        if marker_value == END_MARKER:
+        if paragraph.heading == END_MARKER:
             return END_MARKER
-        return self._aliases.get(marker_value)
+        return self._aliases.get(paragraph.heading)
 
     @staticmethod
-    def _make_draft(index: int, body: str, requirement_type: str) -> RequirementDraft:
-        title = normalize_text(f"{requirement_type} {index}", lower=False)
-        return RequirementDraft(title=title, requirement_type=requirement_type, description=body)
\ No newline at end of file
+    def _make_draft(index: int, body: str, requirement_type: str, parent_index=None) -> RequirementDraft:
+        return RequirementDraft(
+            title=f"{requirement_type} {index}",
+            requirement_type=requirement_type,
+            description=body,
+            position=index,
+            parent_index=parent_index,
+        )
+
+
+@dataclass(frozen=True)
+class DocxBatchResult:
+    filename: str
+    drafts: tuple = ()
+    error: Optional[str] = None
+
+
+_pool = None
+_pool_workers = 0
+_pool_lock = threading.Lock()
+
+
+def _get_pool(max_workers: int) -> ProcessPoolExecutor:
+    """Общий пул процессов: создается при первом пакетном импорте и переиспользуется."""
+    global _pool, _pool_workers
+    with _pool_lock:
+        if _pool is None or _pool_workers != max_workers:
+            if _pool is not None:
+                _pool.shutdown(wait=False)
+            # spawn: воркеры не наследуют соединения с БД и блокировки потоков веб-сервера
+            _pool = ProcessPoolExecutor(max_workers=max_workers, mp_context=multiprocessing.get_context("spawn"))
+            _pool_workers = max_workers
+        return _pool
+
+
+def _reset_pool(pool: ProcessPoolExecutor):
+    """Убирает сломанный пул (воркер упал): следующий вызов _get_pool создаст новый."""
+    global _pool
+    with _pool_lock:
+        if _pool is pool:
+            _pool = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+def _parse_job(aliases, file_bytes: bytes):
+    return tuple(DocxImportService(aliases=aliases).parse(file_bytes))
+
+
+def parse_docx_batch(files, aliases=None, max_workers=None):
+    """Разбирает несколько .docx параллельно в пуле процессов.
+
+    ``files`` — последовательность пар (имя файла, байты). Результаты
+    возвращаются в порядке входных файлов; ошибка в одном файле
+    не прерывает разбор остальных.
+    """
+    files = list(files)
+    workers = max_workers or multiprocessing.cpu_count()
+
+    if workers <= 1 or len(files) <= 1:
+        results = []
+        for filename, file_bytes in files:
+            try:
+                results.append(DocxBatchResult(filename, _parse_job(aliases, file_bytes)))
+            except Exception as exc:
+                results.append(DocxBatchResult(filename, error=str(exc)))
+        return results
+
+    try:
+        return _run_batch(_get_pool(workers), files, aliases)
+    except BrokenProcessPool:
+        # Пул мог сломаться до этого пакета (прошлый воркер упал по памяти): пакет
+        # повторяется один раз на новом пуле, повторный сбой — ошибка только этого пакета
+        return _run_batch(_get_pool(workers), files, aliases)
+
+
+def _run_batch(pool, files, aliases):
+    try:
+        futures = [(filename, pool.submit(_parse_job, aliases, file_bytes)) for filename, file_bytes in files]
+    except BrokenProcessPool:
+        _reset_pool(pool)
+        raise
+
+    results = []
+    broken = False
+    for filename, future in futures:
+        try:
+            results.append(DocxBatchResult(filename, future.result()))
+        except BrokenProcessPool:
+            broken = True
+            results.append(DocxBatchResult(filename, error="Процесс разбора завершился аварийно"))
+        except Exception as exc:
+            results.append(DocxBatchResult(filename, error=str(exc)))
+    if broken:
+        _reset_pool(pool)
+    return results
@@ -0,0 +1,113 @@
+"""Дисковый кеш сгенерированных XLSX-экспортов.
+
+Ключ — (project_id, вид экспорта, метка проекта, ревизия проекта). Любая запись
+через logic.py поднимает ревизию, поэтому старые файлы перестают находиться и
+удаляются при следующей сборке того же экспорта или вытесняются по LRU-бюджету.
+Метка (projects.cache_token) отличает проекты с тем же id из другой или заново
+созданной БД, у которых ревизии снова начинаются с 0.
+"""
+
+import os
+import threading
+import uuid
+
+from flask import current_app
+
+EXTENSION_KEY = 'export_cache'
+
+
+class ExportCache:
+    def __init__(self, directory, max_bytes):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def path_for(self, project_id: int, kind: str, token: str, revision: int) -> str:
+        return os.path.join(self.directory, f'p{int(project_id)}_{kind}_{token}_r{int(revision)}.xlsx')
+
+    def get_or_build(self, project_id: int, kind: str, token: str, revision: int, build) -> str:
+        """Путь к готовому файлу; при промахе вызывает build(path) и кладет результат в кеш."""
+        path = self.path_for(project_id, kind, token, revision)
+        if os.path.exists(path):
+            # mtime служит меткой последнего использования для LRU
+            os.utime(path)
+            return path
+
+        tmp_path = f'{path}.{uuid.uuid4().hex}.tmp'
+        try:
+            build(tmp_path)
+            os.replace(tmp_path, path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+        self._drop_stale(project_id, kind, keep=path)
+        self._evict(keep=path)
+        return path
+
+    def send_or_build(self, project_id: int, kind: str, token: str, revision: int, build, send):
+        """Результат send(path) для готового файла. send должен открыть файл сразу
+        (как send_file по пути): открытый дескриптор читается, даже если параллельная
+        сборка новой ревизии или вытеснение потом удалят файл из каталога. Если файл
+        исчез до открытия, он собирается заново."""
+        for _attempt in range(3):
+            path = self.get_or_build(project_id, kind, token, revision, build)
+            try:
+                return send(path)
+            except FileNotFoundError:
+                continue
+        raise FileNotFoundError(path)
+
+    def invalidate(self, project_id: int):
+        """Удаляет все закешированные экспорты проекта."""
+        prefix = f'p{int(project_id)}_'
+        for name in self._entries():
+            if name.startswith(prefix):
+                self._remove(os.path.join(self.directory, name))
+
+    def _drop_stale(self, project_id, kind, keep):
+        prefix = f'p{int(project_id)}_{kind}_'
+        for name in self._entries():
+            path = os.path.join(self.directory, name)
+            if name.startswith(prefix) and path != keep:
+                self._remove(path)
+
+    def _evict(self, keep):
+        with self._lock:
+            files = []
+            for name in self._entries():
+                path = os.path.join(self.directory, name)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                files.append((stat.st_mtime, stat.st_size, path))
+
+            total = sum(size for _mtime, size, _path in files)
+            for _mtime, size, path in sorted(files):
+                if total <= self.max_bytes:
+                    break
+                if path == keep:
+                    continue
+                self._remove(path)
+                total -= size
+
+    def _entries(self):
+        return [name for name in os.listdir(self.directory) if name.endswith('.xlsx')]
+
+    @staticmethod
+    def _remove(path):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+
+def init_app(app):
+    directory = app.config.get('EXPORT_CACHE_DIR') or os.path.join(app.instance_path, 'export_cache')
+    app.extensions[EXTENSION_KEY] = ExportCache(directory, app.config['EXPORT_CACHE_MAX_BYTES'])
+
+
+def get_export_cache() -> ExportCache:
+    return current_app.extensions[EXTENSION_KEY]
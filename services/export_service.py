@@ -1,12 +1,19 @@
 """Экспорт в Excel"""
 
-from openpyxl import Workbook
+
+def _new_workbook():
+    # openpyxl тяжелый, поэтому импортируется при первом экспорте, а не при старте воркера
+    from openpyxl import Workbook
+    return Workbook()
 
 
 class ExportService:
+    # Меняется при изменении состава колонок: входит в ключ кеша экспортов
+    FORMAT_VERSION = 2
+
     def export_to_excel(self, requirements, links, file_path):
         """Экспорт списка требований и связей в один .xlsx."""
-        wb = Workbook()
+        wb = _new_workbook()
 
         #Лист 1: требования
         ws_req = wb.active
@@ -14,6 +21,7 @@ class ExportService:
         ws_req.append([
             "id",
             "title",
+            "description",
             "type",
             "status",
             "priority",
@@ -26,6 +34,7 @@ class ExportService:
             ws_req.append([
                 d.get("id"),
                 d.get("title"),
+                d.get("description"),
                 d.get("requirement_type"),
                 d.get("status"),
                 d.get("priority"),
@@ -49,7 +58,7 @@ class ExportService:
 
     def export_matrix_to_excel(self, requirements, links, file_path):
         """Экспорт матрицы пересечений (кто кого покрывает/зависит/...)"""
-        wb = Workbook()
+        wb = _new_workbook()
         ws = wb.active
         ws.title = "Matrix"
 
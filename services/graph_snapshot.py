@@ -0,0 +1,231 @@
+"""Снимок графа проекта в файлах .npy, общий для всех воркеров.
+
+Снимок — только массивы: id требований (по возрастанию), коды типа,
+статуса и приоритета, связи в формате CSR (indptr по строкам-источникам,
+индексы строк-целей и коды типов связей). Каждый массив лежит в своем
+файле .npy и открывается через np.load(mmap_mode='r'): страницы общие для
+всех процессов через кеш страниц ОС, копии в памяти воркера нет. Каталог
+снимков можно разместить в /dev/shm — тогда это разделяемая память.
+
+Снимок помечен меткой и ревизией проекта (имя каталога
+p<id>.<cache_token>.r<revision>). Любая запись в logic.py поднимает
+ревизию, поэтому устаревший снимок определяется одним запросом строки
+проекта по первичному ключу. Метка отличает проекты с тем же id из другой
+или заново созданной БД, у которых ревизии снова начинаются с 0. Новый снимок
+пишется во временный каталог и публикуется переименованием, так что
+воркеры, строящие его одновременно, не мешают друг другу, а старые
+отображения остаются валидными до конца запроса.
+
+Режим необязательный: без GRAPH_SNAPSHOT_DIR снимки не строятся и
+вызывающий код читает граф из БД как раньше.
+"""
+
+import os
+import shutil
+import threading
+import uuid
+
+from flask import current_app
+from sqlalchemy import select
+
+from models.project import Project
+from models.requirement import Requirement, RequirementType, RequirementStatus, Priority
+from models.link import Link, LinkType
+
+EXTENSION_KEY = 'graph_snapshots'
+
+# Код енума — позиция значения в перечислении; -1 — значение не задано
+REQUIREMENT_TYPES = tuple(RequirementType)
+STATUSES = tuple(RequirementStatus)
+PRIORITIES = tuple(Priority)
+LINK_TYPES = tuple(LinkType)
+
+ARRAYS = ("ids", "requirement_type", "status", "priority", "indptr", "targets", "link_type")
+
+
+def _np():
+    # NumPy не импортируется при старте воркера, если снимки выключены
+    import numpy
+    return numpy
+
+
+def _codes(np, values, members):
+    index = {member: code for code, member in enumerate(members)}
+    return np.fromiter((index.get(value, -1) for value in values), dtype=np.int8, count=len(values))
+
+
+class GraphSnapshot:
+    """Массивы графа одной ревизии проекта (только чтение)."""
+
+    def __init__(self, token, revision, arrays):
+        self.token = token
+        self.revision = revision
+        for name in ARRAYS:
+            setattr(self, name, arrays[name])
+
+    def __len__(self):
+        return len(self.ids)
+
+    def rows_of(self, requirement_ids):
+        """Номера строк для id требований; -1 — требования нет в снимке."""
+        np = _np()
+        requirement_ids = np.asarray(requirement_ids, dtype=np.int64)
+        if not len(self.ids):
+            return np.full(len(requirement_ids), -1, dtype=np.int64)
+        rows = np.minimum(np.searchsorted(self.ids, requirement_ids), len(self.ids) - 1)
+        return np.where(self.ids[rows] == requirement_ids, rows, -1)
+
+    def edges(self, rows=None):
+        """(строки-источники, строки-цели, коды типов связей) всех связей или связей из rows."""
+        np = _np()
+        if rows is None:
+            sources = np.repeat(np.arange(len(self.ids)), np.diff(self.indptr))
+            return sources, self.targets, self.link_type
+        rows = np.asarray(rows, dtype=np.int64)
+        starts, ends = self.indptr[rows], self.indptr[rows + 1]
+        counts = ends - starts
+        positions = np.repeat(starts - np.cumsum(counts) + counts, counts) + np.arange(counts.sum())
+        return np.repeat(rows, counts), self.targets[positions], self.link_type[positions]
+
+    def link_map(self, rows=None):
+        """source id -> target id -> значение типа связи (формат матрицы API)."""
+        sources, targets, codes = self.edges(rows)
+        matrix = {}
+        for source, target, code in zip(self.ids[sources].tolist(), self.ids[targets].tolist(), codes.tolist()):
+            matrix.setdefault(source, {})[target] = LINK_TYPES[code].value
+        return matrix
+
+
+def build_arrays(db_session, project_id):
+    """Массивы снимка из БД: требования проекта и связи внутри проекта."""
+    np = _np()
+    nodes = db_session.execute(
+        select(Requirement.id, Requirement.requirement_type, Requirement.status, Requirement.priority)
+        .where(Requirement.project_id == project_id)
+        .order_by(Requirement.id.asc())
+    ).all()
+    project_req_ids = select(Requirement.id).where(Requirement.project_id == project_id)
+    links = db_session.execute(
+        select(Link.source_requirement_id, Link.target_requirement_id, Link.link_type)
+        .where(Link.source_requirement_id.in_(project_req_ids))
+        .where(Link.target_requirement_id.in_(project_req_ids))
+        .order_by(Link.id.asc())
+    ).all()
+
+    ids = np.fromiter((row.id for row in nodes), dtype=np.int64, count=len(nodes))
+    sources = np.searchsorted(ids, np.fromiter((row[0] for row in links), dtype=np.int64, count=len(links)))
+    targets = np.searchsorted(ids, np.fromiter((row[1] for row in links), dtype=np.int64, count=len(links)))
+    link_codes = _codes(np, [row[2] for row in links], LINK_TYPES)
+    # Стабильная сортировка по источнику сохраняет порядок создания связей внутри строки
+    order = np.argsort(sources, kind="stable")
+    indptr = np.zeros(len(ids) + 1, dtype=np.int64)
+    np.cumsum(np.bincount(sources, minlength=len(ids)), out=indptr[1:])
+    return {
+        "ids": ids,
+        "requirement_type": _codes(np, [row.requirement_type for row in nodes], REQUIREMENT_TYPES),
+        "status": _codes(np, [row.status for row in nodes], STATUSES),
+        "priority": _codes(np, [row.priority for row in nodes], PRIORITIES),
+        "indptr": indptr,
+        "targets": targets[order].astype(np.int32),
+        "link_type": link_codes[order],
+    }
+
+
+class SnapshotStore:
+    """Каталог снимков и отображенные в память снимки этого воркера."""
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.lock = threading.Lock()
+        self._mapped = {}
+        os.makedirs(directory, exist_ok=True)
+
+    def path_for(self, project_id: int, token: str, revision: int) -> str:
+        return os.path.join(self.directory, f'p{int(project_id)}.{token}.r{int(revision)}')
+
+    def _map(self, path, token, revision):
+        np = _np()
+        try:
+            arrays = {name: np.load(os.path.join(path, f'{name}.npy'), mmap_mode='r') for name in ARRAYS}
+        except (FileNotFoundError, ValueError, OSError):
+            return None
+        return GraphSnapshot(token, revision, arrays)
+
+    def _publish(self, project_id, token, revision, arrays):
+        """Пишет снимок во временный каталог и атомарно переименовывает его."""
+        np = _np()
+        path = self.path_for(project_id, token, revision)
+        tmp_path = f'{path}.{uuid.uuid4().hex}.tmp'
+        os.makedirs(tmp_path)
+        try:
+            for name in ARRAYS:
+                np.save(os.path.join(tmp_path, f'{name}.npy'), arrays[name])
+            try:
+                os.rename(tmp_path, path)
+            except OSError:
+                # Тот же снимок уже опубликовал другой воркер
+                pass
+        finally:
+            shutil.rmtree(tmp_path, ignore_errors=True)
+        self._remove_older(project_id, token, revision)
+
+    def _remove_older(self, project_id, token, revision):
+        """Удаляет снимки проекта старше revision и снимки с другой меткой."""
+        prefix = f'p{int(project_id)}.'
+        for name in os.listdir(self.directory):
+            if not name.startswith(prefix) or name.endswith('.tmp'):
+                continue
+            name_token, _sep, stamp = name[len(prefix):].rpartition('.r')
+            # Уже отображенные файлы остаются доступны воркерам до закрытия отображения
+            if stamp.isdigit() and (name_token != token or int(stamp) < revision):
+                shutil.rmtree(os.path.join(self.directory, name), ignore_errors=True)
+
+    def get(self, db_session, project_id: int):
+        """Снимок текущей ревизии проекта или None, если проекта нет."""
+        project = db_session.execute(
+            select(Project.cache_token, Project.revision).where(Project.id == project_id)).first()
+        if project is None:
+            return None
+        token, revision = project
+
+        with self.lock:
+            snapshot = self._mapped.get(project_id)
+        if snapshot is not None and snapshot.token == token and snapshot.revision == revision:
+            return snapshot
+
+        path = self.path_for(project_id, token, revision)
+        snapshot = self._map(path, token, revision)
+        if snapshot is None:
+            arrays = build_arrays(db_session, project_id)
+            snapshot = GraphSnapshot(token, revision, arrays)
+            # Если проект изменился во время чтения, данные могут быть новее ревизии: не публикуем
+            current = db_session.execute(select(Project.revision).where(Project.id == project_id)).scalar()
+            if current != revision:
+                return snapshot
+            self._publish(project_id, token, revision, arrays)
+            snapshot = self._map(path, token, revision) or snapshot
+
+        with self.lock:
+            self._mapped[project_id] = snapshot
+        return snapshot
+
+    def invalidate(self, project_id: int):
+        with self.lock:
+            self._mapped.pop(project_id, None)
+        self._remove_older(project_id, None, float('inf'))
+
+
+def init_app(app):
+    directory = app.config.get('GRAPH_SNAPSHOT_DIR')
+    app.extensions[EXTENSION_KEY] = SnapshotStore(directory) if directory else None
+
+
+def get_snapshot_store():
+    """Хранилище снимков или None, если режим выключен."""
+    return current_app.extensions.get(EXTENSION_KEY)
+
+
+def project_snapshot(db_session, project_id: int):
+    """Снимок графа проекта; None — режим выключен или проекта нет."""
+    store = get_snapshot_store()
+    return store.get(db_session, project_id) if store is not None else None
@@ -0,0 +1,150 @@
+"""Иерархия требований на таблице замыкания requirement_closure.
+
+requirements.parent_id — непосредственный родитель, requirement_closure —
+строка (предок, потомок, глубина) на каждого предка требования. Строк
+(X, X, 0) нет, поэтому пути, создающие требования без родителя (импорт
+XLSX, восстановление дампа), таблицу не трогают, а поддерево — это сам
+корень плюс строки с ancestor_id = корень.
+
+Операции над деревом не обходят его по уровням:
+
+* поддерево и цепочка предков — один SELECT по первичному ключу
+  (ancestor_id, descendant_id) или индексу (descendant_id, depth);
+* перенос поддерева — DELETE путей от прежних предков и один
+  INSERT ... SELECT: новые предки корня × узлы поддерева;
+* удаление поддерева — по одному DELETE ... WHERE id IN (поддерево)
+  на таблицу.
+
+Коммит делает вызывающий код.
+"""
+
+from sqlalchemy import Integer, bindparam, delete, insert, literal, or_, select, true, union_all, update
+
+from models.requirement import Requirement, RequirementClosure
+from models.link import Link
+from models.history import HistoryArchiveChunk
+
+closure = RequirementClosure.__table__
+requirements = Requirement.__table__
+
+
+def in_subtree(column, root_id, max_depth=None):
+    """Условие «column — узел поддерева root_id» (корень входит); max_depth — не глубже стольких уровней."""
+    descendants = select(closure.c.descendant_id).where(closure.c.ancestor_id == root_id)
+    if max_depth is not None:
+        descendants = descendants.where(closure.c.depth <= max_depth)
+    return or_(column == root_id, column.in_(descendants))
+
+
+_REQUIREMENT = bindparam('requirement_id', type_=Integer)
+_PARENT = bindparam('parent_id', type_=Integer)
+
+# Новые предки корня: сам родитель (глубина 1) и его предки
+_NEW_ANCESTORS = union_all(
+    select(_PARENT.label('ancestor_id'), literal(1).label('depth')),
+    select(closure.c.ancestor_id, (closure.c.depth + 1).label('depth')).where(closure.c.descendant_id == _PARENT),
+).subquery('new_ancestors')
+# Узлы поддерева: корень (глубина 0) и его потомки
+_SUBTREE_NODES = union_all(
+    select(_REQUIREMENT.label('descendant_id'), literal(0).label('depth')),
+    select(closure.c.descendant_id, closure.c.depth).where(closure.c.ancestor_id == _REQUIREMENT),
+).subquery('subtree_nodes')
+_GRAFT = insert(closure).from_select(
+    ['ancestor_id', 'descendant_id', 'depth'],
+    select(_NEW_ANCESTORS.c.ancestor_id, _SUBTREE_NODES.c.descendant_id,
+           _NEW_ANCESTORS.c.depth + _SUBTREE_NODES.c.depth)
+    .select_from(_NEW_ANCESTORS.join(_SUBTREE_NODES, true())),
+)
+_DETACH = delete(closure).where(
+    in_subtree(closure.c.descendant_id, _REQUIREMENT),
+    closure.c.ancestor_id.in_(select(closure.c.ancestor_id).where(closure.c.descendant_id == _REQUIREMENT)),
+)
+_IS_DESCENDANT = (
+    select(closure.c.depth)
+    .where(closure.c.ancestor_id == _REQUIREMENT, closure.c.descendant_id == bindparam('descendant_id'))
+)
+ANCESTORS = (
+    select(Requirement)
+    .join(closure, closure.c.ancestor_id == Requirement.id)
+    .where(closure.c.descendant_id == _REQUIREMENT)
+    .order_by(closure.c.depth.desc())
+)
+# Удаление узла: его потомки поднимаются на уровень к его предкам
+_SHORTEN_PATHS = (
+    update(closure)
+    .where(closure.c.ancestor_id.in_(select(closure.c.ancestor_id).where(closure.c.descendant_id == _REQUIREMENT)))
+    .where(closure.c.descendant_id.in_(select(closure.c.descendant_id).where(closure.c.ancestor_id == _REQUIREMENT)))
+    .values(depth=closure.c.depth - 1)
+)
+_DROP_NODE = delete(closure).where(or_(closure.c.ancestor_id == _REQUIREMENT, closure.c.descendant_id == _REQUIREMENT))
+_CHILDREN = select(requirements).where(requirements.c.parent_id == _REQUIREMENT)
+_REPARENT_CHILDREN = (
+    update(requirements)
+    .where(requirements.c.parent_id == _REQUIREMENT)
+    .values(parent_id=_PARENT, version=requirements.c.version + 1, updated_at=bindparam('updated_at'))
+)
+
+
+def graft(db_session, pairs):
+    """Добавляет пути для пар (требование, новый родитель); требования должны быть вне иерархии.
+
+    Пары выполняются по порядку, поэтому родитель из того же пакета идет раньше потомка.
+    """
+    if pairs:
+        db_session.execute(_GRAFT, [{'requirement_id': req_id, 'parent_id': parent_id} for req_id, parent_id in pairs])
+
+
+def is_in_subtree(db_session, root_id, requirement_id):
+    if root_id == requirement_id:
+        return True
+    return db_session.execute(_IS_DESCENDANT, {'requirement_id': root_id, 'descendant_id': requirement_id}).first() is not None
+
+
+def move(db_session, requirement_id, parent_id):
+    """Переносит поддерево требования под parent_id (None — в корень); parent_id меняет вызывающий код."""
+    db_session.execute(_DETACH, {'requirement_id': requirement_id})
+    if parent_id is not None:
+        graft(db_session, [(requirement_id, parent_id)])
+
+
+def remove_node(db_session, requirement_id, parent_id, updated_at):
+    """Убирает узел из иерархии перед удалением: дети переходят к parent_id.
+
+    У детей поднимается version и ставится updated_at; возвращаются их строки
+    до переноса, историю пишет вызывающий код.
+    """
+    params = {'requirement_id': requirement_id, 'parent_id': parent_id, 'updated_at': updated_at}
+    children = db_session.execute(_CHILDREN, params).all()
+    db_session.execute(_SHORTEN_PATHS, params)
+    db_session.execute(_DROP_NODE, params)
+    if children:
+        db_session.execute(_REPARENT_CHILDREN, params)
+    return children
+
+
+def delete_subtree(db_session, root_id):
+    """Удаляет требования поддерева, их связи, индекс архива истории и пути;
+    строка пути удаляется последней. Записи истории остаются как журнал аудита."""
+    chunks = HistoryArchiveChunk.__table__
+    links = Link.__table__
+    db_session.execute(delete(links).where(or_(in_subtree(links.c.source_requirement_id, root_id),
+                                               in_subtree(links.c.target_requirement_id, root_id))))
+    db_session.execute(delete(chunks).where(in_subtree(chunks.c.requirement_id, root_id)))
+    db_session.execute(delete(requirements).where(in_subtree(requirements.c.id, root_id)))
+    db_session.execute(delete(closure).where(in_subtree(closure.c.descendant_id, root_id)))
+
+
+def rebuild(db_session, project_id):
+    """Пересобирает пути проекта по parent_id (после восстановления дампа)."""
+    project_ids = select(requirements.c.id).where(requirements.c.project_id == project_id)
+    db_session.execute(delete(closure).where(closure.c.descendant_id.in_(project_ids)))
+
+    paths = (select(requirements.c.parent_id.label('ancestor_id'), requirements.c.id.label('descendant_id'),
+                    literal(1).label('depth'))
+             .where(requirements.c.project_id == project_id, requirements.c.parent_id.is_not(None))
+             .cte('paths', recursive=True))
+    paths = paths.union_all(
+        select(requirements.c.parent_id, paths.c.descendant_id, paths.c.depth + 1)
+        .where(requirements.c.id == paths.c.ancestor_id, requirements.c.parent_id.is_not(None))
+    )
+    db_session.execute(insert(closure).from_select(['ancestor_id', 'descendant_id', 'depth'], select(paths)))
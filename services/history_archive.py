@@ -0,0 +1,282 @@
+"""Хранение истории изменений: перенос старых записей в сжатый архив.
+
+У проекта есть срок хранения истории в БД (projects.history_retention_days,
+по умолчанию HISTORY_RETENTION_DAYS; 0 или пусто — хранить всё). Записи
+старше срока переносятся уплотнением в архив на диске:
+
+* сегмент — неизменяемый файл ``p<project>/<время>-<uuid>.gz`` из
+  нескольких gzip-блоков подряд, по блоку на требование; внутри блока —
+  записи истории в JSON, по строке на запись;
+* индекс сегментов — таблица history_archive_chunks (требование, сегмент,
+  смещение и длина блока, интервал времени), по ней история одного
+  требования читается без распаковки остальных блоков. При удалении
+  требования его строки индекса удаляются в той же транзакции, а блоки в
+  сегментах остаются без ссылок.
+
+Уплотнение идет пачками по HISTORY_COMPACTION_BATCH записей, каждая пачка
+в своей короткой транзакции: сначала сегмент пишется и переименовывается
+на диске, затем в одной транзакции удаляются перенесенные строки и
+добавляется индекс. Если строки уже перенес другой процесс, транзакция
+откатывается, а записанный сегмент остается без ссылок и не читается.
+
+Запуск: фоновый поток воркера (HISTORY_COMPACTION_INTERVAL > 0), маршрут
+``POST /api/projects/<id>/history/compact`` или из командной строки:
+
+    python -m services.history_archive compact [--project 1] [--max-batches 10]
+"""
+
+import argparse
+from datetime import datetime, timedelta
+import gzip
+import json
+import logging
+import os
+import shutil
+import threading
+import time
+import uuid
+
+from flask import current_app
+from sqlalchemy import delete, insert, select
+
+from models.project import Project
+from models.requirement import Requirement
+from models.history import RequirementHistory, HistoryArchiveChunk
+from sharding import project_scope
+
+EXTENSION_KEY = 'history_archive'
+
+logger = logging.getLogger(__name__)
+
+HISTORY_FIELDS = ('id', 'requirement_id', 'changed_by', 'changed_at', 'change_type', 'old_values', 'new_values')
+
+
+def _encode_entry(row):
+    entry = {field: row[field] for field in HISTORY_FIELDS}
+    if entry['changed_at'] is not None:
+        entry['changed_at'] = entry['changed_at'].isoformat()
+    return entry
+
+
+def _decode_entry(entry):
+    """Архивная запись как несохраненный RequirementHistory (тот же to_dict)."""
+    changed_at = entry.get('changed_at')
+    return RequirementHistory(
+        id=entry.get('id'),
+        requirement_id=entry['requirement_id'],
+        changed_by=entry.get('changed_by'),
+        changed_at=datetime.fromisoformat(changed_at) if changed_at else None,
+        change_type=entry.get('change_type'),
+        old_values=entry.get('old_values'),
+        new_values=entry.get('new_values'),
+    )
+
+
+class HistoryArchive:
+    """Сегменты архива истории в каталоге на диске."""
+
+    def __init__(self, directory, batch_size=1000, compresslevel=6):
+        self.directory = directory
+        self.batch_size = batch_size
+        self.compresslevel = compresslevel
+        os.makedirs(directory, exist_ok=True)
+
+    def _write_segment(self, project_id, groups):
+        """Пишет сегмент из групп (requirement_id, записи); возвращает путь и (смещение, длина) блоков."""
+        relative = os.path.join(f'p{int(project_id)}',
+                                f'{datetime.utcnow():%Y%m%d%H%M%S}-{uuid.uuid4().hex[:12]}.gz')
+        path = os.path.join(self.directory, relative)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f'{path}.tmp'
+        blocks = []
+        try:
+            with open(tmp_path, 'wb') as f:
+                for _requirement_id, entries in groups:
+                    lines = '\n'.join(json.dumps(entry, ensure_ascii=False) for entry in entries) + '\n'
+                    block = gzip.compress(lines.encode('utf-8'), self.compresslevel)
+                    blocks.append((f.tell(), len(block)))
+                    f.write(block)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        return relative, blocks
+
+    def read_chunk(self, chunk):
+        with open(os.path.join(self.directory, chunk.segment), 'rb') as f:
+            f.seek(chunk.offset)
+            data = gzip.decompress(f.read(chunk.length))
+        return [json.loads(line) for line in data.decode('utf-8').splitlines() if line]
+
+    def archived_entries(self, db_session, requirement_id):
+        """Архивные записи требования (несохраненные RequirementHistory)."""
+        statement = (select(HistoryArchiveChunk)
+                     .where(HistoryArchiveChunk.requirement_id == requirement_id)
+                     .order_by(HistoryArchiveChunk.last_changed_at.desc()))
+        entries = []
+        for chunk in db_session.scalars(statement):
+            entries.extend(_decode_entry(entry) for entry in self.read_chunk(chunk))
+        return entries
+
+    def iter_project_entries(self, db_session, project_id):
+        """Архивные записи существующих требований проекта в виде словарей (для дампа проекта)."""
+        req_ids = select(Requirement.id).where(Requirement.project_id == project_id)
+        chunks = db_session.scalars(
+            select(HistoryArchiveChunk)
+            .where(HistoryArchiveChunk.project_id == project_id)
+            .where(HistoryArchiveChunk.requirement_id.in_(req_ids))
+            .order_by(HistoryArchiveChunk.id)
+        )
+        for chunk in chunks:
+            yield from self.read_chunk(chunk)
+
+    def compact_batch(self, db_session, project_id, cutoff):
+        """Переносит в архив одну пачку записей старше cutoff; возвращает их число."""
+        history = RequirementHistory.__table__
+        rows = db_session.execute(
+            select(history)
+            .join(Requirement.__table__, Requirement.id == history.c.requirement_id)
+            .where(Requirement.project_id == project_id)
+            .where(history.c.changed_at < cutoff)
+            .order_by(history.c.requirement_id, history.c.id)
+            .limit(self.batch_size)
+        ).mappings().all()
+        db_session.rollback()
+        if not rows:
+            return 0
+
+        groups = []
+        times = []
+        for row in rows:
+            if not groups or groups[-1][0] != row['requirement_id']:
+                groups.append((row['requirement_id'], []))
+                times.append([])
+            groups[-1][1].append(_encode_entry(row))
+            times[-1].append(row['changed_at'])
+        segment, blocks = self._write_segment(project_id, groups)
+
+        ids = [row['id'] for row in rows]
+        try:
+            deleted = db_session.execute(delete(history).where(history.c.id.in_(ids))).rowcount
+            if deleted != len(ids):
+                # Часть строк уже перенес другой процесс: сегмент остается без ссылок
+                db_session.rollback()
+                return 0
+            chunk_rows = []
+            for (requirement_id, entries), (offset, length), changed in zip(groups, blocks, times):
+                chunk_rows.append({
+                    'project_id': project_id,
+                    'requirement_id': requirement_id,
+                    'segment': segment,
+                    'offset': offset,
+                    'length': length,
+                    'entry_count': len(entries),
+                    'first_changed_at': min(changed),
+                    'last_changed_at': max(changed),
+                })
+            db_session.execute(insert(HistoryArchiveChunk.__table__), chunk_rows)
+            db_session.commit()
+        except Exception:
+            db_session.rollback()
+            raise
+        return len(ids)
+
+    def compact_project(self, db_session, project_id, retention_days, now=None, max_batches=None):
+        """Уплотняет историю проекта не больше чем max_batches пачками; возвращает число записей."""
+        if not retention_days:
+            return 0
+        cutoff = (now or datetime.utcnow()) - timedelta(days=retention_days)
+        moved = 0
+        batches = 0
+        with project_scope(project_id):
+            while max_batches is None or batches < max_batches:
+                count = self.compact_batch(db_session, project_id, cutoff)
+                if not count:
+                    break
+                moved += count
+                batches += 1
+        return moved
+
+    def delete_project(self, db_session, project_id):
+        """Удаляет индекс и сегменты архива проекта (коммит делает вызывающий код)."""
+        with project_scope(project_id):
+            db_session.execute(delete(HistoryArchiveChunk).where(HistoryArchiveChunk.project_id == project_id))
+        shutil.rmtree(os.path.join(self.directory, f'p{int(project_id)}'), ignore_errors=True)
+
+
+def retention_days(project, config):
+    if project.history_retention_days is not None:
+        return project.history_retention_days
+    return config['HISTORY_RETENTION_DAYS']
+
+
+def run_compaction(db_session, archive, config, project_ids=None, max_batches=None):
+    """Один проход уплотнения по проектам; {project_id: перенесено записей}."""
+    statement = select(Project)
+    if project_ids is not None:
+        statement = statement.where(Project.id.in_(project_ids))
+    projects = [(project.id, retention_days(project, config)) for project in db_session.scalars(statement)]
+    db_session.rollback()
+
+    moved = {}
+    for project_id, days in projects:
+        count = archive.compact_project(db_session, project_id, days, max_batches=max_batches)
+        if count:
+            moved[project_id] = count
+    return moved
+
+
+def _compaction_loop(app, interval):
+    from database import db
+
+    while True:
+        time.sleep(interval)
+        with app.app_context():
+            try:
+                moved = run_compaction(db.session, get_history_archive(), app.config,
+                                       max_batches=app.config['HISTORY_COMPACTION_MAX_BATCHES'])
+                if moved:
+                    logger.info("История перенесена в архив: %s", moved)
+            except Exception:
+                logger.exception("Ошибка уплотнения истории")
+            finally:
+                db.session.remove()
+
+
+def init_app(app):
+    directory = app.config.get('HISTORY_ARCHIVE_DIR') or os.path.join(app.instance_path, 'history_archive')
+    app.extensions[EXTENSION_KEY] = HistoryArchive(directory, batch_size=app.config['HISTORY_COMPACTION_BATCH'])
+
+    interval = app.config['HISTORY_COMPACTION_INTERVAL']
+    if interval:
+        thread = threading.Thread(target=_compaction_loop, args=(app, interval),
+                                  name='history-compaction', daemon=True)
+        thread.start()
+
+
+def get_history_archive() -> HistoryArchive:
+    return current_app.extensions[EXTENSION_KEY]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Архив истории изменений TraceReq')
+    sub = parser.add_subparsers(dest='command', required=True)
+    compact = sub.add_parser('compact', help='перенести историю старше срока хранения в архив')
+    compact.add_argument('--project', type=int, action='append', help='id проекта (можно несколько)')
+    compact.add_argument('--max-batches', type=int, default=None, help='пачек на проект за проход')
+    args = parser.parse_args(argv)
+
+    from app import app
+    from database import db
+
+    with app.app_context():
+        moved = run_compaction(db.session, get_history_archive(), app.config,
+                               project_ids=args.project, max_batches=args.max_batches)
+    for project_id, count in sorted(moved.items()):
+        print(f'project {project_id}: {count} records archived')
+
+
+if __name__ == '__main__':
+    main()
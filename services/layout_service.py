@@ -0,0 +1,285 @@
+"""Серверная раскладка графа требований для Mind Map.
+
+Координаты считаются силовым алгоритмом Фрухтермана — Рейнгольда на
+массивах NumPy: отталкивание всех пар узлов считается блоками строк,
+притяжение — по массиву ребер. Результат кешируется на диске с меткой
+(projects.cache_token) и ревизией проекта: метка отличает проекты с тем же
+id из другой или заново созданной БД. При смене ревизии, если изменилась малая часть графа, старые
+координаты сохраняются, а досчитываются только новые узлы и концы
+измененных связей.
+"""
+
+import math
+import os
+import threading
+import uuid
+
+from flask import current_app
+from sqlalchemy import select
+
+from models.project import Project
+from models.requirement import Requirement
+from models.link import Link
+from services.graph_snapshot import LINK_TYPES, project_snapshot
+
+EXTENSION_KEY = 'layout_cache'
+
+# Желаемое расстояние между связанными узлами, в пикселях холста vis.js
+NODE_DISTANCE = 150.0
+FULL_ITERATIONS = 80
+INCREMENTAL_ITERATIONS = 40
+# Доля подвижных узлов, выше которой граф раскладывается заново целиком
+INCREMENTAL_MAX_SHARE = 0.25
+GRAVITY = 0.02
+# Число строк в блоке матрицы попарных расстояний (ограничивает пиковую память)
+REPULSION_BLOCK = 512
+
+
+def _np():
+    # NumPy нужен только для раскладки, поэтому не импортируется при старте воркера
+    import numpy
+    return numpy
+
+
+def _initial_positions(np, count, rng):
+    radius = NODE_DISTANCE * math.sqrt(max(count, 1)) / 2
+    angle = rng.uniform(0, 2 * math.pi, count)
+    r = radius * np.sqrt(rng.uniform(0, 1, count))
+    return np.column_stack([r * np.cos(angle), r * np.sin(angle)]).astype(np.float32)
+
+
+def force_layout(positions, edges, moving=None, iterations=FULL_ITERATIONS, temperature=None):
+    """Итерации Фрухтермана — Рейнгольда над массивом positions (n×2), на месте.
+
+    edges — массив индексов (m×2). moving — булева маска узлов, которые
+    можно двигать (None — все); отталкивание считается только для них.
+    """
+    np = _np()
+    count = len(positions)
+    if count < 2:
+        return positions
+
+    k = NODE_DISTANCE
+    k2 = k * k
+    moving_idx = np.arange(count) if moving is None else np.flatnonzero(moving)
+    if len(moving_idx) == 0:
+        return positions
+    if temperature is None:
+        temperature = k * math.sqrt(count) / 4
+
+    # Координаты хранятся отдельными непрерывными массивами: так блоки n×n
+    # считаются поэлементными операциями без промежуточных массивов n×n×2
+    x = np.ascontiguousarray(positions[:, 0])
+    y = np.ascontiguousarray(positions[:, 1])
+    sources, targets = (edges[:, 0], edges[:, 1]) if len(edges) else (np.empty(0, int), np.empty(0, int))
+    for step in range(iterations):
+        disp_x = np.empty(len(moving_idx), dtype=np.float32)
+        disp_y = np.empty(len(moving_idx), dtype=np.float32)
+
+        for start in range(0, len(moving_idx), REPULSION_BLOCK):
+            block = moving_idx[start:start + REPULSION_BLOCK]
+            dx = x[block, None] - x[None, :]
+            dy = y[block, None] - y[None, :]
+            weight = dx * dx
+            weight += dy * dy
+            np.maximum(weight, 1e-2, out=weight)
+            np.divide(k2, weight, out=weight)
+            disp_x[start:start + len(block)] = np.einsum('ij,ij->i', dx, weight)
+            disp_y[start:start + len(block)] = np.einsum('ij,ij->i', dy, weight)
+
+        if len(sources):
+            dx = x[sources] - x[targets]
+            dy = y[sources] - y[targets]
+            dist = np.sqrt(dx * dx + dy * dy) / k
+            full_x = np.zeros(count, dtype=np.float32)
+            full_y = np.zeros(count, dtype=np.float32)
+            np.add.at(full_x, sources, -dx * dist)
+            np.add.at(full_x, targets, dx * dist)
+            np.add.at(full_y, sources, -dy * dist)
+            np.add.at(full_y, targets, dy * dist)
+            disp_x += full_x[moving_idx]
+            disp_y += full_y[moving_idx]
+
+        # Слабое притяжение к центру не дает несвязанным компонентам разлетаться
+        disp_x -= GRAVITY * x[moving_idx]
+        disp_y -= GRAVITY * y[moving_idx]
+
+        length = np.sqrt(disp_x * disp_x + disp_y * disp_y)
+        np.maximum(length, 1e-6, out=length)
+        scale = np.minimum(length, temperature * (1 - step / iterations)) / length
+        x[moving_idx] += disp_x * scale
+        y[moving_idx] += disp_y * scale
+
+    positions[:, 0] = x
+    positions[:, 1] = y
+    return positions
+
+
+def compute_layout(node_ids, edge_pairs, previous=None, seed=0):
+    """Координаты узлов (n×2) и режим расчета: 'full' или 'incremental'.
+
+    previous — (ids, positions, edge_pairs) прошлой раскладки проекта.
+    """
+    np = _np()
+    rng = np.random.default_rng(seed)
+    index = {node_id: i for i, node_id in enumerate(node_ids)}
+    edges = np.array([(index[s], index[t]) for s, t in edge_pairs], dtype=np.int64).reshape(-1, 2)
+    count = len(node_ids)
+
+    if previous is not None:
+        prev_ids, prev_positions, prev_edges = previous
+        prev_index = {node_id: i for i, node_id in enumerate(prev_ids)}
+        kept = np.array([node_id in prev_index for node_id in node_ids], dtype=bool)
+        changed_edges = set(map(tuple, edge_pairs)) ^ set(map(tuple, prev_edges))
+
+        moving = ~kept
+        for s, t in changed_edges:
+            for node_id in (s, t):
+                if node_id in index:
+                    moving[index[node_id]] = True
+
+        if count and kept.any() and moving.sum() <= INCREMENTAL_MAX_SHARE * count:
+            positions = np.zeros((count, 2), dtype=np.float32)
+            positions[kept] = prev_positions[[prev_index[node_id] for node_id in np.asarray(node_ids)[kept]]]
+            _place_new_nodes(np, positions, kept, edges, rng)
+            if moving.any():
+                force_layout(positions, edges, moving=moving,
+                             iterations=INCREMENTAL_ITERATIONS, temperature=NODE_DISTANCE)
+            return positions, 'incremental'
+
+    positions = _initial_positions(np, count, rng)
+    force_layout(positions, edges, iterations=FULL_ITERATIONS)
+    return positions, 'full'
+
+
+def _place_new_nodes(np, positions, kept, edges, rng):
+    """Новый узел ставится в центр уже размещенных соседей (или рядом с центром графа)."""
+    new_idx = np.flatnonzero(~kept)
+    if not len(new_idx):
+        return
+    sums = np.zeros_like(positions)
+    counts = np.zeros(len(positions), dtype=np.float32)
+    if len(edges):
+        for a, b in ((0, 1), (1, 0)):
+            known = kept[edges[:, b]]
+            np.add.at(sums, edges[known, a], positions[edges[known, b]])
+            np.add.at(counts, edges[known, a], 1)
+    center = positions[kept].mean(axis=0)
+    jitter = rng.normal(0, NODE_DISTANCE / 3, (len(new_idx), 2)).astype(np.float32)
+    has_neighbours = counts[new_idx] > 0
+    base = np.where(has_neighbours[:, None], sums[new_idx] / np.maximum(counts[new_idx], 1)[:, None], center)
+    positions[new_idx] = base + jitter
+
+
+class LayoutCache:
+    """Последняя раскладка каждого проекта в файле .npz (общий для всех воркеров)."""
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def path_for(self, project_id: int) -> str:
+        return os.path.join(self.directory, f'p{int(project_id)}.npz')
+
+    def load(self, project_id: int, token: str):
+        """(revision, ids, positions, edge_pairs) или None, если раскладки с этой меткой нет."""
+        np = _np()
+        try:
+            with np.load(self.path_for(project_id)) as data:
+                if str(data['token']) != token:
+                    return None
+                return (int(data['revision']), data['ids'].tolist(),
+                        data['positions'], data['edges'].tolist())
+        except (FileNotFoundError, KeyError, ValueError, OSError):
+            return None
+
+    def save(self, project_id: int, token: str, revision: int, ids, positions, edge_pairs):
+        np = _np()
+        path = self.path_for(project_id)
+        tmp_path = f'{path}.{uuid.uuid4().hex}.tmp.npz'
+        try:
+            np.savez(tmp_path, token=np.str_(token), revision=np.int64(revision), ids=np.asarray(ids, dtype=np.int64),
+                     positions=positions, edges=np.asarray(edge_pairs, dtype=np.int64).reshape(-1, 2))
+            os.replace(tmp_path, path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def invalidate(self, project_id: int):
+        try:
+            os.remove(self.path_for(project_id))
+        except FileNotFoundError:
+            pass
+
+
+def project_layout(db_session, project_id: int):
+    """Раскладка графа проекта для клиента: узлы с координатами и ребра."""
+    project = db_session.get(Project, project_id)
+    if project is None:
+        return None
+
+    nodes = db_session.execute(
+        select(Requirement.id, Requirement.title, Requirement.requirement_type, Requirement.status)
+        .where(Requirement.project_id == project_id)
+        .order_by(Requirement.id.asc())
+    ).all()
+    node_ids = [row.id for row in nodes]
+
+    snapshot = project_snapshot(db_session, project_id)
+    if (snapshot is not None and snapshot.token == project.cache_token and snapshot.revision == project.revision
+            and snapshot.ids.tolist() == node_ids):
+        # Связи из общего снимка графа, без запроса к БД
+        sources, targets, codes = snapshot.edges()
+        links = list(zip(snapshot.ids[sources].tolist(), snapshot.ids[targets].tolist(),
+                         (LINK_TYPES[code] for code in codes.tolist())))
+    else:
+        project_req_ids = select(Requirement.id).where(Requirement.project_id == project_id)
+        links = db_session.execute(
+            select(Link.source_requirement_id, Link.target_requirement_id, Link.link_type)
+            .where(Link.source_requirement_id.in_(project_req_ids))
+            .where(Link.target_requirement_id.in_(project_req_ids))
+            .order_by(Link.id.asc())
+        ).all()
+
+    edge_pairs = sorted({(s, t) for s, t, _link_type in links if s != t})
+
+    cache = get_layout_cache()
+    cached = cache.load(project_id, project.cache_token)
+    mode = 'cached'
+    if cached is not None and cached[0] == project.revision and cached[1] == node_ids:
+        positions = cached[2]
+    else:
+        previous = cached[1:] if cached is not None else None
+        with cache.lock:
+            positions, mode = compute_layout(node_ids, edge_pairs, previous=previous, seed=project_id)
+            cache.save(project_id, project.cache_token, project.revision, node_ids, positions, edge_pairs)
+
+    return {
+        'revision': project.revision,
+        'mode': mode,
+        'nodes': [
+            {
+                'id': row.id,
+                'title': row.title,
+                'requirement_type': row.requirement_type.value,
+                'status': row.status.value if row.status else None,
+                'x': round(float(positions[i][0]), 1),
+                'y': round(float(positions[i][1]), 1),
+            }
+            for i, row in enumerate(nodes)
+        ],
+        'edges': [
+            {'source_id': s, 'target_id': t, 'link_type': link_type.value}
+            for s, t, link_type in links
+        ],
+    }
+
+
+def init_app(app):
+    directory = app.config.get('LAYOUT_CACHE_DIR') or os.path.join(app.instance_path, 'layout_cache')
+    app.extensions[EXTENSION_KEY] = LayoutCache(directory)
+
+
+def get_layout_cache() -> LayoutCache:
+    return current_app.extensions[EXTENSION_KEY]
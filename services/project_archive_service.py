@@ -0,0 +1,252 @@
+"""Полная выгрузка и восстановление проекта (требования, связи, история).
+
+Формат — NDJSON, сжатый gzip: первая строка — заголовок с данными проекта,
+далее по одной записи на строку в порядке requirements → links → history.
+Выгрузка и загрузка идут потоково, пачками по ``chunk_size`` строк.
+"""
+
+from datetime import datetime
+from enum import Enum
+import gzip
+import io
+import json
+import zlib
+
+from sqlalchemy import DateTime, Enum as SQLEnum, bindparam, func, insert, select, update
+
+from models.project import Project
+from models.requirement import Requirement
+from models.link import Link
+from models.history import RequirementHistory
+from services import hierarchy
+from sharding import project_scope
+
+DUMP_FORMAT = "tracereq-project-dump"
+DUMP_VERSION = 1
+
+ID_MODE_REMAP = "remap"
+ID_MODE_PRESERVE = "preserve"
+
+# Порядок важен: связи и история ссылаются на уже восстановленные требования
+SECTIONS = (
+    ("requirement", Requirement.__table__),
+    ("link", Link.__table__),
+    ("history", RequirementHistory.__table__),
+)
+
+
+def _encode_value(value):
+    # str-енумы модели сериализуются json как строки сами, сюда попадают остальные
+    if isinstance(value, Enum):
+        return value.value
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+
+def _decode_row(table, record):
+    row = {}
+    for column in table.columns:
+        if column.name not in record:
+            continue
+        value = record[column.name]
+        if value is not None:
+            if isinstance(column.type, SQLEnum) and column.type.enum_class is not None:
+                value = column.type.enum_class(value)
+            elif isinstance(column.type, DateTime):
+                value = datetime.fromisoformat(value)
+        row[column.name] = value
+    return row
+
+
+def _remap(id_map, kind, record_id, field, requirement_id):
+    """Новый id требования; ссылка на требование вне дампа — ValueError с указанием записи."""
+    try:
+        return id_map[requirement_id]
+    except KeyError:
+        record = f"{kind} {record_id}" if record_id is not None else kind
+        raise ValueError(
+            f"Запись {record}: {field} = {requirement_id} ссылается на требование, которого нет в дампе"
+        ) from None
+
+
+class ProjectArchiveService:
+    """Дамп и восстановление проекта в сжатом NDJSON."""
+
+    def __init__(self, db_session, chunk_size=5000, compresslevel=6, history_archive=None):
+        self.db = db_session
+        self.chunk_size = chunk_size
+        self.compresslevel = compresslevel
+        # Архив истории (services.history_archive): его записи попадают в дамп вместе с остальной историей
+        self.history_archive = history_archive
+
+    def iter_dump(self, project_id: int):
+        """Генератор сжатых байтов дампа — подходит для потокового HTTP-ответа."""
+        project = self.db.get(Project, project_id)
+        if not project:
+            raise ValueError("Project not found")
+
+        compressor = zlib.compressobj(self.compresslevel, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+        header = {
+            "format": DUMP_FORMAT,
+            "version": DUMP_VERSION,
+            "project": {k: _encode_value(v) for k, v in project.to_dict().items()},
+        }
+        buffer = [json.dumps(header, ensure_ascii=False)]
+
+        for kind, records in self._section_records(project_id):
+            for record in records:
+                record["_kind"] = kind
+                buffer.append(json.dumps(record, ensure_ascii=False, default=_encode_value))
+                if len(buffer) >= self.chunk_size:
+                    yield compressor.compress(("\n".join(buffer) + "\n").encode("utf-8"))
+                    buffer = []
+
+        if buffer:
+            yield compressor.compress(("\n".join(buffer) + "\n").encode("utf-8"))
+        yield compressor.flush()
+
+    def dump(self, project_id: int, fileobj):
+        """Пишет дамп проекта в бинарный файловый объект."""
+        for chunk in self.iter_dump(project_id):
+            fileobj.write(chunk)
+
+    def restore(self, fileobj, name=None, id_mode=ID_MODE_REMAP):
+        """Восстанавливает проект из дампа одной транзакцией.
+
+        ``remap`` выдает требованиям новые id подряд после текущего максимума,
+        ``preserve`` сохраняет исходные id проекта, требований, связей и истории
+        (при конфликте вставка упадет и транзакция откатится).
+        """
+        if id_mode not in (ID_MODE_REMAP, ID_MODE_PRESERVE):
+            raise ValueError(f"Неизвестный режим id: {id_mode}")
+
+        stream = io.TextIOWrapper(gzip.GzipFile(fileobj=fileobj), encoding="utf-8")
+        try:
+            header = json.loads(stream.readline() or "{}")
+            if header.get("format") != DUMP_FORMAT or header.get("version") != DUMP_VERSION:
+                raise ValueError("Некорректный файл дампа")
+
+            project = self._create_project(header["project"], name, id_mode)
+            with project_scope(project.id):
+                counts = self._restore_rows(stream, project, id_mode)
+                self.db.commit()
+        except Exception:
+            self.db.rollback()
+            raise
+        finally:
+            stream.detach()
+
+        return project, {
+            "requirements": counts["requirement"],
+            "links": counts["link"],
+            "history": counts["history"],
+        }
+
+    def _restore_rows(self, stream, project, id_mode):
+        counts = {kind: 0 for kind, _ in SECTIONS}
+        id_map = {}
+        # Родитель может идти в дампе позже потомка: parent_id проставляется после всех требований
+        parents = []
+        next_id = (self.db.query(func.max(Requirement.id)).scalar() or 0) + 1
+        tables = dict(SECTIONS)
+        pending_kind, pending = None, []
+
+        for line in stream:
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            kind = record.pop("_kind", None)
+            if kind not in tables:
+                raise ValueError(f"Неизвестный тип записи: {kind}")
+
+            if kind != pending_kind or len(pending) >= self.chunk_size:
+                self._flush(pending_kind, tables, pending)
+                pending_kind, pending = kind, []
+
+            row = _decode_row(tables[kind], record)
+            if kind == "requirement":
+                row["project_id"] = project.id
+                parent_id = row.pop("parent_id", None)
+                original_id = row["id"]
+                if id_mode == ID_MODE_REMAP:
+                    id_map[row["id"]] = next_id
+                    row["id"] = next_id
+                    next_id += 1
+                if parent_id is not None:
+                    parents.append((row["id"], original_id, parent_id))
+            elif id_mode == ID_MODE_REMAP:
+                record_id = row.pop("id", None)
+                for key in ("source_requirement_id", "target_requirement_id", "requirement_id"):
+                    if key in row:
+                        row[key] = _remap(id_map, kind, record_id, key, row[key])
+
+            pending.append(row)
+            counts[kind] += 1
+
+        self._flush(pending_kind, tables, pending)
+        self._restore_hierarchy(project, parents, id_map if id_mode == ID_MODE_REMAP else None)
+        return counts
+
+    def _restore_hierarchy(self, project, parents, id_map):
+        if not parents:
+            return
+        table = Requirement.__table__
+        self.db.execute(
+            update(table)
+            .where(table.c.id == bindparam("req_id"))
+            .values(parent_id=bindparam("new_parent_id"), updated_at=table.c.updated_at),
+            [{"req_id": req_id,
+              "new_parent_id": (_remap(id_map, "requirement", original_id, "parent_id", parent_id)
+                                if id_map is not None else parent_id)}
+             for req_id, original_id, parent_id in parents],
+        )
+        hierarchy.rebuild(self.db, project.id)
+
+    def _section_records(self, project_id: int):
+        for kind, statement in self._section_queries(project_id):
+            result = self.db.execute(statement.execution_options(yield_per=self.chunk_size))
+            yield kind, (dict(row) for row in result.mappings())
+        if self.history_archive is not None:
+            # id архивных записей могли быть заняты новыми строками истории, при загрузке выдаются заново
+            archived = self.history_archive.iter_project_entries(self.db, project_id)
+            yield "history", ({k: v for k, v in entry.items() if k != "id"} for entry in archived)
+
+    def _section_queries(self, project_id: int):
+        req_ids = select(Requirement.id).where(Requirement.project_id == project_id)
+        req_table, link_table, history_table = (table for _kind, table in SECTIONS)
+        return (
+            ("requirement", select(req_table)
+             .where(req_table.c.project_id == project_id)
+             .order_by(req_table.c.id)),
+            ("link", select(link_table)
+             .where(link_table.c.source_requirement_id.in_(req_ids))
+             .where(link_table.c.target_requirement_id.in_(req_ids))
+             .order_by(link_table.c.id)),
+            ("history", select(history_table)
+             .where(history_table.c.requirement_id.in_(req_ids))
+             .order_by(history_table.c.id)),
+        )
+
+    def _create_project(self, data, name, id_mode):
+        project_name = (name or data.get("name") or "").strip()
+        if not project_name:
+            raise ValueError("name required")
+        if self.db.query(Project.id).filter(Project.name == project_name).first():
+            raise ValueError(f"Проект с именем '{project_name}' уже существует")
+
+        retention = data.get("history_retention_days")
+        if retention is not None and (not isinstance(retention, int) or isinstance(retention, bool) or retention < 0):
+            raise ValueError("history_retention_days в дампе должен быть неотрицательным целым числом или null")
+
+        project = Project(name=project_name, description=data.get("description") or "",
+                          history_retention_days=retention)
+        if id_mode == ID_MODE_PRESERVE:
+            project.id = data.get("id")
+        self.db.add(project)
+        self.db.flush()
+        return project
+
+    def _flush(self, kind, tables, rows):
+        if kind and rows:
+            self.db.execute(insert(tables[kind]), rows)
@@ -0,0 +1,376 @@
+"""Подсказки связей: похожие требования по TF-IDF.
+
+Текст требования (заголовок и описание после normalize_text) разбивается
+на слова, каждая строка матрицы — нормированный TF-IDF вектор требования
+(scipy.sparse CSR). Похожесть для одного требования или пачки —
+произведение разреженных матриц, top-k выбирается argpartition, без
+циклов Python по требованиям.
+
+Индекс проекта кешируется в памяти воркера и помечается меткой
+(projects.cache_token) и ревизией проекта. При смене ревизии он догоняется
+инкрементально: по колонкам version и created_at находятся новые и
+измененные требования, их старые строки обнуляются, а новые дописываются в
+конец матрицы; удаленные обнуляются. IDF уже известных слов при этом не
+пересчитывается, поэтому после изменения заметной доли строк
+(REBUILD_SHARE) индекс строится заново. Заново он строится и при смене
+метки, и когда id удаленного требования достался новому (SQLite
+переиспользует наибольший id): у нового требования версия снова 1, и
+отличить его можно только по created_at.
+"""
+
+from collections import Counter, OrderedDict
+import re
+import threading
+
+from flask import current_app
+from sqlalchemy import select
+
+from models.project import Project
+from models.requirement import Requirement, RequirementType
+from models.link import Link, LinkType
+from services.text_normalizer import normalize_text
+
+EXTENSION_KEY = 'suggestion_cache'
+
+# Слово: буква, затем буквы или цифры (номера пунктов и одиночные буквы не учитываются)
+TOKEN_RE = re.compile(r"[^\W\d_][^\W_]+")
+STOP_WORDS = frozenset((
+    "и", "в", "во", "не", "на", "с", "со", "как", "а", "то", "все", "так", "но", "да", "к", "у",
+    "же", "за", "бы", "по", "от", "из", "до", "для", "при", "или", "это", "его", "ее", "их", "о",
+    "об", "что", "чтобы", "если", "то", "также", "должен", "должна", "должно", "должны",
+    "the", "and", "or", "of", "to", "in", "for", "be", "is", "a", "an", "shall", "should", "must",
+))
+
+# Уровень типа требования: связь к требованию более высокого уровня предлагается как «Реализует»
+TYPE_LEVELS = {
+    RequirementType.BUSINESS: 3,
+    RequirementType.USER: 2,
+    RequirementType.FUNCTIONAL: 1,
+    RequirementType.NON_FUNCTIONAL: 1,
+    RequirementType.INTERFACE: 1,
+}
+MIN_SCORE = 0.05
+# Доля измененных строк, после которой индекс перестраивается целиком (с новыми IDF)
+REBUILD_SHARE = 0.2
+# Сколько запросов пачки обрабатывается одним произведением матриц
+BATCH_COLUMNS = 256
+FETCH_CHUNK = 2000
+
+
+def _np():
+    import numpy
+    return numpy
+
+
+def _sparse():
+    # scipy нужен только подсказкам, поэтому не импортируется при старте воркера
+    import scipy.sparse
+    return scipy.sparse
+
+
+def tokenize(title, description):
+    text = normalize_text(f"{title or ''} {description or ''}")
+    return [token for token in TOKEN_RE.findall(text) if token not in STOP_WORDS]
+
+
+def suggested_link_type(source_type, target_type):
+    if TYPE_LEVELS.get(target_type, 1) > TYPE_LEVELS.get(source_type, 1):
+        return LinkType.IMPLEMENTS
+    return LinkType.DEPENDS_ON
+
+
+class ProjectIndex:
+    """TF-IDF матрица требований одного проекта."""
+
+    def __init__(self, token, revision, rows):
+        """rows — (id, (version, created_at), тип, заголовок, описание)."""
+        np = _np()
+        self.token = token
+        self.revision = revision
+        self.vocab = {}
+        self.ids = np.zeros(0, dtype=np.int64)
+        self.levels = np.zeros(0, dtype=np.int8)
+        self.versions = {}
+        self.row_of = {}
+        self.types = []
+        self.titles = []
+        self.changed_rows = 0
+        self.lock = threading.Lock()
+        self._transposed = None
+
+        counts = self._counts(rows)
+        self.df = np.bincount(counts.indices, minlength=len(self.vocab))
+        self.idf = self._idf_for(self.df, len(rows))
+        self.matrix = self._weigh(counts)
+        self._append_meta(rows)
+
+    @property
+    def transposed(self):
+        """Транспонированная матрица в CSR (слово × требование), строится один раз на версию."""
+        if self._transposed is None:
+            self._transposed = self.matrix.T.tocsr()
+        return self._transposed
+
+    @property
+    def live_rows(self):
+        return len(self.row_of)
+
+    def needs_rebuild(self):
+        return self.changed_rows > REBUILD_SHARE * max(self.live_rows, 1)
+
+    @staticmethod
+    def _idf_for(df, documents):
+        np = _np()
+        return (np.log((1 + documents) / (1 + df)) + 1).astype(np.float32)
+
+    def _counts(self, rows):
+        """Матрица частот слов; новые слова добавляются в словарь."""
+        np = _np()
+        sparse = _sparse()
+        indptr = [0]
+        indices = []
+        data = []
+        for _id, _stamp, _type, title, description in rows:
+            for token, count in Counter(tokenize(title, description)).items():
+                indices.append(self.vocab.setdefault(token, len(self.vocab)))
+                data.append(count)
+            indptr.append(len(indices))
+        return sparse.csr_matrix(
+            (np.asarray(data, dtype=np.float32), np.asarray(indices, dtype=np.int32), np.asarray(indptr)),
+            shape=(len(rows), len(self.vocab)),
+        )
+
+    def _weigh(self, counts):
+        """Нормированные TF-IDF строки (сублинейный TF) из матрицы частот."""
+        np = _np()
+        sparse = _sparse()
+        counts.data = (1 + np.log(counts.data)) * self.idf[counts.indices]
+        norms = np.sqrt(np.asarray(counts.multiply(counts).sum(axis=1)).ravel())
+        norms[norms == 0] = 1
+        return sparse.csr_matrix(sparse.diags(1 / norms, dtype=np.float32) @ counts)
+
+    def _append_meta(self, rows):
+        np = _np()
+        start = len(self.ids)
+        self.ids = np.concatenate([self.ids, np.asarray([row[0] for row in rows], dtype=np.int64)])
+        self.levels = np.concatenate([self.levels, np.asarray([TYPE_LEVELS.get(row[2], 1) for row in rows],
+                                                              dtype=np.int8)])
+        for offset, (req_id, stamp, req_type, title, _description) in enumerate(rows):
+            self.row_of[req_id] = start + offset
+            self.versions[req_id] = stamp
+            self.types.append(req_type)
+            self.titles.append(title)
+
+    def _drop_row(self, req_id):
+        """Обнуляет строку требования и вычитает ее слова из df."""
+        row = self.row_of.pop(req_id)
+        self.versions.pop(req_id, None)
+        start, end = self.matrix.indptr[row], self.matrix.indptr[row + 1]
+        self.df[self.matrix.indices[start:end]] -= 1
+        self.matrix.data[start:end] = 0
+        self.ids[row] = -1
+        self._transposed = None
+
+    def apply_changes(self, revision, changed_rows, deleted_ids):
+        """Инкрементальное обновление: changed_rows — новые и измененные требования."""
+        np = _np()
+        sparse = _sparse()
+        for req_id in deleted_ids:
+            if req_id in self.row_of:
+                self._drop_row(req_id)
+        for row in changed_rows:
+            if row[0] in self.row_of:
+                self._drop_row(row[0])
+
+        if changed_rows:
+            known = len(self.df)
+            counts = self._counts(changed_rows)
+            self.df = np.concatenate([self.df, np.zeros(len(self.vocab) - known, dtype=self.df.dtype)])
+            self.df += np.bincount(counts.indices, minlength=len(self.vocab))
+            # IDF известных слов заморожен до перестройки, новые слова получают текущий
+            fresh = self._idf_for(self.df[known:], self.live_rows + len(changed_rows))
+            self.idf = np.concatenate([self.idf, fresh])
+
+            self.matrix.resize((self.matrix.shape[0], len(self.vocab)))
+            self.matrix = sparse.vstack([self.matrix, self._weigh(counts)], format="csr")
+            self._transposed = None
+            self._append_meta(changed_rows)
+
+        self.changed_rows += len(changed_rows) + len(deleted_ids)
+        self.revision = revision
+
+    def top_k(self, requirement_ids, k, exclude=None, link_type=None):
+        """{id: [(id цели, похожесть, тип связи)]}; требований не из индекса в ответе нет."""
+        np = _np()
+        exclude = exclude or {}
+        wanted = [req_id for req_id in requirement_ids if req_id in self.row_of]
+        k = min(k, self.matrix.shape[0])
+        result = {}
+        for start in range(0, len(wanted), BATCH_COLUMNS):
+            batch = wanted[start:start + BATCH_COLUMNS]
+            rows = np.asarray([self.row_of[req_id] for req_id in batch])
+            positions = np.arange(len(batch))
+            # Похожесть пачки со всеми требованиями — одно произведение разреженных матриц
+            # (строка пачки × требование): top-k выбирается по непрерывным строкам
+            scores = (self.matrix[rows] @ self.transposed).toarray()
+            scores[positions, rows] = 0
+            for position, req_id in enumerate(batch):
+                excluded = [self.row_of[other] for other in exclude.get(req_id, ()) if other in self.row_of]
+                scores[position, excluded] = 0
+            if link_type is not None:
+                # «Реализует» — только к требованиям более высокого уровня, остальные типы — наоборот
+                higher = self.levels[None, :] > self.levels[rows][:, None]
+                scores[higher if link_type != LinkType.IMPLEMENTS else ~higher] = 0
+
+            if not k:
+                result.update((req_id, []) for req_id in batch)
+                continue
+            top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+            top_scores = np.take_along_axis(scores, top, axis=1)
+            order = np.argsort(-top_scores, axis=1, kind="stable")
+            top = np.take_along_axis(top, order, axis=1)
+            top_scores = np.take_along_axis(top_scores, order, axis=1)
+            for position, (req_id, own_row) in enumerate(zip(batch, rows)):
+                source_type = self.types[own_row]
+                result[req_id] = [
+                    (int(self.ids[row]), round(float(score), 4), suggested_link_type(source_type, self.types[row]))
+                    for row, score in zip(top[position], top_scores[position])
+                    if score >= MIN_SCORE
+                ]
+        return result
+
+
+class SuggestionCache:
+    """Индексы последних использованных проектов (LRU) в памяти воркера."""
+
+    def __init__(self, max_projects):
+        self.max_projects = max_projects
+        self._indexes = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, project_id):
+        with self._lock:
+            index = self._indexes.get(project_id)
+            if index is not None:
+                self._indexes.move_to_end(project_id)
+            return index
+
+    def put(self, project_id, index):
+        with self._lock:
+            self._indexes[project_id] = index
+            self._indexes.move_to_end(project_id)
+            while len(self._indexes) > self.max_projects:
+                self._indexes.popitem(last=False)
+
+    def invalidate(self, project_id):
+        with self._lock:
+            self._indexes.pop(project_id, None)
+
+
+def _fetch_rows(db_session, project_id, ids=None):
+    columns = (Requirement.id, Requirement.version, Requirement.created_at, Requirement.requirement_type,
+               Requirement.title, Requirement.description)
+    if ids is None:
+        result = db_session.execute(
+            select(*columns).where(Requirement.project_id == project_id).order_by(Requirement.id)
+            .execution_options(yield_per=FETCH_CHUNK)
+        )
+        return [_index_row(row) for row in result]
+    ids = list(ids)
+    rows = []
+    for start in range(0, len(ids), FETCH_CHUNK):
+        rows.extend(_index_row(row) for row in db_session.execute(
+            select(*columns).where(Requirement.id.in_(ids[start:start + FETCH_CHUNK])).order_by(Requirement.id)
+        ))
+    return rows
+
+
+def _index_row(row):
+    req_id, version, created_at, req_type, title, description = row
+    return req_id, (version, created_at), req_type, title, description
+
+
+def project_index(db_session, project_id):
+    """Актуальный индекс проекта или None, если проекта нет."""
+    project = db_session.get(Project, project_id)
+    if project is None:
+        return None
+    token, revision = project.cache_token, project.revision
+
+    cache = get_suggestion_cache()
+    index = cache.get(project_id)
+    if index is not None and index.token == token and index.revision == revision:
+        return index
+
+    if index is not None and index.token == token:
+        with index.lock:
+            if index.revision != revision:
+                current = {
+                    req_id: (version, created_at) for req_id, version, created_at in db_session.execute(
+                        select(Requirement.id, Requirement.version, Requirement.created_at)
+                        .where(Requirement.project_id == project_id)
+                    )
+                }
+                # Тот же id с другим created_at — удаленное требование, id которого достался новому
+                reused = any(req_id in index.versions and index.versions[req_id][1] != stamp[1]
+                             for req_id, stamp in current.items())
+                if reused:
+                    index = None
+                else:
+                    changed = [req_id for req_id, stamp in current.items() if index.versions.get(req_id) != stamp]
+                    deleted = [req_id for req_id in index.versions if req_id not in current]
+                    index.apply_changes(revision, _fetch_rows(db_session, project_id, changed), deleted)
+            if index is not None and not index.needs_rebuild():
+                return index
+
+    index = ProjectIndex(token, revision, _fetch_rows(db_session, project_id))
+    cache.put(project_id, index)
+    return index
+
+
+def suggest_links(db_session, project_id, requirement_ids, k=10, link_type=None):
+    """Подсказки целей связей для требований; None, если проекта нет.
+
+    Требований, которых нет в проекте, в ответе нет. Уже связанные с требованием (в любую сторону) цели не предлагаются.
+    """
+    index = project_index(db_session, project_id)
+    if index is None:
+        return None
+
+    exclude = {}
+    for start in range(0, len(requirement_ids), FETCH_CHUNK):
+        part = requirement_ids[start:start + FETCH_CHUNK]
+        for source_id, target_id in db_session.execute(
+            select(Link.source_requirement_id, Link.target_requirement_id)
+            .where(Link.source_requirement_id.in_(part) | Link.target_requirement_id.in_(part))
+        ):
+            exclude.setdefault(source_id, set()).add(target_id)
+            exclude.setdefault(target_id, set()).add(source_id)
+
+    with index.lock:
+        ranked = index.top_k(requirement_ids, k, exclude, link_type)
+        titles = {req_id: index.titles[index.row_of[req_id]] for req_id in
+                  {target for items in ranked.values() for target, _score, _type in items}}
+        types = {req_id: index.types[index.row_of[req_id]] for req_id in titles}
+
+    return {
+        req_id: [
+            {
+                'requirement_id': target_id,
+                'title': titles[target_id],
+                'requirement_type': types[target_id].value,
+                'score': score,
+                'link_type': suggested.value,
+            }
+            for target_id, score, suggested in items
+        ]
+        for req_id, items in ranked.items()
+    }
+
+
+def init_app(app):
+    app.extensions[EXTENSION_KEY] = SuggestionCache(app.config['SUGGESTION_CACHE_PROJECTS'])
+
+
+def get_suggestion_cache() -> SuggestionCache:
+    return current_app.extensions[EXTENSION_KEY]
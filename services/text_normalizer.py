@@ -1,7 +1,14 @@
 
 from __future__ import annotations
 
+import hashlib
+
 def normalize_text(value: str, lower: bool = True) -> str:
     """Убирает лишние пробелы и приводит текст к нижнему регистру."""
     normalized = " ".join((value or "").strip().split())
-    return normalized.lower() if lower else normalized
\ No newline at end of file
+    return normalized.lower() if lower else normalized
+
+
+def content_hash(value: str) -> str:
+    """Отпечаток текста без учета регистра и пробелов (для сравнения при повторном импорте)."""
+    return hashlib.sha1(normalize_text(value).encode("utf-8")).hexdigest()
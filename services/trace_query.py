@@ -0,0 +1,259 @@
+"""Декларативные запросы трассировки над требованиями проекта.
+
+Запрос — JSON-объект с фильтрами по атрибутам требования и предикатами
+наличия (или отсутствия) связей:
+
+    {
+        "where": {"requirement_type": "FUNCTIONAL", "status": ["DRAFT", "REVIEW"]},
+        "links": [
+            {"direction": "incoming", "link_type": "IMPLEMENTS", "exists": false},
+            {"direction": "outgoing", "link_type": "DEPENDS_ON",
+             "other": {"where": {"status": "DRAFT"}}}
+        ]
+    }
+
+Значения енумов принимаются как по имени (DRAFT), так и по значению
+(«Черновик»). У предиката связи ``other`` — такой же запрос к требованию
+на другом конце связи, вложенность произвольная.
+
+Запрос компилируется в один SELECT с EXISTS / NOT EXISTS по индексам
+связей; граф в Python не загружается. Скомпилированный оператор зависит
+только от формы запроса (какие поля и предикаты заданы), значения
+передаются параметрами. Поэтому операторы кешируются по форме: повторный
+запрос той же формы не строится заново, а одинаковый текст SQL
+переиспользует подготовленный оператор (и план) драйвера SQLite.
+"""
+
+from collections import OrderedDict
+import threading
+
+from sqlalchemy import and_, bindparam, exists, func, select
+from sqlalchemy.orm import aliased
+
+from models.requirement import Requirement, RequirementType, RequirementStatus, Priority
+from models.link import Link, LinkType
+
+# Поле -> енум (None — текстовое поле)
+FILTER_FIELDS = {
+    "id": None,
+    "requirement_type": RequirementType,
+    "status": RequirementStatus,
+    "priority": Priority,
+    "source": None,
+    "author": None,
+    "title": None,
+}
+TEXT_FIELDS = ("source", "author", "title")
+DIRECTIONS = ("incoming", "outgoing", "any")
+MAX_DEPTH = 4
+PLAN_CACHE_SIZE = 256
+
+
+def _parse_enum(enum_class, value, field):
+    if isinstance(value, str):
+        if value in enum_class.__members__:
+            return enum_class[value]
+        try:
+            return enum_class(value)
+        except ValueError:
+            pass
+    allowed = ", ".join(member.name for member in enum_class)
+    raise ValueError(f"{field}: недопустимое значение {value!r} (допустимо: {allowed})")
+
+
+def _parse_value(field, value):
+    enum_class = FILTER_FIELDS[field]
+    if enum_class is not None:
+        return _parse_enum(enum_class, value, field)
+    if field == "id":
+        if not isinstance(value, int) or isinstance(value, bool):
+            raise ValueError("id: ожидается целое число")
+        return value
+    if not isinstance(value, str):
+        raise ValueError(f"{field}: ожидается строка")
+    return value
+
+
+def normalize(spec, depth=0):
+    """Проверяет запрос и разделяет его на форму (ключ кеша) и список значений."""
+    if not isinstance(spec, dict):
+        raise ValueError("Запрос должен быть объектом")
+    if depth > MAX_DEPTH:
+        raise ValueError(f"Вложенность запроса больше {MAX_DEPTH}")
+    unknown = set(spec) - {"where", "links"}
+    if unknown:
+        raise ValueError(f"Неизвестные ключи запроса: {', '.join(sorted(unknown))}")
+
+    values = []
+    where_shape = []
+    where = spec.get("where") or {}
+    if not isinstance(where, dict):
+        raise ValueError("where должен быть объектом")
+    for field in sorted(where):
+        if field not in FILTER_FIELDS:
+            raise ValueError(f"Неизвестное поле фильтра: {field} (допустимо: {', '.join(FILTER_FIELDS)})")
+        condition = where[field]
+        if isinstance(condition, dict) and set(condition) == {"contains"} and field in TEXT_FIELDS:
+            where_shape.append((field, "contains"))
+            text = _parse_value(field, condition["contains"])
+            values.append("%" + text.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%")
+        elif isinstance(condition, list):
+            if not condition:
+                raise ValueError(f"{field}: пустой список значений")
+            where_shape.append((field, "in"))
+            values.append([_parse_value(field, item) for item in condition])
+        elif condition is None and field != "id":
+            where_shape.append((field, "null"))
+        else:
+            where_shape.append((field, "eq"))
+            values.append(_parse_value(field, condition))
+
+    links_shape = []
+    links = spec.get("links") or []
+    if not isinstance(links, list):
+        raise ValueError("links должен быть списком")
+    for predicate in links:
+        if not isinstance(predicate, dict):
+            raise ValueError("Предикат связи должен быть объектом")
+        unknown = set(predicate) - {"direction", "link_type", "exists", "other"}
+        if unknown:
+            raise ValueError(f"Неизвестные ключи предиката связи: {', '.join(sorted(unknown))}")
+        direction = predicate.get("direction", "any")
+        if direction not in DIRECTIONS:
+            raise ValueError(f"direction: допустимо {', '.join(DIRECTIONS)}")
+        should_exist = predicate.get("exists", True)
+        if not isinstance(should_exist, bool):
+            raise ValueError("exists: ожидается true или false")
+
+        link_type = predicate.get("link_type")
+        if link_type is None:
+            type_shape = None
+        elif isinstance(link_type, list):
+            type_shape = "in"
+            values.append([_parse_enum(LinkType, item, "link_type") for item in link_type])
+        else:
+            type_shape = "eq"
+            values.append(_parse_enum(LinkType, link_type, "link_type"))
+
+        other_shape = None
+        if predicate.get("other") is not None:
+            other_shape, other_values = normalize(predicate["other"], depth + 1)
+            values.extend(other_values)
+        links_shape.append((direction, type_shape, should_exist, other_shape))
+
+    return (tuple(where_shape), tuple(links_shape)), values
+
+
+class _Builder:
+    """Строит условия по форме запроса; параметры нумеруются в порядке normalize."""
+
+    def __init__(self):
+        self.count = 0
+
+    def param(self, expanding=False):
+        name = f"p{self.count}"
+        self.count += 1
+        return bindparam(name, expanding=expanding)
+
+    def conditions(self, shape, req, project_id):
+        where_shape, links_shape = shape
+        result = []
+        for field, op in where_shape:
+            column = getattr(req, field)
+            if op == "eq":
+                result.append(column == self.param())
+            elif op == "in":
+                result.append(column.in_(self.param(expanding=True)))
+            elif op == "contains":
+                result.append(column.like(self.param(), escape="\\"))
+            else:
+                result.append(column.is_(None))
+
+        for direction, type_shape, should_exist, other_shape in links_shape:
+            link = aliased(Link)
+            if direction == "incoming":
+                ends = [(link.target_requirement_id, link.source_requirement_id)]
+            elif direction == "outgoing":
+                ends = [(link.source_requirement_id, link.target_requirement_id)]
+            else:
+                ends = [(link.source_requirement_id, link.target_requirement_id),
+                        (link.target_requirement_id, link.source_requirement_id)]
+
+            link_conditions = []
+            if type_shape == "eq":
+                link_conditions.append(link.link_type == self.param())
+            elif type_shape == "in":
+                link_conditions.append(link.link_type.in_(self.param(expanding=True)))
+
+            # У направления any одно и то же условие на другой конец для обеих сторон,
+            # поэтому параметры вложенного запроса строятся один раз
+            other = aliased(Requirement) if other_shape is not None else None
+            other_conditions = self.conditions(other_shape, other, project_id) if other is not None else []
+
+            alternatives = []
+            for own_end, other_end in ends:
+                subquery = select(1).select_from(link).where(own_end == req.id, *link_conditions)
+                if other is not None:
+                    subquery = subquery.join(other, other.id == other_end).where(
+                        other.project_id == project_id, *other_conditions)
+                alternatives.append(exists(subquery))
+            predicate = alternatives[0] if len(alternatives) == 1 else alternatives[0] | alternatives[1]
+            result.append(predicate if should_exist else ~predicate)
+        return result
+
+
+def _build(shape):
+    """(страница, число строк) для формы запроса."""
+    project_id = bindparam("project_id")
+    builder = _Builder()
+    conditions = and_(Requirement.project_id == project_id, *builder.conditions(shape, Requirement, project_id))
+    page = (select(Requirement)
+            .where(conditions)
+            .order_by(Requirement.id.asc())
+            .offset(bindparam("offset"))
+            .limit(bindparam("limit")))
+    count = select(func.count(Requirement.id)).where(conditions)
+    return page, count
+
+
+class PlanCache:
+    """LRU скомпилированных операторов по форме запроса."""
+
+    def __init__(self, size=PLAN_CACHE_SIZE):
+        self.size = size
+        self.hits = 0
+        self.misses = 0
+        self._plans = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, shape):
+        with self._lock:
+            plan = self._plans.get(shape)
+            if plan is not None:
+                self._plans.move_to_end(shape)
+                self.hits += 1
+                return plan
+            self.misses += 1
+
+        plan = _build(shape)
+        with self._lock:
+            self._plans[shape] = plan
+            while len(self._plans) > self.size:
+                self._plans.popitem(last=False)
+        return plan
+
+
+_plan_cache = PlanCache()
+
+
+def run_query(db_session, project_id: int, spec, offset=0, limit=100):
+    """(общее число, страница требований) по декларативному запросу."""
+    shape, values = normalize(spec)
+    page, count = _plan_cache.get(shape)
+    params = {f"p{i}": value for i, value in enumerate(values)}
+    params["project_id"] = project_id
+
+    total = db_session.execute(count, params).scalar()
+    rows = db_session.scalars(page, dict(params, offset=offset, limit=limit)).all()
+    return total, rows
+
@@ -0,0 +1,70 @@
+"""Прием загружаемых файлов: буферизация на диск и дешевая проверка .docx.
+
+Файлы из multipart-формы пишутся в SpooledTemporaryFile: до
+UPLOAD_SPOOL_THRESHOLD байт в памяти, дальше — во временный файл на диске.
+Общий размер запроса ограничивает MAX_CONTENT_LENGTH (Werkzeug отклоняет
+запрос с 413, не дочитывая тело). Перед разбором .docx проверяется только
+центральный каталог zip: наличие частей документа, число записей и
+суммарный несжатый размер, так что битый файл или zip-бомба отклоняются
+без распаковки.
+"""
+
+import os
+from tempfile import SpooledTemporaryFile
+import zipfile
+
+from flask import Request, current_app, has_app_context
+
+DEFAULT_SPOOL_THRESHOLD = 1024 * 1024
+
+# Части, без которых python-docx не откроет документ
+DOCX_REQUIRED_PARTS = ("[Content_Types].xml", "word/document.xml")
+
+
+class UploadRequest(Request):
+    """Request, который буферизует загружаемые файлы с порогом из конфигурации."""
+
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        threshold = DEFAULT_SPOOL_THRESHOLD
+        if has_app_context():
+            threshold = current_app.config.get("UPLOAD_SPOOL_THRESHOLD") or threshold
+        return SpooledTemporaryFile(max_size=threshold, mode="rb+")
+
+
+def stream_size(stream) -> int:
+    """Размер загруженного файла без чтения его в память; позиция возвращается в начало."""
+    stream.seek(0, os.SEEK_END)
+    size = stream.tell()
+    stream.seek(0)
+    return size
+
+
+def validate_docx(stream, max_uncompressed=None, max_entries=None):
+    """Проверяет структуру .docx по центральному каталогу zip; ValueError, если файл не годится."""
+    try:
+        with zipfile.ZipFile(stream) as archive:
+            entries = archive.infolist()
+    except (zipfile.BadZipFile, zipfile.LargeZipFile, OSError, EOFError):
+        raise ValueError("Некорректный .docx файл: это не zip-архив") from None
+    finally:
+        stream.seek(0)
+
+    if max_entries is not None and len(entries) > max_entries:
+        raise ValueError(f"Некорректный .docx файл: слишком много частей ({len(entries)})")
+
+    names = {entry.filename for entry in entries}
+    missing = [part for part in DOCX_REQUIRED_PARTS if part not in names]
+    if missing:
+        raise ValueError(f"Некорректный .docx файл: нет частей {', '.join(missing)}")
+
+    if max_uncompressed is not None:
+        total = sum(entry.file_size for entry in entries)
+        if total > max_uncompressed:
+            raise ValueError(f"Документ слишком большой после распаковки: {total} байт "
+                             f"(допустимо {max_uncompressed})")
+
+
+def validate_docx_upload(stream):
+    """validate_docx с лимитами из конфигурации приложения."""
+    config = current_app.config
+    validate_docx(stream, config.get("DOCX_MAX_UNCOMPRESSED_BYTES"), config.get("DOCX_MAX_ENTRIES"))
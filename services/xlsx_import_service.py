@@ -0,0 +1,266 @@
+"""Загрузка отредактированного XLSX-экспорта обратно в проект.
+
+Формат — тот, что пишет ExportService.export_to_excel: лист Requirements
+и лист Links, колонки ищутся по заголовкам. Книга читается openpyxl в
+режиме read_only (строки потоком, без загрузки листа в память), запись
+идет пачками по ``chunk_size`` строк в одной транзакции.
+"""
+
+from datetime import datetime
+
+from sqlalchemy import insert, select
+
+import logic
+from models.project import Project
+from models.requirement import Requirement, RequirementType, RequirementStatus, Priority
+from models.link import Link, LinkType
+from models.history import RequirementHistory
+
+REQUIREMENTS_SHEET = "Requirements"
+LINKS_SHEET = "Links"
+
+# Заголовок колонки -> (поле модели, енум или None)
+REQUIREMENT_COLUMNS = {
+    "title": ("title", None),
+    "description": ("description", None),
+    "type": ("requirement_type", RequirementType),
+    "status": ("status", RequirementStatus),
+    "priority": ("priority", Priority),
+    "source": ("source", None),
+    "author": ("author", None),
+}
+REQUIRED_REQUIREMENT_COLUMNS = ("title", "type")
+REQUIRED_LINK_COLUMNS = ("source_id", "target_id", "link_type")
+
+
+def _load_workbook(fileobj):
+    # openpyxl тяжелый, поэтому импортируется при первом импорте, а не при старте воркера
+    from openpyxl import load_workbook
+    return load_workbook(fileobj, read_only=True, data_only=True)
+
+
+def _clean(value):
+    if isinstance(value, str):
+        value = value.strip()
+        return value or None
+    return value
+
+
+def _parse_id(value, sheet, row_number, column):
+    if value is None:
+        return None
+    try:
+        number = int(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"{sheet}, строка {row_number}: {column} должен быть числом") from None
+    if number != value and str(number) != str(value):
+        raise ValueError(f"{sheet}, строка {row_number}: {column} должен быть целым числом")
+    return number
+
+
+def _parse_enum(enum_class, value, sheet, row_number, column):
+    try:
+        return enum_class(value)
+    except ValueError:
+        allowed = ", ".join(member.value for member in enum_class)
+        raise ValueError(f"{sheet}, строка {row_number}: недопустимое значение {column} «{value}» "
+                         f"(допустимо: {allowed})") from None
+
+
+def _iter_sheet(workbook, sheet, required):
+    """(номер строки, {заголовок: значение}) для непустых строк листа."""
+    if sheet not in workbook.sheetnames:
+        raise ValueError(f"В книге нет листа {sheet}")
+    rows = workbook[sheet].iter_rows(values_only=True)
+    header = [str(_clean(name) or "").lower() for name in next(rows, ())]
+    missing = [name for name in required if name not in header]
+    if missing:
+        raise ValueError(f"{sheet}: нет колонок {', '.join(missing)}")
+
+    for row_number, values in enumerate(rows, start=2):
+        record = {name: _clean(value) for name, value in zip(header, values) if name}
+        if any(value is not None for value in record.values()):
+            yield row_number, record
+
+
+def _chunks(iterable, size):
+    chunk = []
+    for item in iterable:
+        chunk.append(item)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+class XlsxImportService:
+    """Потоковый upsert требований и связей из XLSX-экспорта."""
+
+    def __init__(self, db_session, chunk_size=1000):
+        self.db = db_session
+        self.chunk_size = chunk_size
+
+    def import_workbook(self, project_id: int, fileobj, changed_by=None):
+        """Обновляет проект по книге и возвращает счетчики изменений.
+
+        Требование с id этого проекта обновляется (только если что-то
+        изменилось), строка без id или с чужим id создает новое требование.
+        Связь определяется парой source_id/target_id: у существующей
+        меняется тип, отсутствующая создается. Ошибка в любой строке
+        откатывает весь импорт.
+        """
+        if self.db.get(Project, project_id) is None:
+            raise ValueError("Project not found")
+
+        counts = {"created": 0, "updated": 0, "unchanged": 0, "links_created": 0, "links_updated": 0}
+        workbook = _load_workbook(fileobj)
+        try:
+            # id из книги -> id в БД; занимает память только под пары чисел
+            id_map = {}
+            rows = _iter_sheet(workbook, REQUIREMENTS_SHEET, REQUIRED_REQUIREMENT_COLUMNS)
+            for chunk in _chunks(rows, self.chunk_size):
+                self._upsert_requirements(project_id, chunk, id_map, counts, changed_by)
+
+            if LINKS_SHEET in workbook.sheetnames:
+                rows = _iter_sheet(workbook, LINKS_SHEET, REQUIRED_LINK_COLUMNS)
+                for chunk in _chunks(rows, self.chunk_size):
+                    self._upsert_links(project_id, chunk, id_map, counts)
+
+            if counts["created"] or counts["updated"] or counts["links_created"] or counts["links_updated"]:
+                logic.touch_project(self.db, project_id)
+            self.db.commit()
+        except Exception:
+            self.db.rollback()
+            raise
+        finally:
+            workbook.close()
+        return counts
+
+    def _upsert_requirements(self, project_id, chunk, id_map, counts, changed_by):
+        parsed = []
+        for row_number, record in chunk:
+            sheet_id = _parse_id(record.get("id"), REQUIREMENTS_SHEET, row_number, "id")
+            fields = {}
+            for column, (field, enum_class) in REQUIREMENT_COLUMNS.items():
+                if column not in record:
+                    continue
+                value = record[column]
+                if enum_class is not None and value is not None:
+                    value = _parse_enum(enum_class, value, REQUIREMENTS_SHEET, row_number, column)
+                fields[field] = value
+            for column in REQUIRED_REQUIREMENT_COLUMNS:
+                if record.get(column) is None:
+                    raise ValueError(f"{REQUIREMENTS_SHEET}, строка {row_number}: не заполнено {column}")
+            for field in ("status", "priority"):
+                # Пустой статус/приоритет не затирает текущее значение
+                if field in fields and fields[field] is None:
+                    del fields[field]
+            parsed.append((sheet_id, fields))
+
+        sheet_ids = [sheet_id for sheet_id, _fields in parsed if sheet_id is not None]
+        existing = {
+            req.id: req
+            for req in self.db.scalars(
+                select(Requirement).where(Requirement.project_id == project_id, Requirement.id.in_(sheet_ids))
+            )
+        }
+
+        now = datetime.utcnow()
+        history = []
+        created = []
+        for sheet_id, fields in parsed:
+            req = existing.get(sheet_id)
+            if req is None:
+                new_req = Requirement(project_id=project_id, **fields)
+                created.append((sheet_id, new_req))
+                continue
+
+            id_map[sheet_id] = req.id
+            # Пустая ячейка и пустая строка в БД считаются одним значением
+            changes = {k: v for k, v in fields.items() if (getattr(req, k) or None) != v}
+            if not changes:
+                counts["unchanged"] += 1
+                continue
+            old_values = req.to_dict()
+            for k, v in changes.items():
+                setattr(req, k, v)
+            history.append((req, "UPDATE", old_values))
+            counts["updated"] += 1
+
+        self.db.add_all([req for _sheet_id, req in created])
+        self.db.flush()
+        for sheet_id, req in created:
+            if sheet_id is not None:
+                id_map[sheet_id] = req.id
+            history.append((req, "CREATE", None))
+        counts["created"] += len(created)
+
+        self.db.add_all([
+            RequirementHistory(
+                requirement_id=req.id,
+                change_type=change_type,
+                old_values=old_values,
+                new_values=req.to_dict(),
+                changed_by=changed_by,
+                changed_at=now,
+            )
+            for req, change_type, old_values in history
+        ])
+        self.db.flush()
+        # Обработанная пачка больше не нужна в identity map — память не растет с размером листа
+        self.db.expunge_all()
+
+    def _upsert_links(self, project_id, chunk, id_map, counts):
+        pairs = {}
+        for row_number, record in chunk:
+            source_id = _parse_id(record.get("source_id"), LINKS_SHEET, row_number, "source_id")
+            target_id = _parse_id(record.get("target_id"), LINKS_SHEET, row_number, "target_id")
+            if source_id is None or target_id is None or record.get("link_type") is None:
+                raise ValueError(f"{LINKS_SHEET}, строка {row_number}: нужны source_id, target_id и link_type")
+            link_type = _parse_enum(LinkType, record["link_type"], LINKS_SHEET, row_number, "link_type")
+            pairs[(source_id, target_id)] = (row_number, link_type)
+
+        # Связь может ссылаться на требование проекта, которого нет на листе Requirements
+        unknown = {req_id for pair in pairs for req_id in pair if req_id not in id_map}
+        if unknown:
+            id_map.update({
+                req_id: req_id
+                for req_id in self.db.scalars(
+                    select(Requirement.id).where(Requirement.project_id == project_id, Requirement.id.in_(unknown))
+                )
+            })
+
+        resolved = {}
+        for (source_id, target_id), (row_number, link_type) in pairs.items():
+            if source_id not in id_map or target_id not in id_map:
+                raise ValueError(f"{LINKS_SHEET}, строка {row_number}: требование не найдено в проекте")
+            if id_map[source_id] == id_map[target_id]:
+                raise ValueError(f"{LINKS_SHEET}, строка {row_number}: связь требования с самим собой")
+            resolved[(id_map[source_id], id_map[target_id])] = link_type
+
+        sources = {source for source, _target in resolved}
+        existing = {
+            (link.source_requirement_id, link.target_requirement_id): link
+            for link in self.db.scalars(select(Link).where(Link.source_requirement_id.in_(sources)))
+            if (link.source_requirement_id, link.target_requirement_id) in resolved
+        }
+
+        new_links = []
+        for pair, link_type in resolved.items():
+            link = existing.get(pair)
+            if link is None:
+                new_links.append({
+                    "source_requirement_id": pair[0],
+                    "target_requirement_id": pair[1],
+                    "link_type": link_type,
+                })
+            elif link.link_type != link_type:
+                link.link_type = link_type
+                counts["links_updated"] += 1
+
+        if new_links:
+            self.db.execute(insert(Link), new_links)
+            counts["links_created"] += len(new_links)
+        self.db.flush()
+        self.db.expunge_all()
@@ -0,0 +1,226 @@
+"""Шардирование проектов по отдельным файлам SQLite.
+
+Включается настройкой SHARD_DIRECTORY. Требования, связи и история каждого
+проекта живут в своем файле ``project_<id>.db``, а основная БД остается
+каталогом (проекты, служебные таблицы). Движки шардов открываются лениво
+при первом обращении и переиспользуются (у каждого свой пул соединений).
+
+Id требований в режиме шардирования уникальны только внутри проекта.
+
+Разделение существующей БД на шарды:
+
+    python -m sharding split --source sqlite:///instance/requirements_trace.db --directory shards
+"""
+
+import argparse
+from contextlib import contextmanager
+import os
+import threading
+
+from flask import current_app, g, has_app_context
+from sqlalchemy import Table, create_engine, event, insert, inspect, select
+from sqlalchemy.sql.dml import UpdateBase
+from sqlalchemy.sql.util import find_tables
+
+SHARDED_TABLES = ('requirements', 'links', 'requirement_history', 'history_archive_chunks', 'requirement_closure')
+EXTENSION_KEY = 'shard_resolver'
+
+
+class ShardResolver:
+    """Выдает движок SQLite-шарда по project_id."""
+
+    def __init__(self, directory, connect_timeout=30):
+        self.directory = directory
+        self.connect_timeout = connect_timeout
+        self._engines = {}
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def path_for(self, project_id: int) -> str:
+        return os.path.join(self.directory, f'project_{int(project_id)}.db')
+
+    def engine_for(self, project_id: int):
+        engine = self._engines.get(project_id)
+        if engine is not None:
+            return engine
+
+        with self._lock:
+            engine = self._engines.get(project_id)
+            if engine is None:
+                engine = self._open(self.path_for(project_id))
+                self._engines[project_id] = engine
+        return engine
+
+    def drop(self, project_id: int):
+        """Закрывает движок шарда и удаляет его файл (при удалении проекта)."""
+        with self._lock:
+            engine = self._engines.pop(project_id, None)
+        if engine is not None:
+            engine.dispose()
+        for suffix in ('', '-wal', '-shm'):
+            path = self.path_for(project_id) + suffix
+            if os.path.exists(path):
+                os.remove(path)
+
+    def _open(self, path):
+        engine = create_engine(f'sqlite:///{path}', connect_args={'timeout': self.connect_timeout})
+
+        @event.listens_for(engine, 'connect')
+        def _set_wal(dbapi_connection, _record):
+            dbapi_connection.execute('PRAGMA journal_mode=WAL')
+
+        create_shard_schema(engine)
+        return engine
+
+
+def sharded_tables():
+    # Модели импортируются лениво: модуль подключается в database.py раньше них
+    from database import db
+    import models  # noqa: F401
+
+    return [db.metadata.tables[name] for name in SHARDED_TABLES]
+
+
+def create_shard_schema(engine):
+    # В шарде только шардированные таблицы; у каждого шарда своя schema_version,
+    # поэтому новые миграции догоняют и старые шарды
+    import migrations
+
+    migrations.create_schema(engine, sharded_tables())
+    migrations.upgrade(engine)
+
+
+def init_app(app):
+    directory = app.config.get('SHARD_DIRECTORY')
+    if directory:
+        app.extensions[EXTENSION_KEY] = ShardResolver(directory)
+
+
+def get_resolver():
+    if not has_app_context():
+        return None
+    return current_app.extensions.get(EXTENSION_KEY)
+
+
+def touches_sharded_table(mapper=None, clause=None) -> bool:
+    if mapper is not None:
+        return getattr(mapper, 'local_table', None) is not None and mapper.local_table.name in SHARDED_TABLES
+    if isinstance(clause, Table):
+        return clause.name in SHARDED_TABLES
+    if isinstance(clause, UpdateBase):
+        return getattr(clause.table, 'name', None) in SHARDED_TABLES
+    if clause is not None:
+        return any(getattr(t, 'name', None) in SHARDED_TABLES for t in find_tables(clause, include_crud=True))
+    return False
+
+
+def shard_engine_for(mapper=None, clause=None):
+    """Движок шарда для запроса или None, если шардирование выключено или таблица не шардирована."""
+    resolver = get_resolver()
+    if resolver is None or not touches_sharded_table(mapper, clause):
+        return None
+
+    project_id = g.get('shard_project_id')
+    if project_id is None:
+        raise RuntimeError('Запрос к данным проекта без контекста проекта (sharding.project_scope)')
+    return resolver.engine_for(project_id)
+
+
+@contextmanager
+def project_scope(project_id: int):
+    """Направляет запросы к шардированным таблицам в шард проекта."""
+    if not has_app_context():
+        yield
+        return
+
+    previous = g.get('shard_project_id')
+    g.shard_project_id = project_id
+    try:
+        yield
+    finally:
+        g.shard_project_id = previous
+
+
+def split_database(source_url, directory, chunk_size=5000):
+    """Копирует требования, связи и историю каждого проекта из общей БД в его шард.
+
+    История удаленных требований переносится в шард проекта из project_id в
+    сохраненных значениях записи. Возвращает ({project_id: путь шарда}, число
+    записей истории без проекта или удаленных проектов, которые не скопированы).
+    """
+    source = create_engine(source_url)
+    resolver = ShardResolver(directory)
+    req_table, link_table, history_table, archive_table, closure_table = sharded_tables()
+    # Индекс архива истории и иерархия есть только в БД, обновленных до миграций 8 и 9
+    has_archive = inspect(source).has_table(archive_table.name)
+    has_closure = inspect(source).has_table(closure_table.name)
+    copied = {}
+
+    with source.connect() as conn:
+        project_ids = [row[0] for row in conn.execute(select(req_table.c.project_id).distinct())]
+        for project_id in project_ids:
+            req_ids = select(req_table.c.id).where(req_table.c.project_id == project_id)
+            statements = (
+                (req_table, select(req_table).where(req_table.c.project_id == project_id)),
+                (link_table, select(link_table).where(link_table.c.source_requirement_id.in_(req_ids))),
+                (history_table, select(history_table).where(history_table.c.requirement_id.in_(req_ids))),
+            )
+            if has_archive:
+                statements += ((archive_table, select(archive_table).where(archive_table.c.project_id == project_id)),)
+            if has_closure:
+                statements += ((closure_table, select(closure_table).where(closure_table.c.descendant_id.in_(req_ids))),)
+            with resolver.engine_for(project_id).begin() as shard:
+                for table, statement in statements:
+                    result = conn.execution_options(yield_per=chunk_size).execute(statement)
+                    for rows in result.mappings().partitions():
+                        shard.execute(insert(table), [dict(r) for r in rows])
+            copied[project_id] = resolver.path_for(project_id)
+
+        # История удаленных требований: проект известен только из значений записи
+        dropped = 0
+        project_table = req_table.metadata.tables['projects']
+        known_projects = {row[0] for row in conn.execute(select(project_table.c.id))}
+        orphans = select(history_table).where(history_table.c.requirement_id.not_in(select(req_table.c.id)))
+        result = conn.execution_options(yield_per=chunk_size).execute(orphans)
+        for rows in result.mappings().partitions():
+            by_project = {}
+            for row in rows:
+                project_id = _history_project_id(row)
+                if project_id not in known_projects:
+                    dropped += 1
+                else:
+                    by_project.setdefault(project_id, []).append(dict(row))
+            for project_id, history_rows in by_project.items():
+                with resolver.engine_for(project_id).begin() as shard:
+                    shard.execute(insert(history_table), history_rows)
+                copied[project_id] = resolver.path_for(project_id)
+
+    source.dispose()
+    return copied, dropped
+
+
+def _history_project_id(row):
+    for values in (row['new_values'], row['old_values']):
+        if isinstance(values, dict) and isinstance(values.get('project_id'), int):
+            return values['project_id']
+    return None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Шардирование проектов TraceReq')
+    sub = parser.add_subparsers(dest='command', required=True)
+    split = sub.add_parser('split', help='разложить существующую БД по шардам проектов')
+    split.add_argument('--source', required=True, help='строка подключения исходной БД')
+    split.add_argument('--directory', required=True, help='каталог для файлов шардов')
+    split.add_argument('--chunk-size', type=int, default=5000)
+    args = parser.parse_args(argv)
+
+    copied, dropped = split_database(args.source, args.directory, args.chunk_size)
+    for project_id, path in copied.items():
+        print(f'project {project_id} -> {path}')
+    if dropped:
+        print(f'history entries of deleted or unknown projects (not copied): {dropped}')
+
+
+if __name__ == '__main__':
+    main()
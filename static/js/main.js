@@ -7,10 +7,45 @@ function projectApi(path) {
   return `${API_BASE}/projects/${pid}${path}`;
 }
 
-let allRequirements = [];
 let currentView = 'grid';
 let mindMapNetwork = null;
 
+// Требования из всех загруженных страниц: id -> требование
+const requirementCache = new Map();
+
+// Виртуальная сетка: DOM создается только для видимых рядов карточек,
+// страницы требований подгружаются с сервера по мере прокрутки
+const GRID_PAGE_SIZE = 100;
+const GRID_CARD_MIN_WIDTH = 300;  // как minmax() у .requirements-grid
+const GRID_GAP = 20;
+const GRID_ROW_HEIGHT = 320;      // высота .requirements-grid.virtual .requirement-card + gap
+const GRID_OVERSCAN_ROWS = 2;
+
+const gridState = {
+    generation: 0,
+    total: 0,
+    loaded: false,
+    items: [],
+    pending: new Set(),
+    rendered: new Map(),
+    emptyMessage: '',
+    frame: null
+};
+
+// Виртуальная матрица: ячейки только видимого окна, строки подгружаются страницами
+const MATRIX_PAGE_SIZE = 200;
+const MATRIX_CELL_WIDTH = 80;
+const MATRIX_CELL_HEIGHT = 40;
+const MATRIX_OVERSCAN = 4;
+
+const matrixState = {
+    generation: 0,
+    ids: [],
+    rows: new Map(),
+    pending: new Set(),
+    frame: null
+};
+
 // Инициализация при загрузке страницы
 document.addEventListener('DOMContentLoaded', function() {
     loadRequirements();
@@ -108,6 +143,14 @@ function setupEventListeners() {
         saveLink();
     });
     
+    // Виртуальные представления перерисовываются при прокрутке и изменении размера
+    window.addEventListener('scroll', scheduleGridRender, { passive: true });
+    window.addEventListener('resize', function() {
+        scheduleGridRender();
+        scheduleMatrixRender();
+    });
+    document.getElementById('matrixTable').addEventListener('scroll', scheduleMatrixRender, { passive: true });
+
     // Закрытие модальных окон при клике вне их
     window.addEventListener('click', function(event) {
         const modals = document.querySelectorAll('.modal');
@@ -150,38 +193,117 @@ function switchView(viewName) {
     }
 }
 
-// Загрузка всех требований
-async function loadRequirements() {
+// (Пере)загрузка требований текущего представления после изменений
+function loadRequirements() {
+    requirementCache.clear();
+    if (currentView === 'grid') {
+        applyFilters();
+    } else if (currentView === 'matrix') {
+        displayMatrix();
+    } else if (currentView === 'mindmap') {
+        displayMindMap();
+    }
+}
+
+// Отображение требований в сетке: сброс окна и загрузка первой страницы
+function displayRequirements(emptyMessage = 'Нет требований. Добавьте первое требование.') {
+    gridState.generation += 1;
+    gridState.total = 0;
+    gridState.loaded = false;
+    gridState.items = [];
+    gridState.pending.clear();
+    gridState.emptyMessage = emptyMessage;
+    loadGridPage(0);
+}
+
+async function loadGridPage(page) {
+    if (gridState.pending.has(page)) return;
+    gridState.pending.add(page);
+    const generation = gridState.generation;
+
+    const { type, status, priority } = getFilterValues();
+    const params = new URLSearchParams({ offset: page * GRID_PAGE_SIZE, limit: GRID_PAGE_SIZE });
+    if (type) params.set('type', type);
+    if (status) params.set('status', status);
+    if (priority) params.set('priority', priority);
+
     try {
-        const response = await fetch(projectApi('/requirements'));
-        allRequirements = await response.json();
-        if (currentView === 'grid') {
-            applyFilters();
-        } else if (currentView === 'matrix') {
-            displayMatrix();
-        } else if (currentView === 'mindmap') {
-            displayMindMap();
+        const response = await fetch(projectApi(`/requirements?${params}`));
+        if (!response.ok) {
+            throw new Error(`HTTP ${response.status}`);
         }
+        const requirements = await response.json();
+        // Пока шел запрос, фильтры могли смениться — ответ уже не нужен
+        if (generation !== gridState.generation) return;
+
+        gridState.total = parseInt(response.headers.get('X-Total-Count') || '0', 10);
+        gridState.loaded = true;
+        requirements.forEach((requirement, index) => {
+            gridState.items[page * GRID_PAGE_SIZE + index] = requirement;
+            requirementCache.set(requirement.id, requirement);
+        });
+        scheduleGridRender();
     } catch (error) {
+        gridState.pending.delete(page);
         console.error('Ошибка загрузки требований:', error);
         alert('Ошибка загрузки требований');
     }
 }
 
-// Отображение требований в сетке
-function displayRequirements(requirements, emptyMessage = 'Нет требований. Добавьте первое требование.') {
+function scheduleGridRender() {
+    if (currentView !== 'grid' || gridState.frame !== null) return;
+    gridState.frame = requestAnimationFrame(renderGrid);
+}
+
+function renderGrid() {
+    gridState.frame = null;
     const grid = document.getElementById('requirementsGrid');
-    grid.innerHTML = '';
-    
-    if (requirements.length === 0) {
-        grid.innerHTML = `<p style="text-align: center; color: #7f8c8d; padding: 40px;">${emptyMessage}</p>`;
+    if (!gridState.loaded) return;
+
+    if (gridState.total === 0) {
+        grid.classList.remove('virtual');
+        grid.style.paddingTop = '';
+        grid.style.paddingBottom = '';
+        grid.innerHTML = `<p style="text-align: center; color: #7f8c8d; padding: 40px;">${gridState.emptyMessage}</p>`;
+        gridState.rendered.clear();
         return;
     }
-    
-    requirements.forEach(requirement => {
-        const card = createRequirementCard(requirement);
-        grid.appendChild(card);
-    });
+
+    grid.classList.add('virtual');
+    const columns = Math.max(1, Math.floor((grid.clientWidth + GRID_GAP) / (GRID_CARD_MIN_WIDTH + GRID_GAP)));
+    const totalRows = Math.ceil(gridState.total / columns);
+    // Положение окна считается от верха сетки: прокручивается вся страница
+    const offsetTop = -grid.getBoundingClientRect().top;
+    const firstRow = Math.min(totalRows, Math.max(0, Math.floor(offsetTop / GRID_ROW_HEIGHT) - GRID_OVERSCAN_ROWS));
+    const lastRow = Math.min(totalRows, Math.max(firstRow, Math.ceil((offsetTop + window.innerHeight) / GRID_ROW_HEIGHT) + GRID_OVERSCAN_ROWS));
+
+    grid.style.paddingTop = `${firstRow * GRID_ROW_HEIGHT}px`;
+    grid.style.paddingBottom = `${(totalRows - lastRow) * GRID_ROW_HEIGHT}px`;
+
+    const rendered = new Map();
+    const fragment = document.createDocumentFragment();
+    const end = Math.min(gridState.total, lastRow * columns);
+    for (let index = firstRow * columns; index < end; index++) {
+        const requirement = gridState.items[index];
+        if (requirement) {
+            // Карточки, оставшиеся в окне, переиспользуются без перестроения
+            const card = gridState.rendered.get(requirement.id) || createRequirementCard(requirement);
+            rendered.set(requirement.id, card);
+            fragment.appendChild(card);
+        } else {
+            fragment.appendChild(createPlaceholderCard());
+            loadGridPage(Math.floor(index / GRID_PAGE_SIZE));
+        }
+    }
+    grid.replaceChildren(fragment);
+    gridState.rendered = rendered;
+}
+
+function createPlaceholderCard() {
+    const card = document.createElement('div');
+    card.className = 'requirement-card placeholder';
+    card.textContent = 'Загрузка…';
+    return card;
 }
 
 function getFilterValues() {
@@ -192,16 +314,11 @@ function getFilterValues() {
     };
 }
 
+// Фильтрация выполняется на сервере, сетка запрашивает страницы заново
 function applyFilters() {
     const { type, status, priority } = getFilterValues();
-    const filteredRequirements = allRequirements.filter(req => {
-        const matchesType = !type || req.requirement_type === type;
-        const matchesStatus = !status || req.status === status;
-        const matchesPriority = !priority || req.priority === priority;
-        return matchesType && matchesStatus && matchesPriority;
-    });
-
-    displayRequirements(filteredRequirements, 'Нет требований по выбранным фильтрам.');
+    const filtered = type || status || priority;
+    displayRequirements(filtered ? 'Нет требований по выбранным фильтрам.' : undefined);
 }
 
 function resetFilters() {
@@ -333,7 +450,7 @@ async function viewRequirementDetail(requirementId) {
         if (requirement.outgoing_links && requirement.outgoing_links.length > 0) {
             linksHtml += '<div class="detail-section"><h3>Исходящие связи</h3>';
             requirement.outgoing_links.forEach(link => {
-                const targetReq = allRequirements.find(r => r.id === link.target_requirement_id);
+                const targetReq = requirementCache.get(link.target_requirement_id);
                 const linkClass = getLinkTypeClass(link.link_type);
                 linksHtml += `<div class="link-item clickable" onclick="viewRequirementDetail(${link.target_requirement_id}); document.getElementById('detailModal').style.display='block';">
                     <span class="link-type ${linkClass}">${escapeHtml(link.link_type)}</span>
@@ -346,7 +463,7 @@ async function viewRequirementDetail(requirementId) {
         if (requirement.incoming_links && requirement.incoming_links.length > 0) {
             linksHtml += '<div class="detail-section"><h3>Входящие связи</h3>';
             requirement.incoming_links.forEach(link => {
-                const sourceReq = allRequirements.find(r => r.id === link.source_requirement_id);
+                const sourceReq = requirementCache.get(link.source_requirement_id);
                 const linkClass = getLinkTypeClass(link.link_type);
                 linksHtml += `<div class="link-item clickable" onclick="viewRequirementDetail(${link.source_requirement_id}); document.getElementById('detailModal').style.display='block';">
                     <span class="link-type ${linkClass}">${escapeHtml(link.link_type)}</span>
@@ -412,7 +529,7 @@ async function viewRequirementDetail(requirementId) {
 
 // Показ описания требования
 function showRequirementDescription(requirementId) {
-    const requirement = allRequirements.find(r => r.id === requirementId);
+    const requirement = requirementCache.get(requirementId);
     if (!requirement) {
         // Если требование не найдено в кэше, загружаем его
         fetch(projectApi(`/requirements/${requirementId}`))
@@ -455,104 +572,185 @@ function showDescriptionModal(requirement) {
 
 // Отображение таблицы пересечений
 async function displayMatrix() {
+    matrixState.generation += 1;
+    matrixState.ids = [];
+    matrixState.rows.clear();
+    matrixState.pending.clear();
+
+    const container = document.getElementById('matrixTable');
+    container.scrollTop = 0;
+    container.scrollLeft = 0;
+    await loadMatrixPage(0);
+}
+
+async function loadMatrixPage(page) {
+    if (matrixState.pending.has(page)) return;
+    matrixState.pending.add(page);
+    const generation = matrixState.generation;
+    const container = document.getElementById('matrixTable');
+
     try {
-        const response = await fetch(projectApi('/matrix'));
-        const data = await response.json();
-        
-        const container = document.getElementById('matrixTable');
-        const requirements = data.requirements;
-        const matrix = data.matrix;
-        
-        // Обновляем allRequirements для доступа к описаниям
-        allRequirements = requirements;
-        
-        if (requirements.length === 0) {
-            container.innerHTML = '<p style="text-align: center; color: #7f8c8d; padding: 40px;">Нет требований для отображения матрицы.</p>';
-            return;
+        const response = await fetch(projectApi(`/matrix?offset=${page * MATRIX_PAGE_SIZE}&limit=${MATRIX_PAGE_SIZE}`));
+        if (!response.ok) {
+            throw new Error(`HTTP ${response.status}`);
         }
-        
-        const reqDict = {};
-        requirements.forEach(req => {
-            reqDict[req.id] = req;
-        });
-        
-        const reqIds = requirements.map(r => r.id).sort((a, b) => a - b);
-        
-        let html = '<table class="matrix-table"><thead><tr><th></th>';
-        
-        // Заголовки столбцов
-        reqIds.forEach(reqId => {
-            html += `<th class="matrix-header-clickable" title="${escapeHtml(reqDict[reqId].title)} - Кликните для просмотра описания" onclick="showRequirementDescription(${reqId})" style="cursor: pointer;">#${reqId}</th>`;
-        });
-        html += '</tr></thead><tbody>';
-        
-        // Строки матрицы
-        reqIds.forEach(sourceId => {
-            html += `<tr><th class="matrix-header-clickable" title="${escapeHtml(reqDict[sourceId].title)} - Кликните для просмотра описания" onclick="showRequirementDescription(${sourceId})" style="cursor: pointer;">#${sourceId}</th>`;
-            reqIds.forEach(targetId => {
-                let cellClass = 'matrix-cell';
-                let cellContent = '';
-                
-                if (sourceId === targetId) {
-                    cellClass += ' diagonal';
-                } else if (matrix[sourceId] && matrix[sourceId][targetId]) {
-                    const linkType = matrix[sourceId][targetId];
-                    cellClass += ' clickable ' + getLinkTypeClass(linkType);
-                    cellContent = linkType;
-                }
-                
-                const onclickAttr = (sourceId !== targetId && matrix[sourceId] && matrix[sourceId][targetId]) 
-                    ? `onclick="viewRequirementDetail(${targetId}); document.getElementById('detailModal').style.display='block';" title="Кликните для просмотра требования #${targetId}"`
-                    : '';
-                
-                html += `<td class="${cellClass}" ${onclickAttr}>${cellContent}</td>`;
-            });
-            html += '</tr>';
+        const data = await response.json();
+        if (generation !== matrixState.generation) return;
+
+        data.requirements.forEach(req => {
+            requirementCache.set(req.id, req);
+            matrixState.rows.set(req.id, data.matrix[req.id] || {});
         });
-        
-        html += '</tbody></table>';
-        container.innerHTML = html;
+
+        if (page === 0) {
+            matrixState.ids = data.ids;
+            if (data.ids.length === 0) {
+                container.innerHTML = '<p style="text-align: center; color: #7f8c8d; padding: 40px;">Нет требований для отображения матрицы.</p>';
+                return;
+            }
+            createMatrixCanvas(container, data.ids.length);
+        }
+        scheduleMatrixRender();
     } catch (error) {
+        matrixState.pending.delete(page);
         console.error('Ошибка загрузки матрицы:', error);
-        document.getElementById('matrixTable').innerHTML = '<p style="text-align: center; color: #e74c3c; padding: 40px;">Ошибка загрузки матрицы</p>';
+        container.innerHTML = '<p style="text-align: center; color: #e74c3c; padding: 40px;">Ошибка загрузки матрицы</p>';
+    }
+}
+
+function createMatrixCanvas(container, size) {
+    const canvas = document.createElement('div');
+    canvas.className = 'matrix-virtual';
+    // Шапка и первый столбец занимают по одной ячейке
+    canvas.style.width = `${(size + 1) * MATRIX_CELL_WIDTH}px`;
+    canvas.style.height = `${(size + 1) * MATRIX_CELL_HEIGHT}px`;
+
+    canvas.addEventListener('click', function(event) {
+        const header = event.target.closest('[data-requirement-id]');
+        if (header) {
+            showRequirementDescription(parseInt(header.dataset.requirementId, 10));
+            return;
+        }
+        const cell = event.target.closest('.matrix-cell.clickable');
+        if (cell) {
+            viewRequirementDetail(parseInt(cell.dataset.targetId, 10));
+            document.getElementById('detailModal').style.display = 'block';
+        }
+    });
+
+    container.replaceChildren(canvas);
+}
+
+function scheduleMatrixRender() {
+    if (currentView !== 'matrix' || matrixState.frame !== null) return;
+    matrixState.frame = requestAnimationFrame(renderMatrix);
+}
+
+function renderMatrix() {
+    matrixState.frame = null;
+    const container = document.getElementById('matrixTable');
+    const canvas = container.querySelector('.matrix-virtual');
+    if (!canvas) return;
+
+    const ids = matrixState.ids;
+    const { scrollTop, scrollLeft, clientWidth, clientHeight } = container;
+    const firstRow = Math.max(0, Math.floor(scrollTop / MATRIX_CELL_HEIGHT) - MATRIX_OVERSCAN);
+    const lastRow = Math.min(ids.length, Math.ceil((scrollTop + clientHeight) / MATRIX_CELL_HEIGHT) + MATRIX_OVERSCAN);
+    const firstCol = Math.max(0, Math.floor(scrollLeft / MATRIX_CELL_WIDTH) - MATRIX_OVERSCAN);
+    const lastCol = Math.min(ids.length, Math.ceil((scrollLeft + clientWidth) / MATRIX_CELL_WIDTH) + MATRIX_OVERSCAN);
+
+    const fragment = document.createDocumentFragment();
+    const place = (element, left, top) => {
+        element.style.left = `${left}px`;
+        element.style.top = `${top}px`;
+        fragment.appendChild(element);
+    };
+    const header = (requirementId) => {
+        const element = document.createElement('div');
+        element.className = 'matrix-header matrix-header-clickable';
+        element.dataset.requirementId = requirementId;
+        element.textContent = `#${requirementId}`;
+        const requirement = requirementCache.get(requirementId);
+        element.title = `${requirement ? requirement.title + ' - ' : ''}Кликните для просмотра описания`;
+        return element;
+    };
+
+    for (let row = firstRow; row < lastRow; row++) {
+        const sourceId = ids[row];
+        const links = matrixState.rows.get(sourceId);
+        if (!links) {
+            loadMatrixPage(Math.floor(row / MATRIX_PAGE_SIZE));
+        }
+        const top = (row + 1) * MATRIX_CELL_HEIGHT;
+        for (let col = firstCol; col < lastCol; col++) {
+            const targetId = ids[col];
+            const cell = document.createElement('div');
+            cell.className = 'matrix-cell';
+            if (sourceId === targetId) {
+                cell.classList.add('diagonal');
+            } else if (links && links[targetId]) {
+                const linkType = links[targetId];
+                cell.classList.add('clickable');
+                const linkClass = getLinkTypeClass(linkType);
+                if (linkClass) cell.classList.add(linkClass);
+                cell.textContent = linkType;
+                cell.dataset.targetId = targetId;
+                cell.title = `Кликните для просмотра требования #${targetId}`;
+            }
+            place(cell, (col + 1) * MATRIX_CELL_WIDTH, top);
+        }
+        // Заголовок строки прижат к левому краю видимой области
+        place(header(sourceId), scrollLeft, top);
     }
+    for (let col = firstCol; col < lastCol; col++) {
+        place(header(ids[col]), (col + 1) * MATRIX_CELL_WIDTH, scrollTop);
+    }
+    const corner = document.createElement('div');
+    corner.className = 'matrix-header matrix-corner';
+    place(corner, scrollLeft, scrollTop);
+
+    canvas.replaceChildren(fragment);
 }
 
-// Отображение Mind Map
-function displayMindMap() {
+// Отображение Mind Map: координаты узлов считает сервер, клиент только рисует
+async function displayMindMap() {
     const container = document.getElementById('mindMapNetwork');
-    
-    if (allRequirements.length === 0) {
+
+    let layout;
+    try {
+        const response = await fetch(projectApi('/layout'));
+        if (!response.ok) {
+            throw new Error(`HTTP ${response.status}`);
+        }
+        layout = await response.json();
+    } catch (error) {
+        console.error('Ошибка загрузки Mind Map:', error);
+        alert('Ошибка загрузки Mind Map');
+        return;
+    }
+
+    if (layout.nodes.length === 0) {
         container.innerHTML = '<p style="text-align: center; color: #7f8c8d; padding: 40px;">Нет требований для отображения Mind Map.</p>';
         return;
     }
     
     // Создание узлов и связей для vis.js
-    const nodes = [];
-    const edges = [];
-    
-    allRequirements.forEach(req => {
-        nodes.push({
-            id: req.id,
-            label: `#${req.id}\n${req.title.substring(0, 30)}${req.title.length > 30 ? '...' : ''}`,
-            title: `${req.title}\nТип: ${req.requirement_type}\nСтатус: ${req.status}`,
-            color: getNodeColor(req.requirement_type),
-            shape: 'box'
-        });
-        
-        // Добавление связей
-        if (req.outgoing_links) {
-            req.outgoing_links.forEach(link => {
-                edges.push({
-                    from: req.id,
-                    to: link.target_requirement_id,
-                    label: link.link_type,
-                    color: getEdgeColor(link.link_type),
-                    arrows: 'to'
-                });
-            });
-        }
-    });
+    const nodes = layout.nodes.map(req => ({
+        id: req.id,
+        x: req.x,
+        y: req.y,
+        label: `#${req.id}\n${req.title.substring(0, 30)}${req.title.length > 30 ? '...' : ''}`,
+        title: `${req.title}\nТип: ${req.requirement_type}\nСтатус: ${req.status}`,
+        color: getNodeColor(req.requirement_type),
+        shape: 'box'
+    }));
+    const edges = layout.edges.map(link => ({
+        from: link.source_id,
+        to: link.target_id,
+        label: link.link_type,
+        color: getEdgeColor(link.link_type),
+        arrows: 'to'
+    }));
     
     const data = { nodes: nodes, edges: edges };
     const options = {
@@ -564,11 +762,11 @@ function displayMindMap() {
         edges: {
             font: { size: 12, align: 'middle' },
             arrows: { to: { enabled: true } },
-            smooth: { type: 'continuous' }
+            smooth: false
         },
+        // Раскладка уже посчитана на сервере
         physics: {
-            enabled: true,
-            stabilization: { iterations: 200 }
+            enabled: false
         },
         interaction: {
             hover: true,
@@ -627,6 +825,7 @@ function openRequirementModal(requirementId = null) {
         title.textContent = 'Добавить требование';
         form.reset();
         document.getElementById('requirementId').value = '';
+        document.getElementById('requirementId').dataset.version = '';
     }
     
     modal.style.display = 'block';
@@ -639,6 +838,8 @@ async function loadRequirementForEdit(requirementId) {
         const requirement = await response.json();
         
         document.getElementById('requirementId').value = requirement.id;
+        // Версия уходит в If-Match при сохранении: чужие правки не затираются молча
+        document.getElementById('requirementId').dataset.version = requirement.version ?? '';
         document.getElementById('title').value = requirement.title;
         document.getElementById('description').value = requirement.description || '';
         document.getElementById('requirementType').value = requirement.requirement_type;
@@ -671,16 +872,24 @@ async function saveRequirement() {
             : projectApi('/requirements');
         
         const method = requirementId ? 'PUT' : 'POST';
+        const headers = {
+            'Content-Type': 'application/json'
+        };
+        const version = document.getElementById('requirementId').dataset.version;
+        if (requirementId && version) {
+            headers['If-Match'] = `"${version}"`;
+        }
         
         const response = await fetch(url, {
             method: method,
-            headers: {
-                'Content-Type': 'application/json'
-            },
+            headers: headers,
             body: JSON.stringify(data)
         });
         
-        if (response.ok) {
+        if (response.status === 409) {
+            alert('Требование уже изменил другой пользователь. Форма обновлена до актуальной версии — повторите правку.');
+            loadRequirementForEdit(requirementId);
+        } else if (response.ok) {
             document.getElementById('requirementModal').style.display = 'none';
             loadRequirements();
         } else {
@@ -727,12 +936,33 @@ async function openLinkModal(sourceRequirementId) {
     
     document.getElementById('sourceRequirementId').value = sourceRequirementId;
     
-    // Загрузка списка требований для выбора цели
+    // Загрузка списка требований для выбора цели и подсказок похожих требований
     try {
-        const response = await fetch(projectApi('/requirements'));
+        const [response, suggestions] = await Promise.all([
+            fetch(projectApi('/requirements')),
+            loadLinkSuggestions(sourceRequirementId)
+        ]);
         const requirements = await response.json();
         
         targetSelect.innerHTML = '<option value="">Выберите требование</option>';
+        if (suggestions.length) {
+            const group = document.createElement('optgroup');
+            group.label = 'Похожие требования';
+            suggestions.forEach(item => {
+                const option = document.createElement('option');
+                option.value = item.requirement_id;
+                option.dataset.linkType = item.link_type;
+                option.textContent = `#${item.requirement_id} - ${item.title} (${Math.round(item.score * 100)}%)`;
+                group.appendChild(option);
+            });
+            targetSelect.appendChild(group);
+        }
+        targetSelect.onchange = () => {
+            const selected = targetSelect.selectedOptions[0];
+            if (selected && selected.dataset.linkType) {
+                document.getElementById('linkType').value = selected.dataset.linkType;
+            }
+        };
         requirements.forEach(req => {
             if (req.id !== sourceRequirementId) {
                 const option = document.createElement('option');
@@ -749,6 +979,19 @@ async function openLinkModal(sourceRequirementId) {
     }
 }
 
+// Подсказки целей связи (пустой список, если сервер их не вернул)
+async function loadLinkSuggestions(requirementId) {
+    try {
+        const response = await fetch(projectApi(`/requirements/${requirementId}/suggestions?k=5`));
+        if (!response.ok) return [];
+        const data = await response.json();
+        return data.suggestions;
+    } catch (error) {
+        console.error('Ошибка загрузки подсказок связей:', error);
+        return [];
+    }
+}
+
 // Сохранение связи
 async function saveLink() {
     const data = {
@@ -2,6 +2,8 @@ const API_BASE = '/api';
 
 const elGrid = document.getElementById('projectsGrid');
 const btnCreate = document.getElementById('btnCreate');
+const btnMore = document.getElementById('btnMore');
+const selectSort = document.getElementById('projectSort');
 
 const modalBackdrop = document.getElementById('modalBackdrop');
 const modalTitle = document.getElementById('modalTitle');
@@ -16,6 +18,11 @@ const modalError = document.getElementById('modalError');
 let mode = 'create';   // create | edit
 let editingId = null;
 
+// Проекты подгружаются страницами; загруженные хранятся по id для редактирования
+const PROJECTS_PAGE_SIZE = 50;
+const loadedProjects = new Map();
+let projectsTotal = 0;
+
 /* -------------------- helpers -------------------- */
 
 function showError(msg) {
@@ -80,11 +87,34 @@ function escapeHtml(text) {
 
 /* -------------------- render -------------------- */
 
+function formatDate(value) {
+  if (!value) return '—';
+  const date = new Date(value);
+  return Number.isNaN(date.getTime()) ? '—' : date.toLocaleString('ru-RU');
+}
+
+function renderProjectStats(stats) {
+  if (!stats) return '';
+  const statuses = Object.entries(stats.statuses || {})
+    .filter(([, count]) => count > 0)
+    .map(([status, count]) => `${escapeHtml(status)}: ${count}`)
+    .join(' · ');
+  return `
+    <div class="project-stats muted">
+      <span>Требований: <b>${stats.requirement_count}</b></span>
+      <span>Связей: <b>${stats.link_count}</b></span>
+      <span>Изменен: ${escapeHtml(formatDate(stats.last_activity))}</span>
+    </div>
+    ${statuses ? `<div class="project-stats muted">${statuses}</div>` : ''}
+  `;
+}
+
 function renderProjectCard(project) {
   return `
     <div class="requirement-card">
       <div class="requirement-title">${escapeHtml(project.name)}</div>
       <div class="requirement-description">${escapeHtml(project.description || '')}</div>
+      ${renderProjectStats(project.stats)}
       <div class="actions" style="margin-top:12px; display:flex; gap:8px;">
         <button class="btn btn-primary" data-action="open" data-id="${project.id}">Открыть</button>
         <button class="btn btn-secondary" data-action="edit" data-id="${project.id}">Редактировать</button>
@@ -94,10 +124,27 @@ function renderProjectCard(project) {
   `;
 }
 
+async function fetchProjectsPage(offset) {
+  const [sort, order] = selectSort.value.split(':');
+  const params = new URLSearchParams({ offset, limit: PROJECTS_PAGE_SIZE, sort, order });
+  const response = await fetch(`${API_BASE}/projects?${params}`);
+  const payload = await response.json().catch(() => null);
+  if (!response.ok) throw new Error(payload?.error || `HTTP ${response.status}`);
+  projectsTotal = Number(response.headers.get('X-Total-Count') || payload.length);
+  return payload;
+}
+
+function updateMoreButton() {
+  btnMore.style.display = loadedProjects.size < projectsTotal ? '' : 'none';
+}
+
 async function loadProjects() {
   elGrid.innerHTML = '<p style="padding:20px;color:#7f8c8d;">Загрузка проектов...</p>';
+  loadedProjects.clear();
 
-  const projects = await apiJson(`${API_BASE}/projects`);
+  const projects = await fetchProjectsPage(0);
+  projects.forEach(p => loadedProjects.set(p.id, p));
+  updateMoreButton();
 
   if (!projects.length) {
     elGrid.innerHTML = '<p style="padding:20px;color:#7f8c8d;">Проектов пока нет</p>';
@@ -107,6 +154,20 @@ async function loadProjects() {
   elGrid.innerHTML = projects.map(renderProjectCard).join('');
 }
 
+async function loadMoreProjects() {
+  btnMore.disabled = true;
+  try {
+    const projects = await fetchProjectsPage(loadedProjects.size);
+    projects.forEach(p => loadedProjects.set(p.id, p));
+    elGrid.insertAdjacentHTML('beforeend', projects.map(renderProjectCard).join(''));
+    updateMoreButton();
+  } catch (e) {
+    alert(e.message || 'Ошибка загрузки проектов');
+  } finally {
+    btnMore.disabled = false;
+  }
+}
+
 /* -------------------- actions -------------------- */
 
 async function saveProject() {
@@ -160,6 +221,12 @@ btnCreate.addEventListener('click', openModalCreate);
 btnCloseModal.addEventListener('click', closeModal);
 btnCancel.addEventListener('click', closeModal);
 btnSave.addEventListener('click', saveProject);
+btnMore.addEventListener('click', loadMoreProjects);
+selectSort.addEventListener('change', () => {
+  loadProjects().catch(err => {
+    elGrid.innerHTML = `<p style="padding:20px;color:#c0392b;">${escapeHtml(err.message)}</p>`;
+  });
+});
 
 modalBackdrop.addEventListener('click', (e) => {
   if (e.target === modalBackdrop) closeModal();
@@ -178,8 +245,7 @@ elGrid.addEventListener('click', async (e) => {
   }
 
   if (action === 'edit') {
-    const projects = await apiJson(`${API_BASE}/projects`);
-    const project = projects.find(p => p.id === id);
+    const project = loadedProjects.get(id);
     if (project) openModalEdit(project);
     return;
   }